@@ -0,0 +1,92 @@
+"""
+Benchmark for the streaming base_network parser.
+
+Writes a synthetic base_network transaction file and compares the streaming parser
+against the previous readlines()/split() implementation. Run with
+
+    python benchmarks/base_network_parser.py --nodes 30000 --links 80000
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from helmet_utils.network.transaction_parser import read_base_network
+
+
+def write_base_network(path, num_nodes, num_links, seed=0):
+    rnd = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write("c Modeller - Base Network Transaction\nc Date: 2024-01-01 00:00:00\nc Project: Benchmark\nc Scenario 1: Synthetic\n")
+        f.write("t nodes\nc Node X-coord Y-coord Data1 Data2 Data3 Label\n")
+        for node in range(1, num_nodes + 1):
+            marker = 'a*' if node <= 2000 else 'a'
+            f.write(f"{marker} {node:>7} {25490000 + rnd.random() * 40000:.3f} {6670000 + rnd.random() * 40000:.3f} 0 0 {rnd.randint(0, 3)} {rnd.choice('0ABCDE')}\n")
+        f.write("t links\nc From To Length Modes Typ Lan VDF Data1 Data2 Data3\n")
+        for _ in range(num_links):
+            f.write(f"a {rnd.randint(1, num_nodes):>7} {rnd.randint(1, num_nodes):>7} {rnd.random():.3f} {rnd.choice(['cvkyaf', 'chvkyaf', 'bgde'])} {rnd.randint(1, 700)} {rnd.choice([1, 2, 3])} {rnd.randint(1, 6)} 0 0 0\n")
+
+
+def legacy_read_base_network(base_network_file):
+    """The line by line implementation that the streaming parser replaced."""
+    with open(base_network_file, 'r') as file:
+        lines = file.readlines()
+    nodes_lines, links_lines = [], []
+    reading_nodes = reading_links = False
+    node_line_regex = re.compile(r'^(a\*)\s*(\d+)')
+    for line in lines:
+        if 't nodes' in line:
+            reading_nodes, reading_links = True, False
+            continue
+        elif 't links' in line:
+            reading_nodes, reading_links = False, True
+            continue
+        if reading_nodes:
+            nodes_lines.append(node_line_regex.sub(r'\1 \2', line))
+        elif reading_links:
+            links_lines.append(line)
+    df_nodes = pd.DataFrame([line.split() for line in nodes_lines[1:]], columns=nodes_lines[0].split())
+    df_links = pd.DataFrame([line.split() for line in links_lines[1:]], columns=links_lines[0].split())
+    df_nodes = df_nodes.astype({'Node': 'Int32', 'X-coord': 'float64', 'Y-coord': 'float64', 'Data1': 'float64',
+                                'Data2': 'float64', 'Data3': 'float64', 'Label': 'str'})
+    df_links = df_links.astype({'From': 'Int32', 'To': 'Int32', 'Length': 'float64', 'Modes': 'str', 'Typ': 'int32',
+                                'Lan': 'float64', 'VDF': 'int32', 'Data1': 'float64', 'Data2': 'float64', 'Data3': 'float64'})
+    return df_nodes, df_links
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the base_network parser")
+    parser.add_argument("--nodes", type=int, default=30000)
+    parser.add_argument("--links", type=int, default=80000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "base_network_1.txt"
+        write_base_network(path, args.nodes, args.links)
+        legacy_time, (legacy_nodes, legacy_links) = best_of(lambda: legacy_read_base_network(path), args.repeat)
+        streaming_time, (_, nodes, links) = best_of(lambda: read_base_network(path), args.repeat)
+
+    pd.testing.assert_frame_equal(legacy_nodes, nodes)
+    pd.testing.assert_frame_equal(legacy_links, links)
+    print(f"{args.nodes} nodes, {args.links} links")
+    print(f"legacy parser:    {legacy_time:.3f} s")
+    print(f"streaming parser: {streaming_time:.3f} s")
+    print(f"speedup:          {legacy_time / streaming_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory use of a parsed scenario without the compact column types, with them, and with the
+repeated strings also stored as categoricals.
+
+Each variant is loaded in its own process, so that the peak resident memory of one does not
+affect the other. Reports the deep memory usage of every table and the peak RSS. Run with
+
+    python benchmarks/scenario_memory.py path/to/scenario_directory
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+TABLES = ('network', 'segments', 'transit_lines', 'stops', 'modes', 'turns', 'vehicles', 'link_shape')
+
+
+def table_sizes(scenario):
+    tables = {
+        'network': scenario.network,
+        'segments': scenario.transit.segments,
+        'transit_lines': scenario.transit.transit_lines,
+        'stops': scenario.transit.stops,
+        'modes': scenario.modes,
+        'turns': scenario.turns,
+        'vehicles': scenario.vehicles,
+        'link_shape': scenario.link_shape,
+    }
+    return {name: int(table.memory_usage(deep=True).sum()) for name, table in tables.items() if table is not None}
+
+
+# ScenarioReader arguments of each variant
+VARIANTS = {
+    'plain': dict(compact=False),
+    'compact': dict(compact=True),
+    'categorical': dict(compact=True, categorical=True),
+}
+
+
+def measure(scenario_directory, variant):
+    """Loads the scenario in this process and returns the measurements."""
+    from helmet_utils.network.scenario_reader import ScenarioReader
+    start = time.perf_counter()
+    scenario = ScenarioReader(scenario_directory, **VARIANTS[variant]).scenario()
+    sizes = table_sizes(scenario)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    return {'variant': variant, 'seconds': elapsed, 'tables': sizes,
+            'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def run_variant(scenario_directory, variant):
+    result = subprocess.run([sys.executable, __file__, scenario_directory, '--variant', variant],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory use of a parsed scenario")
+    parser.add_argument("scenario_directory")
+    parser.add_argument("--variant", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(measure(args.scenario_directory, args.variant)))
+        return
+
+    results = [run_variant(args.scenario_directory, variant) for variant in VARIANTS]
+    print(f"{'table':<15}" + ''.join(f"{variant + ' MB':>16}" for variant in VARIANTS))
+    for name in TABLES:
+        if name in results[0]['tables']:
+            print(f"{name:<15}" + ''.join(f"{result['tables'][name] / 2**20:>16.2f}" for result in results))
+    print(f"{'total':<15}" + ''.join(f"{sum(result['tables'].values()) / 2**20:>16.2f}" for result in results))
+    print(f"{'peak RSS':<15}" + ''.join(f"{result['peak_rss'] / 2**20:>16.2f}" for result in results))
+    print(f"{'load time s':<15}" + ''.join(f"{result['seconds']:>16.2f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark suite of the scenario reading, node table, graph, spatial queries, exports and gradients.
+
+Writes a synthetic scenario of each scale with synthetic_scenario.py, and measures the run time
+and the peak memory allocated by every benchmarked operation. The results are written to a
+JSON file together with the versions of the package and its dependencies, so that the results
+of different releases can be compared with --compare. Run with
+
+    python benchmarks/suite.py --scales small medium --output results.json
+    python benchmarks/suite.py --scales small --compare previous_results.json
+"""
+import argparse
+import contextlib
+import importlib.metadata
+import io
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from synthetic_scenario import write_scenario
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+SCALES = {
+    'small': dict(nodes=2000, links=6000, centroids=100, transit_lines=50, segments_per_line=20,
+                  extra_link_attributes=10, extra_node_attributes=2, extra_segment_attributes=3),
+    'medium': dict(nodes=10000, links=30000, centroids=500, transit_lines=300, segments_per_line=30,
+                   extra_link_attributes=20, extra_node_attributes=4, extra_segment_attributes=5),
+    # About the size of the Helmet network after a model run
+    'helmet': dict(nodes=30000, links=80000, centroids=2000, transit_lines=1200, segments_per_line=40,
+                   extra_link_attributes=100, extra_node_attributes=8, extra_segment_attributes=10),
+}
+PACKAGES = ['numpy', 'pandas', 'geopandas', 'shapely', 'pyarrow']
+
+
+def cases(scenario_directory):
+    """
+    Returns the benchmarked operations as (name, setup) pairs. setup is called with a new output
+    folder before every run and returns the function that is measured, so that loading the
+    scenario and other preparations are not included in the results.
+    """
+    scenario = None
+
+    def loaded():
+        # The scenario is loaded once and all its components are materialized
+        nonlocal scenario
+        if scenario is None:
+            scenario = get_emme_scenario(scenario_directory)
+            for name in scenario.LAZY_COMPONENTS:
+                getattr(scenario, name)
+            for name in scenario.transit.TABLES:
+                getattr(scenario.transit, name)
+        return scenario
+
+    def network_nodes(folder):
+        network = loaded().network
+        network.reset_nodes()
+        return lambda: network.nodes
+
+    def network_graph(folder):
+        network = loaded().network
+        network.reset_graphs()
+        return lambda: network.graph(modes='c')
+
+    def shortest_paths(folder):
+        graph = loaded().network.graph(modes='c')
+        rng = np.random.default_rng(0)
+        origins, destinations = rng.choice(graph.nodes, 1000), rng.choice(graph.nodes, 1000)
+        return lambda: graph.shortest_paths(origins, destinations, paths=True)
+
+    def nearest(method):
+        def setup(folder):
+            network = loaded().network
+            bounds = network.total_bounds
+            rng = np.random.default_rng(0)
+            points = np.column_stack([rng.uniform(bounds[0], bounds[2], 100000), rng.uniform(bounds[1], bounds[3], 100000)])
+            # The spatial index is built before the run, only the queries are measured
+            getattr(network, method)(points[:1])
+            return lambda: getattr(network, method)(points)
+        return setup
+
+    def network_export(method):
+        return lambda folder: lambda: getattr(loaded().network, method)(folder)
+
+    def scenario_export(method):
+        return lambda folder: lambda: getattr(loaded(), method)(folder)
+
+    def transit_export(method):
+        return lambda folder: lambda: getattr(loaded().transit, method)(folder)
+
+    def full_export(workers):
+        return lambda folder: lambda: loaded().export(folder, workers=workers)
+
+    def gradient(folder):
+        from helmet_utils.network.height_data import HeightData
+        height_data = HeightData(None, loaded().network)
+        # Synthetic elevations, the gradients are normally computed from the elevations read from the API
+        points = height_data.nodes.geometry.to_numpy()
+        elevations = np.random.default_rng(0).random(len(points)) * 50
+        height_data.nodes['geometry'] = shapely.points(shapely.get_x(points), shapely.get_y(points), elevations)
+        fixes = Path(folder) / 'elevation_fixes.csv'
+        pd.DataFrame({'node': height_data.nodes['Node'].iloc[:10], 'elevation': 5.0}).to_csv(fixes, index=False)
+        return lambda: height_data.gradient(elevation_fixes=fixes)
+
+    return [
+        ('get_emme_scenario', lambda folder: lambda: get_emme_scenario(scenario_directory)),
+        ('EmmeNetwork.nodes', network_nodes),
+        ('EmmeNetwork.graph', network_graph),
+        ('NetworkGraph.shortest_paths 1000 pairs', shortest_paths),
+        ('EmmeNetwork.nearest_nodes 100k points', nearest('nearest_nodes')),
+        ('EmmeNetwork.nearest_links 100k points', nearest('nearest_links')),
+        ('EmmeNetwork.export_base_network', network_export('export_base_network')),
+        ('EmmeNetwork.export_extra_links', network_export('export_extra_links')),
+        ('EmmeNetwork.export_extra_nodes', network_export('export_extra_nodes')),
+        ('EmmeNetwork.export_netfield_links', network_export('export_netfield_links')),
+        ('EmmeScenario.export_link_shape', scenario_export('export_link_shape')),
+        ('EmmeScenario.export_modes', scenario_export('export_modes')),
+        ('EmmeScenario.export_turns', scenario_export('export_turns')),
+        ('EmmeScenario.export_vehicles', scenario_export('export_vehicles')),
+        ('TransitNetwork.export_transit_lines', transit_export('export_transit_lines')),
+        ('TransitNetwork.export_extra_transit_lines', transit_export('export_extra_transit_lines')),
+        ('TransitNetwork.export_netfield_transit_lines', transit_export('export_netfield_transit_lines')),
+        ('TransitNetwork.export_segments', transit_export('export_segments')),
+        ('EmmeScenario.export', full_export(None)),
+        ('EmmeScenario.export workers=4', full_export(4)),
+        ('HeightData.gradient', gradient),
+    ]
+
+
+def measure(setup, repeat):
+    """
+    Returns the best time of repeat runs and the peak memory allocated by one more run, which is
+    traced separately because tracing the allocations slows down the run.
+    """
+    timings = []
+    for _ in range(repeat + 1):
+        with tempfile.TemporaryDirectory() as folder, quiet():
+            run = setup(folder)
+            if len(timings) < repeat:
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            else:
+                tracemalloc.start()
+                try:
+                    run()
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+    return min(timings), timings, peak_memory
+
+
+@contextlib.contextmanager
+def quiet():
+    # The package reports its progress with print
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+def run_scale(scale, repeat, selected=None):
+    results = []
+    with tempfile.TemporaryDirectory() as scenario_directory:
+        sizes = write_scenario(scenario_directory, **SCALES[scale])
+        print(f"{scale}: {', '.join(f'{count} {name}' for name, count in sizes.items())}")
+        for name, setup in cases(scenario_directory):
+            if selected and name not in selected:
+                continue
+            result = {'scale': scale, 'sizes': sizes, 'case': name}
+            try:
+                seconds, timings, peak_memory = measure(setup, repeat)
+                result.update(seconds=seconds, timings=timings, peak_memory=peak_memory, error=None)
+                print(f"  {name:<48}{seconds:>10.3f} s{peak_memory / 2**20:>10.1f} MB")
+            except Exception as error:
+                result.update(seconds=None, timings=[], peak_memory=None, error=repr(error))
+                print(f"  {name:<48}{'failed':>12}  {error!r}")
+            results.append(result)
+    return results
+
+
+def metadata():
+    versions = {}
+    for package in ['helmet_utils'] + PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).resolve().parent,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'versions': versions,
+    }
+
+
+def compare(results, previous_results, threshold):
+    """Prints the change of the run times from a previous results file."""
+    previous = {(result['scale'], result['case']): result['seconds'] for result in previous_results['results']}
+    print(f"\nCompared to {previous_results['metadata'].get('git_commit')} ({previous_results['metadata'].get('created')})")
+    print(f"{'scale':<8}{'case':<48}{'before s':>10}{'after s':>10}{'ratio':>8}")
+    for result in results:
+        before = previous.get((result['scale'], result['case']))
+        after = result['seconds']
+        if before is None or after is None:
+            continue
+        ratio = after / before if before > 0 else float('inf')
+        flag = '  slower' if ratio > threshold else '  faster' if ratio < 1 / threshold else ''
+        print(f"{result['scale']:<8}{result['case']:<48}{before:>10.3f}{after:>10.3f}{ratio:>8.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite on synthetic scenarios")
+    parser.add_argument("--scales", nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument("--cases", nargs='+', help="Names of the cases to run, all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs of each case")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare to")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Ratio of the run times that is reported as a change")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        results.extend(run_scale(scale, args.repeat, args.cases))
+    with open(args.output, 'w') as f:
+        json.dump({'metadata': metadata(), 'scales': {scale: SCALES[scale] for scale in args.scales}, 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
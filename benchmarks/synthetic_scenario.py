@@ -0,0 +1,365 @@
+"""
+Synthetic Emme scenario folders for the benchmarks.
+
+Writes the transaction files of a scenario with a grid network, centroids with connectors,
+curved links, extra attributes, network fields, turns and transit lines running along the
+grid. The values are random, but the files have the layout of the files exported from Emme,
+so they can be read with get_emme_scenario. Run with
+
+    python benchmarks/synthetic_scenario.py path/to/scenario_directory --nodes 30000 --links 80000
+"""
+import argparse
+import csv
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+GRID_SPACING = 150.0
+ORIGIN = (25490000.0, 6670000.0)
+FIRST_NODE = 100000
+
+LINK_MODES = ['cvkyaf', 'chvkyaf', 'chvbgkyaf', 'bgde', 'cvyaf', 'hvkyaf']
+CONNECTOR_MODES = 'chvkyaf'
+LABELS = ['0', 'A', 'B', 'C', 'D', 'E', 'KX']
+STREETS = ["''", "'Mannerheimintie'", "'Hameentie'", "'Iso_Roobertinkatu'", "'Keha_I'"]
+OPERATORS = ["''", "'HSL'", "'Nobina'", "'Koiviston_Auto'"]
+STOP_NAMES = ["''", "'Kamppi'", "'Rautatientori'", "'Pasila'", "'Itakeskus'"]
+
+# Helmet link attributes that are present before the model has run
+HELMET_LINK_ATTRIBUTES = ['@hinta_aht', '@hinta_pt', '@hinta_iht', '@pyoratieluokka']
+# Parts of the names of the model result attributes
+RESULT_NAMES = ['car_work', 'car_leisure', 'truck', 'trailer_truck', 'van', 'bus', 'transit_work',
+                'transit_leisure', 'bike', 'time_freeflow', 'aux_transit', 'cost']
+NODE_RESULT_NAMES = ['transit_work_boa', 'transit_leisure_boa', 'transit_work_trb', 'transit_leisure_trb']
+SEGMENT_RESULT_NAMES = ['ccost', 'base_timtr', 'transit_work_vol', 'transit_leisure_vol', 'wait_time_dev']
+TIMES_OF_DAY = ['aht', 'pt', 'iht', 'vrk']
+
+# Mode, description, type, colour and the remaining columns of the modes file
+MODES = [
+    ('c', "'Car'", 'AUTO', 1, '0 0 0 0'),
+    ('h', "'Van'", 'AUX_AUTO', 2, '0 0 0 0 1'),
+    ('v', "'Truck'", 'AUX_AUTO', 3, '0 0 0 0 1'),
+    ('k', "'Trailer_truck'", 'AUX_AUTO', 4, '0 0 0 0 1'),
+    ('b', "'HSL_bus'", 'TRANSIT', 5, '0 0 0 0 1'),
+    ('g', "'Long_distance_bus'", 'TRANSIT', 6, '0 0 0 0 1'),
+    ('d', "'Express_bus'", 'TRANSIT', 7, '0 0 0 0 1'),
+    ('e', "'Trunk_bus'", 'TRANSIT', 8, '0 0 0 0 1'),
+    ('t', "'Tram'", 'TRANSIT', 9, '0 0 0 0 1'),
+    ('a', "'Aux_walk'", 'AUX_TRANSIT', 10, '0 0 0 0 4.5'),
+    ('f', "'Bike'", 'AUX_TRANSIT', 11, '0 0 0 0 15'),
+    ('y', "'Walk'", 'AUX_TRANSIT', 12, '0 0 0 0 4.5'),
+]
+# Vehicle, description, mode, fleet, seats and capacity
+VEHICLES = [(1, "'HSL_bus'", 'b', 0, 40, 80), (2, "'Long_distance_bus'", 'g', 0, 50, 70),
+            (3, "'Express_bus'", 'd', 0, 40, 80), (4, "'Trunk_bus'", 'e', 0, 60, 100), (5, "'Tram'", 't', 0, 80, 180)]
+
+
+def write_scenario(folder, nodes=10000, links=30000, centroids=500, transit_lines=300, segments_per_line=20,
+                   extra_link_attributes=20, extra_node_attributes=4, extra_segment_attributes=3, netfields=1,
+                   segment_netfields=0, curved_links=0.1, scen_number=1, seed=0):
+    """
+    Writes a synthetic scenario to folder.
+
+    Parameters
+    ----------
+    folder : str or Path
+        Scenario directory, created if it does not exist
+    nodes : int
+        Number of regular nodes, laid out in a square grid
+    links : int
+        Number of links between the regular nodes, at most about eight times the number of nodes.
+        Every centroid adds two connectors to these.
+    centroids : int
+        Number of centroids, numbered from 1
+    transit_lines : int
+        Number of transit lines
+    segments_per_line : int
+        Average number of segments of a transit line, limited by the width of the grid
+    extra_link_attributes, extra_node_attributes, extra_segment_attributes : int
+        Number of extra attributes in the extra_links, extra_nodes and extra_segments files
+    netfields : int
+        Number of network fields of the links and transit lines, 0 for no netfield files
+    segment_netfields : int
+        Number of network fields of the segments. The segments of a scenario that has both
+        extra_segments and netfield_segments files currently cannot be exported, because
+        both files have a loop_idx column.
+    curved_links : float
+        Share of the links with vertices in the link_shape file
+    scen_number : int
+        Scenario number in the file names
+    seed : int
+        Seed of the random values
+
+    Returns
+    -------
+    dict
+        Number of rows of the network and transit tables that were written
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    header = lambda kind: (f"c Modeller - {kind} Transaction\nc Date: 2024-01-01 00:00:00\n"
+                           f"c Project: Synthetic\nc Scenario {scen_number}: Synthetic {nodes} nodes\n")
+
+    side = max(2, int(np.ceil(np.sqrt(nodes))))
+    df_nodes = _grid_nodes(nodes, side, centroids, rng)
+    df_links = _links(nodes, links, side, df_nodes, centroids, rng)
+    node_ids = df_nodes['Node'].to_numpy()
+    route_nodes = _transit_routes(nodes, side, transit_lines, segments_per_line, rng)
+
+    with open(folder / f"base_network_{scen_number}.txt", 'w') as f:
+        f.write(header('Base Network') + "t nodes\nc Node X-coord Y-coord Data1 Data2 Data3 Label\n")
+        _write_rows(f, df_nodes)
+        f.write("t links\nc From To Length Modes Typ Lan VDF Data1 Data2 Data3\n")
+        _write_rows(f, df_links)
+
+    link_ids = df_links[['From', 'To']].rename(columns={'From': 'inode', 'To': 'jnode'})
+    link_names = _attribute_names(HELMET_LINK_ATTRIBUTES, RESULT_NAMES, extra_link_attributes)
+    _write_attributes(folder / f"extra_links_{scen_number}.txt", 'extra_attributes', 'LINK 0.0', link_ids,
+                      {name: _values(rng, len(link_ids)) for name in link_names})
+    node_names = _attribute_names([], NODE_RESULT_NAMES, extra_node_attributes)
+    _write_attributes(folder / f"extra_nodes_{scen_number}.txt", 'extra_attributes', 'NODE 0.0',
+                      pd.DataFrame({'inode': node_ids}), {name: _values(rng, len(node_ids)) for name in node_names})
+    if netfields:
+        _write_attributes(folder / f"netfield_links_{scen_number}.txt", 'network_fields', 'LINK STRING', link_ids,
+                          {f'#street{i or ""}': rng.choice(STREETS, len(link_ids)) for i in range(netfields)})
+    _write_link_shape(folder / f"link_shape_{scen_number}.txt", header('Link Shape'), df_links, df_nodes, curved_links, rng)
+
+    with open(folder / f"modes_{scen_number}.txt", 'w') as f:
+        f.write(header('Mode') + "t modes\nc Mode Description Type Colour Cost_time Cost_dist Energy_time Energy_dist Speed_factor\n")
+        f.writelines(f"a {mode} {description} {kind} {colour} {rest}\n" for mode, description, kind, colour, rest in MODES)
+    with open(folder / f"vehicles_{scen_number}.txt", 'w') as f:
+        f.write(header('Vehicle') + "t vehicles\nc Veh Description Mode Fleet Seats Capacity\n")
+        f.writelines(f"a {' '.join(map(str, vehicle))}\n" for vehicle in VEHICLES)
+    turns = _turns(nodes, side, links, rng)
+    with open(folder / f"turns_{scen_number}.txt", 'w') as f:
+        f.write(header('Turn') + "t turns\nc At From To Pen Tpf Data1 Data2 Data3\n")
+        _write_rows(f, turns)
+
+    codes = _line_codes(len(route_nodes))
+    _write_transit_lines(folder / f"transit_lines_{scen_number}.txt", header('Transit Line'), codes, route_nodes, rng)
+    quoted_codes = np.array([f"'{code.ljust(6)}'" for code in codes])
+    _write_attributes(folder / f"extra_transit_lines_{scen_number}.txt", 'extra_attributes', 'TRANSIT_LINE 0.0',
+                      pd.DataFrame({'line': quoted_codes}),
+                      {f'@hw_{time}': rng.choice([5, 7.5, 10, 15, 30, 999], len(codes)) for time in ['aht', 'pt', 'iht']})
+    segments = pd.DataFrame({
+        'line': np.repeat(quoted_codes, [len(route) for route in route_nodes]),
+        'inode': np.concatenate(route_nodes) if route_nodes else np.zeros(0, dtype='int64'),
+        'jnode': np.concatenate([np.append(route[1:], 0) for route in route_nodes]).astype(str) if route_nodes else [],
+        'loop_idx': 1,
+    })
+    # The last segment of a line has no jnode
+    segments['jnode'] = segments['jnode'].where(segments['jnode'] != '0', 'None')
+    segment_names = _attribute_names([], SEGMENT_RESULT_NAMES, extra_segment_attributes)
+    _write_attributes(folder / f"extra_segments_{scen_number}.txt", 'extra_attributes', 'TRANSIT_SEGMENT 0.0', segments,
+                      {name: _values(rng, len(segments)) for name in segment_names})
+    if netfields:
+        _write_attributes(folder / f"netfield_transit_lines_{scen_number}.txt", 'network_fields', 'TRANSIT_LINE STRING',
+                          pd.DataFrame({'line': quoted_codes}),
+                          {f'#operator{i or ""}': rng.choice(OPERATORS, len(codes)) for i in range(netfields)})
+    if segment_netfields:
+        _write_attributes(folder / f"netfield_segments_{scen_number}.txt", 'network_fields', 'TRANSIT_SEGMENT STRING', segments,
+                          {f'#stopname{i or ""}': rng.choice(STOP_NAMES, len(segments)) for i in range(segment_netfields)})
+    return {'nodes': len(df_nodes), 'links': len(df_links), 'transit_lines': len(codes), 'segments': len(segments)}
+
+
+def _grid_nodes(nodes, side, centroids, rng):
+    position = np.arange(nodes)
+    regular = pd.DataFrame({
+        'c': 'a',
+        'Node': FIRST_NODE + position,
+        'X-coord': np.round(ORIGIN[0] + (position % side) * GRID_SPACING + rng.random(nodes) * 20, 3),
+        'Y-coord': np.round(ORIGIN[1] + (position // side) * GRID_SPACING + rng.random(nodes) * 20, 3),
+        'Data1': 0,
+        'Data2': rng.choice([0, 0.5, 1], nodes),
+        'Data3': rng.integers(0, 4, nodes),
+        'Label': rng.choice(LABELS, nodes),
+    })
+    extent = side * GRID_SPACING
+    centroid_nodes = pd.DataFrame({
+        'c': 'a*',
+        'Node': np.arange(1, centroids + 1),
+        'X-coord': np.round(ORIGIN[0] + rng.random(centroids) * extent, 3),
+        'Y-coord': np.round(ORIGIN[1] + rng.random(centroids) * extent, 3),
+        'Data1': 0,
+        'Data2': 0,
+        'Data3': 0,
+        'Label': rng.choice(LABELS, centroids),
+    })
+    return pd.concat([centroid_nodes, regular], ignore_index=True)
+
+
+def _links(nodes, links, side, df_nodes, centroids, rng):
+    # The neighbours to the right, below and on the two diagonals, in both directions. The links
+    # to the right are taken first, so that the transit lines along the rows have their links.
+    position = np.arange(nodes)
+    column = position % side
+    pairs = []
+    for offset, valid in [(1, column < side - 1), (side, True), (side + 1, column < side - 1), (side - 1, column > 0)]:
+        start = position[valid & (position + offset < nodes)]
+        both = np.concatenate([np.column_stack([start, start + offset]), np.column_stack([start + offset, start])])
+        pairs.append(both[rng.permutation(len(both))])
+    pairs = np.concatenate(pairs)[:links] + FIRST_NODE
+    if centroids:
+        targets = FIRST_NODE + rng.integers(0, nodes, centroids)
+        centroid_ids = np.arange(1, centroids + 1)
+        pairs = np.concatenate([pairs, np.column_stack([centroid_ids, targets]), np.column_stack([targets, centroid_ids])])
+    coords = df_nodes.set_index('Node')[['X-coord', 'Y-coord']]
+    start, end = coords.loc[pairs[:, 0]].to_numpy(), coords.loc[pairs[:, 1]].to_numpy()
+    is_connector = (pairs < FIRST_NODE).any(axis=1)
+    count = len(pairs)
+    df_links = pd.DataFrame({
+        'c': 'a',
+        'From': pairs[:, 0],
+        'To': pairs[:, 1],
+        'Length': np.round(np.hypot(*(end - start).T) / 1000, 3),
+        'Modes': np.where(is_connector, CONNECTOR_MODES, rng.choice(LINK_MODES, count)),
+        'Typ': np.where(is_connector, 99, rng.integers(1, 700, count)),
+        'Lan': rng.choice([1, 2, 3], count),
+        'VDF': np.where(is_connector, 0, rng.integers(1, 7, count)),
+        'Data1': rng.choice([0, 1.5], count),
+        'Data2': 0,
+        'Data3': rng.integers(0, 10, count),
+    })
+    return df_links.sort_values(['From', 'To'], ignore_index=True)
+
+
+def _transit_routes(nodes, side, transit_lines, segments_per_line, rng):
+    # The lines run along the full rows of the grid, in either direction
+    full_rows = nodes // side
+    if not full_rows or not transit_lines:
+        return []
+    routes = []
+    for _ in range(transit_lines):
+        length = int(min(side - 1, max(1, rng.integers(segments_per_line // 2, segments_per_line * 3 // 2 + 1))))
+        row = rng.integers(0, full_rows)
+        first = rng.integers(0, side - length)
+        route = FIRST_NODE + row * side + first + np.arange(length + 1)
+        routes.append(route[::-1] if rng.random() < 0.5 else route)
+    return routes
+
+
+def _turns(nodes, side, links, rng):
+    # Straight turns along the rows, through the nodes that have links on both sides
+    position = np.arange(nodes)
+    at = position[(position % side > 0) & (position % side < side - 1) & (position + 1 < nodes)]
+    at = rng.choice(at, min(len(at), max(1, links // 10)), replace=False) if len(at) else at
+    at = np.sort(at)
+    count = len(at)
+    return pd.DataFrame({
+        'c': 'a',
+        'At': FIRST_NODE + at,
+        'From': FIRST_NODE + at - 1,
+        'To': FIRST_NODE + at + 1,
+        'Pen': 0,
+        'Tpf': rng.choice([0, 1, 2], count),
+        'Data1': rng.choice([0, 1.5], count),
+        'Data2': 0,
+        'Data3': 0,
+    })
+
+
+def _write_link_shape(path, header, df_links, df_nodes, curved_links, rng):
+    # Vertices between the end nodes of a sample of the links, displaced from the straight line
+    curved = df_links[(df_links[['From', 'To']] >= FIRST_NODE).all(axis=1)]
+    curved = curved.iloc[np.sort(rng.choice(len(curved), int(len(curved) * curved_links), replace=False))]
+    vertex_count = rng.integers(1, 4, len(curved))
+    coords = df_nodes.set_index('Node')[['X-coord', 'Y-coord']]
+    start = np.repeat(coords.loc[curved['From']].to_numpy(), vertex_count, axis=0)
+    end = np.repeat(coords.loc[curved['To']].to_numpy(), vertex_count, axis=0)
+    vertex_no = np.concatenate([np.arange(1, count + 1) for count in vertex_count]) if len(curved) else np.zeros(0, dtype='int64')
+    share = vertex_no / (np.repeat(vertex_count, vertex_count) + 1)
+    points = start + (end - start) * share[:, None] + rng.normal(0, 3, start.shape)
+    vertices = pd.DataFrame({
+        'c': 'a',
+        'I_Node': np.repeat(curved['From'].to_numpy(), vertex_count),
+        'J_Node': np.repeat(curved['To'].to_numpy(), vertex_count),
+        'Vertex_No.': vertex_no,
+        'X-Coord': np.round(points[:, 0], 2),
+        'Y-Coord': np.round(points[:, 1], 2),
+    })
+    with open(path, 'w') as f:
+        f.write(header + "c I_Node J_Node Vertex_No. X-Coord Y-Coord\nt linkvertices\n")
+        _write_rows(f, vertices)
+
+
+def _write_transit_lines(path, header, codes, route_nodes, rng):
+    modes = [vehicle[2] for vehicle in VEHICLES]
+    with open(path, 'w') as f:
+        f.write(header + "t lines\nc Transit Lines\nc Line  Mod Veh Headwy Speed Description             Data1  Data2  Data3\n")
+        for code, route in zip(codes, route_nodes):
+            vehicle = rng.integers(0, len(VEHICLES))
+            description = f"'{route[0]}-{route[-1]}'"
+            block = [f"a'{code}' {modes[vehicle]}   {VEHICLES[vehicle][0]}  {rng.choice([5, 7.5, 10, 15]):.2f}  {40:.2f} {description:<20}      0      {rng.integers(0, 3)}      0\n",
+                     "  path=no\n"]
+            dwt = rng.choice(['+0.01', '#0.01', '>0.5'], len(route))
+            ttf = rng.integers(1, 4, len(route))
+            block.extend(f"   {node}      dwt={dwt[i]}   ttf={ttf[i]}   us1=0   us2=0   us3=0\n" for i, node in enumerate(route[:-1]))
+            block.append(f"   {route[-1]}        lay=3\n")
+            # The line ends with the dwell time of its first stop
+            block.append(f"c '{code}' first:      dwt={dwt[0]} hidden:    us1=0   us2=0   us3=0\n")
+            f.writelines(block)
+
+
+def _line_codes(count):
+    return [f"{i % 10000:04d}{chr(ord('A') + i // 10000 % 26)}{1 + i % 2}" for i in range(count)]
+
+
+def _attribute_names(fixed, result_names, count):
+    names = list(fixed[:count])
+    i = 0
+    while len(names) < count:
+        name = result_names[i % len(result_names)]
+        time = TIMES_OF_DAY[i // len(result_names) % len(TIMES_OF_DAY)]
+        repeat = i // (len(result_names) * len(TIMES_OF_DAY))
+        names.append(f"@{name}{repeat or ''}_{time}")
+        i += 1
+    return names
+
+
+def _values(rng, count):
+    # Mostly zeros and short decimals, like the attributes of the exported scenarios
+    values = np.round(rng.exponential(50, count), rng.integers(0, 4))
+    return np.where(rng.random(count) < 0.3, 0, values)
+
+
+def _write_attributes(path, kind, definition, ids, attributes):
+    # extra_attributes and network_fields files: the definitions, then a table with a header row
+    table = pd.concat([ids.reset_index(drop=True), pd.DataFrame(attributes)], axis=1)
+    with open(path, 'w') as f:
+        f.write(f"t {kind}\n")
+        f.writelines(f"{name} {definition} ''\n" for name in attributes)
+        f.write(f"end {kind}\n")
+        f.write(' '.join(table.columns) + '\n')
+        _write_rows(f, table)
+
+
+def _write_rows(file, df):
+    df.to_csv(file, sep=' ', header=False, index=False, lineterminator='\n', quoting=csv.QUOTE_NONE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Emme scenario")
+    parser.add_argument("folder")
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--links", type=int, default=30000)
+    parser.add_argument("--centroids", type=int, default=500)
+    parser.add_argument("--transit-lines", type=int, default=300)
+    parser.add_argument("--segments-per-line", type=int, default=20)
+    parser.add_argument("--extra-link-attributes", type=int, default=20)
+    parser.add_argument("--extra-node-attributes", type=int, default=4)
+    parser.add_argument("--extra-segment-attributes", type=int, default=3)
+    parser.add_argument("--netfields", type=int, default=1)
+    parser.add_argument("--segment-netfields", type=int, default=0)
+    parser.add_argument("--curved-links", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    sizes = write_scenario(args.folder, args.nodes, args.links, args.centroids, args.transit_lines, args.segments_per_line,
+                           args.extra_link_attributes, args.extra_node_attributes, args.extra_segment_attributes,
+                           args.netfields, args.segment_netfields, args.curved_links, seed=args.seed)
+    print(', '.join(f"{count} {name}" for name, count in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Benchmark for the shared transaction table tokenizer.
+
+Writes a synthetic file of each type that uses the 't ... / end ...' header layout and
+compares transaction_parser.read_table based parsers against the previous line by line
+implementations, which are kept here for reference. Run with
+
+    python benchmarks/transaction_tables.py --rows 200000
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from helmet_utils.network import transaction_parser
+
+STOP_NAMES = ['', 'Stop_A', 'Stop_B', 'Rautatientori', 'Kamppi']
+STREETS = ['', 'Mannerheimintie', 'Hameentie', 'Iso Roobertinkatu']
+
+
+def write_extra_links(path, rows, rnd):
+    with open(path, 'w') as f:
+        f.write("t extra_attributes\n@hinta_aht LINK 0.0 ''\n@pyoratieluokka LINK 0.0 ''\n@car_work_aht LINK 0.0 ''\nend extra_attributes\n")
+        f.write("inode jnode @hinta_aht @pyoratieluokka @car_work_aht\n")
+        for i in range(rows):
+            f.write(f"{100000 + i} {100001 + i} {rnd.choice(['0', '0.5', '1.25'])} {rnd.randint(0, 4)} {rnd.random() * 100:.6g}\n")
+
+
+def write_netfield_links(path, rows, rnd):
+    with open(path, 'w') as f:
+        f.write("t network_fields\n#street LINK STRING 'street'\nend network_fields\ninode jnode #street\n")
+        for i in range(rows):
+            f.write(f"{100000 + i} {100001 + i} '{rnd.choice(STREETS[:3])}'\n")
+
+
+def _segment_rows(rows, rnd):
+    line, segment = 0, 0
+    for i in range(rows):
+        if segment == 0 or rnd.random() < 0.03:
+            line, segment = line + 1, 0
+        segment += 1
+        yield f"'{1000 + line}N2'", 100000 + i, 100001 + i
+
+
+def write_extra_segments(path, rows, rnd):
+    with open(path, 'w') as f:
+        f.write("t extra_attributes\n@ccost TRANSIT_SEGMENT 0.0 ''\n@base_timtr TRANSIT_SEGMENT 0.0 ''\nend extra_attributes\n")
+        f.write("line inode jnode loop_idx @ccost @base_timtr\n")
+        for line, inode, jnode in _segment_rows(rows, rnd):
+            f.write(f"{line} {inode} {jnode} 1 {rnd.choice(['0', '0.25'])} {rnd.choice(['1', '2.125'])}\n")
+
+
+def write_netfield_segments(path, rows, rnd):
+    with open(path, 'w') as f:
+        f.write("t network_fields\n#stopname TRANSIT_SEGMENT STRING ''\nend network_fields\n")
+        f.write("line inode jnode loop_idx #stopname\n")
+        for line, inode, jnode in _segment_rows(rows, rnd):
+            f.write(f"{line} {inode} {jnode} 1 '{rnd.choice(STOP_NAMES[:3])}'\n")
+
+
+def write_netfield_transit_lines(path, rows, rnd):
+    with open(path, 'w') as f:
+        f.write("t network_fields\n#operator TRANSIT_LINE STRING ''\nend network_fields\nline #operator\n")
+        for i in range(rows):
+            f.write(f"'{i}N2' '{rnd.choice(['', 'HSL', 'Nobina'])}'\n")
+
+
+def write_extra_transit_lines(path, rows, rnd):
+    with open(path, 'w') as f:
+        f.write("t extra_attributes\n@hw_aht TRANSIT_LINE 0.0 ''\n@hw_pt TRANSIT_LINE 0.0 ''\n@hw_iht TRANSIT_LINE 0.0 ''\nend extra_attributes\n")
+        f.write("line @hw_aht @hw_pt @hw_iht\n")
+        for i in range(rows):
+            f.write(f"'{i}N2' {rnd.choice(['5', '7.5', '10'])} {rnd.choice(['5', '10'])} {rnd.choice(['10', '999'])}\n")
+
+
+def _transaction_header(f, name):
+    f.write(f"c Modeller - {name} Transaction\nc Date: 2024-01-01 00:00:00\nc Project: Benchmark\nc Scenario 1: Synthetic\n")
+
+
+def write_modes(path, rows, rnd):
+    with open(path, 'w') as f:
+        _transaction_header(f, 'Mode')
+        f.write("t modes\nc Mode Description Type Colour Cost_time Cost_dist Energy_time Energy_dist Speed_factor\n")
+        for i in range(rows):
+            speed_factor = f" {rnd.choice(['1', '4.5'])}" if i % 2 else ''
+            f.write(f"a m{i} 'Mode{i}' {rnd.choice(['AUTO', 'TRANSIT', 'AUX_TRANSIT'])} {rnd.randint(1, 9)} 0 0 0 0{speed_factor}\n")
+
+
+def write_turns(path, rows, rnd):
+    with open(path, 'w') as f:
+        _transaction_header(f, 'Turn')
+        f.write("t turns\nc At From To Pen Tpf Data1 Data2 Data3\n")
+        for i in range(rows):
+            f.write(f"a {100000 + i} {100001 + i} {100002 + i} 0 {rnd.randint(0, 2)} {rnd.choice(['0', '1.5'])} 0 0\n")
+
+
+def write_vehicles(path, rows, rnd):
+    with open(path, 'w') as f:
+        _transaction_header(f, 'Vehicle')
+        f.write("t vehicles\nc Veh Description Mode Fleet Seats Capacity\n")
+        for i in range(rows):
+            f.write(f"a {i} 'Vehicle{i}' {rnd.choice('btmrpw')} 0 {rnd.randint(20, 80)} {rnd.randint(40, 300)}\n")
+
+
+# Line by line implementations that the tokenizer replaced
+
+def _legacy_skip_header(file, end_marker):
+    while True:
+        line = file.readline()
+        if line.startswith(end_marker) or not line:
+            return
+
+
+def legacy_read_extra_attributes(path):
+    with open(path, 'r') as file:
+        _legacy_skip_header(file, 'end extra_attributes')
+        columns = file.readline().strip().split()
+        return pd.read_csv(file, names=columns, sep=r'\s+')
+
+
+def legacy_read_netfield_links(path):
+    with open(path, 'r') as file:
+        _legacy_skip_header(file, 'end network_fields')
+        columns = file.readline().strip().split()
+        return pd.read_csv(file, names=columns, sep=r'\s+')
+
+
+def legacy_read_extra_segments(path):
+    data = []
+    with open(path, 'r') as file:
+        _legacy_skip_header(file, 'end extra_attributes')
+        columns = file.readline().strip().split()
+        columns.append('Segment_num')
+        current_line_id = None
+        segment_num = 0
+        for line in file.readlines():
+            parts = line.strip().split("'")
+            line_id = str(parts[1]).strip()
+            if line_id != current_line_id:
+                current_line_id = line_id
+                segment_num = 1
+            else:
+                segment_num += 1
+            data.append([line_id] + parts[2].strip().split() + [segment_num])
+    return pd.DataFrame(data, columns=columns).rename(columns={'line': 'Line', 'segment_num': 'Segment_num'})
+
+
+def legacy_read_netfield_segments(path):
+    data = []
+    with open(path, 'r') as file:
+        _legacy_skip_header(file, 'end network_fields')
+        columns = file.readline().strip().split()
+        columns.append('segment_num')
+        current_line_id = None
+        segment_num = 0
+        for line in file.readlines():
+            parts = line.strip().split("'")
+            line_id = parts[1].strip()
+            if line_id != current_line_id:
+                current_line_id = line_id
+                segment_num = 1
+            else:
+                segment_num += 1
+            data.append([line_id] + parts[2].strip().split() + [parts[3]] + [segment_num])
+    return pd.DataFrame(data, columns=columns).rename(columns={'line': 'Line', 'segment_num': 'Segment_num'})
+
+
+def legacy_read_netfield_transit_lines(path):
+    data = []
+    with open(path, 'r') as file:
+        _legacy_skip_header(file, 'end network_fields')
+        columns = file.readline().strip().split()
+        for line in file.readlines():
+            parts = re.split(r"'\s+'", line.strip())
+            data.append([part.strip("'").strip() for part in parts])
+    return pd.DataFrame(data, columns=columns)
+
+
+def legacy_read_extra_transit_lines(path):
+    with open(path, 'r') as file:
+        _legacy_skip_header(file, 'end extra_attributes')
+        columns = file.readline().strip().split()
+        columns[0] = 'Line'
+        rows = []
+        for line in file.readlines():
+            sections = line.split()
+            linenum = sections[0].strip("'").strip()
+            try:
+                aht, pt, iht = sections[2:]
+            except ValueError:
+                aht, pt, iht = sections[1:]
+            rows.append([linenum, aht, pt, iht])
+    return pd.DataFrame(rows, columns=columns)
+
+
+def legacy_read_modes(path):
+    with open(path, 'r') as file:
+        lines = file.readlines()
+    columns = lines[5].strip().split()
+    data = []
+    for line in lines[6:]:
+        parts = line.strip().split("'")
+        marker, id = parts[0].strip().split()
+        rest = parts[2].strip().split()
+        data.append([marker, id, f"'{parts[1]}'", rest[0], rest[1]] + [rest[i] if len(rest) > i else None for i in range(2, 7)])
+    return pd.DataFrame(data, columns=columns)
+
+
+def legacy_read_split_lines(path):
+    with open(path, 'r') as file:
+        lines = file.readlines()
+    columns = lines[5].strip().split()
+    return pd.DataFrame([line.strip().split() for line in lines[6:]], columns=columns)
+
+
+FILE_TYPES = {
+    'extra_links': (write_extra_links, legacy_read_extra_attributes, lambda path: transaction_parser.read_extra_attributes(path)[0]),
+    'netfield_links': (write_netfield_links, legacy_read_netfield_links, transaction_parser.read_netfield_links),
+    'extra_segments': (write_extra_segments, legacy_read_extra_segments, transaction_parser.read_extra_segments),
+    'netfield_segments': (write_netfield_segments, legacy_read_netfield_segments, transaction_parser.read_netfield_segments),
+    'netfield_transit_lines': (write_netfield_transit_lines, legacy_read_netfield_transit_lines, transaction_parser.read_netfield_transit_lines),
+    'extra_transit_lines': (write_extra_transit_lines, legacy_read_extra_transit_lines, transaction_parser.read_extra_transit_lines),
+    'modes': (write_modes, legacy_read_modes, transaction_parser.read_modes),
+    'turns': (write_turns, legacy_read_split_lines, transaction_parser.read_turns),
+    'vehicles': (write_vehicles, legacy_read_split_lines, transaction_parser.read_vehicles),
+}
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transaction table tokenizer")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--types", nargs='+', choices=list(FILE_TYPES), default=list(FILE_TYPES))
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    print(f"{'file type':<24}{'legacy s':>10}{'tokenizer s':>13}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.types:
+            write, legacy_read, read = FILE_TYPES[name]
+            path = Path(tmp) / f"{name}_1.txt"
+            write(path, args.rows, rnd)
+            legacy_time, legacy_df = best_of(lambda: legacy_read(path), args.repeat)
+            new_time, df = best_of(lambda: read(path), args.repeat)
+            pd.testing.assert_frame_equal(legacy_df, df, check_dtype=False)
+            print(f"{name:<24}{legacy_time:>10.3f}{new_time:>13.3f}{legacy_time / new_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
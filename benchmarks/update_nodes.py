@@ -0,0 +1,79 @@
+"""
+Benchmark for EmmeNetwork.update_nodes.
+
+Reads a synthetic base network and updates the attributes and locations of a random sample of
+its nodes, with the keyed bulk update and with the previous loop over the updated nodes, which is
+kept here for reference. Run with
+
+    python benchmarks/update_nodes.py --nodes 30000 --links 80000 --updated 2000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from base_network_parser import write_base_network
+from helmet_utils.network.scenario_reader import ScenarioReader
+
+
+def legacy_update_nodes(network, updated_nodes):
+    """The loop that the bulk update replaced, it only updates the links from the nodes."""
+    for _, node in updated_nodes.iterrows():
+        node_id = node['Node']
+        network.loc[network['From'] == node_id, 'geometry'] = node['geometry']
+        network.loc[network['From'] == node_id, 'is_centroid'] = node['is_centroid']
+        for col in node.index:
+            if col not in ['Node', 'geometry', 'is_centroid']:
+                network.loc[network['From'] == node_id, f'{col}_from'] = node[col]
+
+
+def updated_sample(network, size, seed=0):
+    rng = np.random.default_rng(seed)
+    nodes = network.nodes
+    nodes = nodes.iloc[rng.choice(len(nodes), size=min(size, len(nodes)), replace=False)]
+    updated = nodes[['Node', 'geometry', 'is_centroid', 'Data2', 'Data3']].copy()
+    updated['Data2'] = rng.integers(0, 5, len(updated)).astype('float64')
+    updated['Data3'] = rng.random(len(updated))
+    points = updated.geometry.to_numpy()
+    updated['geometry'] = shapely.points(shapely.get_x(points) + 1.0, shapely.get_y(points) + 1.0)
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EmmeNetwork.update_nodes")
+    parser.add_argument("--nodes", type=int, default=30000)
+    parser.add_argument("--links", type=int, default=80000)
+    parser.add_argument("--updated", type=int, default=2000)
+    parser.add_argument("--skip-legacy", action='store_true', help="Only time the bulk update")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_base_network(Path(tmp) / "base_network_1.txt", args.nodes, args.links)
+        network = ScenarioReader(tmp).network()
+        legacy_network = ScenarioReader(tmp).network()
+    updated = updated_sample(network, args.updated)
+
+    start = time.perf_counter()
+    network.update_nodes(updated)
+    bulk_time = time.perf_counter() - start
+    print(f"{len(network)} links, {len(updated)} updated nodes")
+    print(f"bulk update: {bulk_time:.3f} s")
+    if args.skip_legacy:
+        return
+
+    start = time.perf_counter()
+    legacy_update_nodes(legacy_network, updated)
+    legacy_time = time.perf_counter() - start
+    # The loop only updated the '_from' columns, the bulk update also updates the '_to' columns
+    for col in ['Data2_from', 'Data3_from']:
+        pd.testing.assert_series_equal(legacy_network[col], network[col], check_dtype=False)
+    print(f"legacy loop: {legacy_time:.3f} s")
+    print(f"speedup:     {legacy_time / bulk_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,13 @@ import webbrowser
 import geopandas as gpd
 import pandas as pd
 import numpy as np
+import shapely
 from pandas.api.types import is_float_dtype, is_integer_dtype
 from datetime import datetime
 from shapely.ops import Point
-from tabulate import tabulate
 from .height_data import HeightData
+from . import geometry
+from . import fixed_width
 from pathlib import Path
 import os  # Add this import
 
@@ -30,6 +32,23 @@ class EmmeNetwork(gpd.GeoDataFrame):
         super().__setitem__(key, value)
         if isinstance(value, gpd.GeoDataFrame):
             self.__dict__.update(value.__dict__)
+            self.reset_nodes()
+            self.reset_graphs()
+            self.reset_links()
+            self.reset_spatial_indexes()
+        else:
+            self._reset_affected(key)
+
+    def _reset_affected(self, key):
+        # Discards the cached tables and indexes that depend on the replaced columns
+        if self._affects_nodes(key):
+            self.reset_nodes()
+        if self._affects_graphs(key):
+            self.reset_graphs()
+        if self._affects_links(key):
+            self.reset_links()
+        if self._affects_spatial_indexes(key):
+            self.reset_spatial_indexes()
 
     def visualize(self, visualization_type='default', column=None, cmap=None):
         to_be_visualized = self[self['To']>0].copy()
@@ -57,55 +76,385 @@ class EmmeNetwork(gpd.GeoDataFrame):
 
     @property
     def nodes(self):
-        # Create a list to store node data
-        nodes_data = []
-        
-        # Identify all columns with '_from' suffix
-        from_columns = [col for col in self.columns if col.endswith('_from')]
-        
-        # Iterate through all links (rows) in the network
-        for _, link in self.iterrows():            
-            # Extract the first point of the linestring geometry
-            from_geometry = Point(link.geometry.coords[0])
-            
-            # Check if 'From' node is a centroid
-            from_is_centroid = 1 if link['c_from'].startswith('a*') else 0
-            
-            # Extract the attributes for the 'From' node
-            node_data = {'Node': link['From'], 
-                         'geometry': from_geometry, 
-                         'is_centroid': from_is_centroid}
-            
-            for col in from_columns:
-                node_data[col.replace('_from', '')] = link[col]
-            
-            nodes_data.append(node_data)
-
-        # Create a DataFrame from the nodes data
-        nodes_df = pd.DataFrame(nodes_data)
-        unique_nodes_df = nodes_df.drop_duplicates(subset='Node')
-        nodes_gdf = gpd.GeoDataFrame(unique_nodes_df, geometry='geometry', crs=self.crs)
+        """
+        The nodes of the network, one row per node indexed by the node id.
+
+        The node attributes come from the '_from' columns and the geometry is the start point
+        of the first link from each node. The table is built once with vectorized operations
+        and kept until the links, their geometries or their '_from' columns are changed through
+        the network. Changes made in place with .loc are not detected, call reset_nodes after them.
+        """
+        nodes = self.__dict__.get('_nodes')
+        if nodes is None:
+            nodes = self._build_nodes()
+            object.__setattr__(self, '_nodes', nodes)
+        return nodes.copy()
+
+    def reset_nodes(self):
+        """
+        Discards the cached node table, so that it is built again on the next access.
+        """
+        self.__dict__.pop('_nodes', None)
+
+    def _build_nodes(self):
+        # The first link from each node, in the order of the links
+        links = self[~self['From'].duplicated().to_numpy()]
+        geometries = links.geometry.to_numpy()
+        # Orphan nodes are Points, the nodes of the other links are the start points of their LineStrings
+        is_point = shapely.get_type_id(geometries) == 0
+        nodes = pd.DataFrame({
+            'Node': links['From'].to_numpy(),
+            'geometry': np.where(is_point, geometries, shapely.get_point(geometries, 0)),
+            'is_centroid': links['c_from'].astype(str).str.startswith('a*').astype('int64').to_numpy(),
+        }, index=links['From'].to_numpy())
+        for col in [col for col in self.columns if col.endswith('_from')]:
+            nodes[col.replace('_from', '')] = links[col].to_numpy()
+        nodes_gdf = gpd.GeoDataFrame(nodes, geometry='geometry', crs=self.crs)
         nodes_gdf = self._add_hsl_extra_attribute(nodes_gdf)
-        nodes_gdf = nodes_gdf.sort_values(by='Node', ascending=True)
+        return nodes_gdf.sort_values(by='Node', ascending=True)
+
+    @staticmethod
+    def _affects_nodes(key):
+        keys = key if isinstance(key, (list, tuple, pd.Index)) else [key]
+        return any(not isinstance(k, str) or k in ('From', 'geometry') or k.endswith('_from') for k in keys)
+
+    def graph(self, modes=None, weight='Length'):
+        """
+        Returns the links of the network as a NetworkGraph, a sparse adjacency matrix over the
+        node ids for vectorized shortest path, reachability and neighbor queries. Requires scipy.
+
+        Parameters
+        ----------
+        modes : str, optional
+            Only the links that allow any of these modes are included, e.g. 'c' for the car
+            network. By default all links are included.
+        weight : str or None
+            Column of the link weights, None to give every link the weight 1
+
+        The graph is built once per modes and weight and kept until From, To, Modes or the
+        weight column are replaced. Changes made in place with .loc are not detected, call
+        reset_graphs after them.
+        """
+        from .network_graph import NetworkGraph
+        graphs = self.__dict__.get('_graphs', {})
+        key = (modes, weight)
+        if key not in graphs:
+            # A new dict, so that copies of the network that share the cache do not get the graph
+            graphs = {**graphs, key: NetworkGraph.from_network(self, modes=modes, weight=weight)}
+            object.__setattr__(self, '_graphs', graphs)
+        return graphs[key]
+
+    def reset_graphs(self):
+        """
+        Discards the cached graphs, so that they are built again on the next access.
+        """
+        self.__dict__.pop('_graphs', None)
+
+    def _affects_graphs(self, key):
+        graphs = self.__dict__.get('_graphs')
+        if not graphs:
+            return False
+        keys = key if isinstance(key, (list, tuple, pd.Index)) else [key]
+        columns = {'From', 'To', 'Modes'} | {weight for _, weight in graphs}
+        return any(not isinstance(k, str) or k in columns for k in keys)
+
+    def link(self, i, j):
+        """
+        Returns the attributes of the link from node i to node j as a Series, found in the
+        link index. Raises a KeyError if the network has no such link.
+        """
+        return self.iloc[self.link_positions([i], [j])[0]]
+
+    def link_positions(self, from_nodes, to_nodes, missing='raise'):
+        """
+        Returns the row positions of the links from from_nodes to to_nodes, which are arrays of the
+        same length. Links that are not in the network raise a KeyError, or get the position -1
+        if missing is 'ignore'.
+
+        The positions are looked up in a hash index of the (From, To) pairs, which is built once
+        and kept until From or To are replaced, links are dropped or the rows are sorted in place.
+        Changes of From or To made in place with .loc or iloc are not detected, call reset_links
+        after them.
+        """
+        from_nodes = np.atleast_1d(np.asarray(from_nodes, dtype='int64'))
+        to_nodes = np.atleast_1d(np.asarray(to_nodes, dtype='int64'))
+        if len(from_nodes) != len(to_nodes):
+            raise ValueError("from_nodes and to_nodes must have the same length")
+        positions = self._indexed_links().get_indexer(_link_keys(from_nodes, to_nodes))
+        if missing == 'raise' and (positions < 0).any():
+            unknown = list(zip(from_nodes[positions < 0][:10].tolist(), to_nodes[positions < 0][:10].tolist()))
+            raise KeyError(f"{(positions < 0).sum()} links not in the network: {unknown}")
+        return positions
+
+    def set_link_attributes(self, attributes, missing='raise'):
+        """
+        Sets the attributes of many links at once. attributes is a DataFrame keyed by the links,
+        with From and To columns or a (From, To) index, and every other column of it is written to
+        the column of the same name on its links. New columns are created with missing values on
+        the other links. A link that is repeated gets the values of its last row.
+
+        Links that are not in the network raise a KeyError, or are skipped if missing is 'ignore'.
+        """
+        if not {'From', 'To'} <= set(attributes.columns):
+            attributes = attributes.reset_index()
+            if not {'From', 'To'} <= set(attributes.columns):
+                raise KeyError("The attributes must have From and To columns or a (From, To) index")
+        attributes = attributes.drop_duplicates(['From', 'To'], keep='last')
+        positions = self.link_positions(attributes['From'].to_numpy(), attributes['To'].to_numpy(), missing=missing)
+        # Row of attributes of every link of the network, -1 for the links that are not set
+        rows = np.full(len(self), -1)
+        found = positions >= 0
+        rows[positions[found]] = np.flatnonzero(found)
+        columns = [col for col in attributes.columns if col not in ('From', 'To')]
+        for col in columns:
+            self._replace_rows(col, rows, attributes[col].to_numpy())
+        self._reset_affected(columns)
+
+    def reset_links(self):
+        """
+        Discards the cached link index, so that it is built again on the next lookup. Needed
+        after From or To have been changed in place, e.g. network.loc[mask, 'To'] = ...
+        """
+        self.__dict__.pop('_link_index', None)
+
+    def _indexed_links(self):
+        index = self.__dict__.get('_link_index')
+        # Added or removed rows are detected by the length, the positions would be wrong otherwise
+        if index is None or len(index) != len(self):
+            index = pd.Index(_link_keys(self['From'].to_numpy('int64'), self['To'].to_numpy('int64')))
+            if not index.is_unique:
+                duplicated = self[index.duplicated()]
+                raise ValueError(f"{len(duplicated)} links are repeated in the network, e.g. "
+                                 f"{list(zip(duplicated['From'][:5].tolist(), duplicated['To'][:5].tolist()))}")
+            object.__setattr__(self, '_link_index', index)
+        return index
+
+    @staticmethod
+    def _affects_links(key):
+        keys = key if isinstance(key, (list, tuple, pd.Index)) else [key]
+        return any(not isinstance(k, str) or k in ('From', 'To') for k in keys)
+
+    def allows_modes(self, modes):
+        """
+        Returns a boolean array of the rows whose Modes include any of the modes, e.g. 'c' for
+        the car network or 'bgde' for the bus network.
+        """
+        mode_strings = self['Modes']
+        # The modes are matched in the categories of a categorical column, which are far fewer than the links
+        if isinstance(mode_strings.dtype, pd.CategoricalDtype):
+            categories = mode_strings.cat.categories.astype(str)
+            # Missing values have the code -1, which is the last, False value
+            allowed = np.array([any(mode in category for mode in modes) for category in categories] + [False])
+            return allowed[mode_strings.cat.codes.to_numpy()]
+        return np.array([any(mode in str(value) for mode in modes) for value in mode_strings.tolist()], dtype=bool)
+
+    def nearest_nodes(self, points, modes=None, k=1, max_distance=None):
+        """
+        Finds the k nearest nodes of each point, e.g. to connect new centroids or stops to the
+        network. Requires scipy.
+
+        Parameters
+        ----------
+        points : GeoSeries, GeoDataFrame or array-like
+            The points, a GeoSeries in another crs is transformed to the crs of the network.
+            An array of Points or of (x, y) coordinates must be in the crs of the network.
+        modes : str, optional
+            Only the nodes of the links that allow any of these modes are searched
+        k : int
+            Number of nodes per point
+        max_distance : float, optional
+            Nodes further away are not returned
+
+        Returns a DataFrame with the columns point, Node and distance, with the nodes of each
+        point in the order of their distance. point is the index label of the point, or its
+        position if the points are an array.
+
+        The nodes are searched in a k-d tree, which is built once per modes and kept until the
+        links or their geometries are replaced. Changes made in place with .loc are not detected,
+        call reset_spatial_indexes after them.
+        """
+        from .spatial_index import NodeTree
+        return self._spatial_index(NodeTree, modes).nearest(points, k=k, max_distance=max_distance, crs=self.crs)
+
+    def nearest_links(self, points, modes=None, max_distance=None):
+        """
+        Snaps each point to its nearest link, e.g. to match count stations to the network.
+
+        Parameters
+        ----------
+        points : GeoSeries, GeoDataFrame or array-like
+            The points, as in nearest_nodes
+        modes : str, optional
+            Only the links that allow any of these modes are searched
+        max_distance : float, optional
+            Points without a link within this distance are left out
+
+        Returns a GeoDataFrame with the columns point, From, To, distance, position and fraction,
+        and the point projected on the link as the geometry. position is the distance along the
+        link from its start to the projected point, fraction the same as a share of the link
+        length. The two directions of a road have the same geometry, the first of equally near
+        links is returned and the other direction can be looked up with link.
+
+        The links are searched in an STRtree, which is kept like the tree of nearest_nodes.
+        """
+        from .spatial_index import LinkTree
+        return self._spatial_index(LinkTree, modes).nearest(points, max_distance=max_distance, crs=self.crs)
+
+    def reset_spatial_indexes(self):
+        """
+        Discards the cached spatial indexes, so that they are built again on the next query.
+        """
+        self.__dict__.pop('_spatial_indexes', None)
+
+    def _spatial_index(self, index_class, modes):
+        indexes = self.__dict__.get('_spatial_indexes', {})
+        key = (index_class.__name__, modes)
+        if key not in indexes:
+            # A new dict, so that copies of the network that share the cache do not get the index
+            indexes = {**indexes, key: index_class.from_network(self, modes=modes)}
+            object.__setattr__(self, '_spatial_indexes', indexes)
+        return indexes[key]
+
+    def _affects_spatial_indexes(self, key):
+        if not self.__dict__.get('_spatial_indexes'):
+            return False
+        keys = key if isinstance(key, (list, tuple, pd.Index)) else [key]
+        return any(not isinstance(k, str) or k in ('From', 'To', 'Modes', 'geometry') for k in keys)
 
-        return nodes_gdf
-    
     @property
     def centroids(self):
         return self.nodes[self.nodes['is_centroid']==1]
 
+    def link_vertices(self):
+        """
+        Returns the vertices of the curved links between their end nodes as a link_shape table,
+        with one row per vertex.
+        """
+        links = self[self['To'] > 0]
+        index, vertex_no, coords = geometry.interior_vertices(links.geometry.to_numpy())
+        return pd.DataFrame({
+            'c': 'a',
+            'I_Node': links['From'].to_numpy()[index],
+            'J_Node': links['To'].to_numpy()[index],
+            'Vertex_No.': vertex_no,
+            'X-Coord': coords[:, 0],
+            'Y-Coord': coords[:, 1],
+        })
+
     def update_nodes(self, updated_nodes):
         """
         Update the nodes in the network with the provided updated nodes DataFrame.
+
+        The nodes are matched to the start and end nodes of the links by their ids in one
+        vectorized pass. The other columns of updated_nodes are written to the '_from' and
+        '_to' columns of the links, a new geometry moves the start or end points of the links
+        and is_centroid sets the node type in c_from and the is_connector flags.
+        """
+        updated_nodes = updated_nodes.drop_duplicates('Node', keep='last')
+        node_ids = pd.Index(updated_nodes['Node'].to_numpy('int64'))
+        # Position of the start and end node of every link in updated_nodes, -1 if not updated
+        from_rows = node_ids.get_indexer(self['From'].to_numpy('int64'))
+        to_rows = node_ids.get_indexer(self['To'].to_numpy('int64'))
+        to_rows[self['To'].to_numpy() == 0] = -1
+
+        for col in updated_nodes.columns:
+            if col in ['Node', 'geometry', 'is_centroid']:
+                continue
+            values = updated_nodes[col].to_numpy()
+            self._replace_rows(f'{col}_from', from_rows, values)
+            # The node type is only kept for the start nodes, as c_from
+            if col != 'c':
+                self._replace_rows(f'{col}_to', to_rows, values)
+        if 'is_centroid' in updated_nodes.columns:
+            self._update_centroids(updated_nodes, from_rows, to_rows)
+        if 'geometry' in updated_nodes.columns:
+            self._move_link_ends(updated_nodes.geometry.to_numpy() if isinstance(updated_nodes, gpd.GeoDataFrame)
+                                 else updated_nodes['geometry'].to_numpy(), from_rows, to_rows)
+        self._patch_nodes(updated_nodes)
+
+    def _replace_rows(self, column, rows, values):
+        """
+        Replaces the values of column on the links where rows >= 0 with values[rows]. The column
+        is replaced as a whole, so the shared read-only arrays of a ScenarioCollection are not written.
         """
-        # Iterate through the updated nodes and update the corresponding links
-        for _, node in updated_nodes.iterrows():
-            node_id = node['Node']
-            self.loc[self['From'] == node_id, 'geometry'] = node['geometry']
-            self.loc[self['From'] == node_id, 'is_centroid'] = node['is_centroid']
-            for col in node.index:
-                if col not in ['Node', 'geometry', 'is_centroid']:
-                    self.loc[self['From'] == node_id, f'{col}_from'] = node[col]
+        updated = rows >= 0
+        if column not in self.columns:
+            current = pd.Series(np.nan, index=self.index, dtype=object if values.dtype == object else 'float64')
+        else:
+            current = super().__getitem__(column)
+        if isinstance(current.dtype, pd.CategoricalDtype):
+            merged = current.astype(object).to_numpy(copy=True)
+            merged[updated] = values[rows[updated]]
+            merged = pd.Series(merged, index=self.index).astype('category')
+        else:
+            merged = current.to_numpy(copy=True)
+            if np.result_type(merged.dtype, values.dtype) != merged.dtype:
+                merged = merged.astype(np.result_type(merged.dtype, values.dtype))
+            merged[updated] = values[rows[updated]]
+        # The cached node table is patched afterwards instead of being built again
+        super().__setitem__(column, merged)
+
+    def _update_centroids(self, updated_nodes, from_rows, to_rows):
+        is_centroid = updated_nodes['is_centroid'].to_numpy().astype(bool)
+        self._replace_rows('c_from', from_rows, np.where(is_centroid, 'a*', 'a').astype(object))
+        if 'is_connector' not in self.columns:
+            return
+        # A link is a connector if either of its nodes is a centroid
+        centroids = self.nodes['is_centroid']
+        from_centroid = centroids.reindex(self['From'].to_numpy()).fillna(0).to_numpy().astype(bool)
+        to_centroid = centroids.reindex(self['To'].to_numpy()).fillna(0).to_numpy().astype(bool)
+        to_centroid[to_rows >= 0] = is_centroid[to_rows[to_rows >= 0]]
+        from_centroid[from_rows >= 0] = is_centroid[from_rows[from_rows >= 0]]
+        affected = (from_rows >= 0) | (to_rows >= 0)
+        is_connector = self['is_connector'].to_numpy(copy=True)
+        is_connector[affected] = (from_centroid | to_centroid)[affected]
+        super().__setitem__('is_connector', is_connector)
+
+    def _move_link_ends(self, points, from_rows, to_rows):
+        """
+        Moves the start points of the links from and the end points of the links to the updated
+        nodes. The rows of nodes without links become the new points.
+        """
+        geometries = self.geometry.to_numpy().copy()
+        is_point = shapely.get_type_id(geometries) == 0
+        moved = (from_rows >= 0) | (to_rows >= 0)
+        points_moved = moved & is_point
+        geometries[points_moved] = points[from_rows[points_moved]]
+        lines = np.flatnonzero(moved & ~is_point)
+        include_z = bool(shapely.has_z(geometries[lines]).any())
+        coords, index = shapely.get_coordinates(geometries[lines], include_z=include_z, return_index=True)
+        counts = np.bincount(index, minlength=len(lines))
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        point_coords = shapely.get_coordinates(points, include_z=include_z)
+        starts_moved = from_rows[lines] >= 0
+        ends_moved = to_rows[lines] >= 0
+        coords[starts[starts_moved]] = point_coords[from_rows[lines][starts_moved]]
+        coords[ends[ends_moved] - 1] = point_coords[to_rows[lines][ends_moved]]
+        geometries[lines] = shapely.set_coordinates(geometries[lines].copy(), coords)
+        super().__setitem__(self.geometry.name, gpd.GeoSeries(geometries, index=self.index, crs=self.crs))
+        self.reset_spatial_indexes()
+
+    def _patch_nodes(self, updated_nodes):
+        """
+        Updates the rows of the cached node table, if there is one, instead of building it again.
+        """
+        nodes = self.__dict__.get('_nodes')
+        if nodes is None:
+            return
+        # New node attributes and labels, which @hsl is derived from, need the whole table
+        if 'Label' in updated_nodes.columns or not set(updated_nodes.columns) <= set(nodes.columns):
+            self.reset_nodes()
+            return
+        updated_nodes = updated_nodes[updated_nodes['Node'].isin(nodes.index)]
+        nodes = nodes.copy()
+        for col in updated_nodes.columns:
+            values = updated_nodes[col].to_numpy()
+            # Compact numeric columns are widened if the new values do not fit in them
+            if nodes[col].dtype.kind in 'iuf' and values.dtype.kind in 'iuf':
+                nodes[col] = nodes[col].astype(np.result_type(nodes[col].dtype, values.dtype))
+            nodes.loc[updated_nodes['Node'].to_numpy(), col] = values
+        object.__setattr__(self, '_nodes', nodes)
 
     
     def add_gradients(self, api_key, processors, elevation_fixes=None, full=True, in_place=False):
@@ -130,9 +479,8 @@ class EmmeNetwork(gpd.GeoDataFrame):
         # Create a copy of self to modify
         network_copy = self.copy()
         
-        # Vectorized update of the new values
-        mask = (network_copy['From'].isin(gdf['From'])) & (network_copy['To'].isin(gdf['To']))
-        network_copy.loc[mask, ['@kaltevuus', '@korkeus_from', '@korkeus_to']] = gdf.set_index(['From', 'To'])[['@kaltevuus', '@korkeus_from', '@korkeus_to']].values
+        # The new values are written to their links by the (From, To) index
+        network_copy.set_link_attributes(gdf[['From', 'To', '@kaltevuus', '@korkeus_from', '@korkeus_to']], missing='ignore')
         
         if in_place:
             self.update(network_copy)
@@ -158,17 +506,14 @@ class EmmeNetwork(gpd.GeoDataFrame):
     def export_base_network(self, output_folder, project_name='default_project', scen_number='1', scen_name='default_scenario', export_datetime=None):
         os.makedirs(output_folder, exist_ok=True)  # Ensure the output folder exists
         current_date = export_datetime if export_datetime else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        links = self.copy()
-        links['c'] = 'a'
-        links = links[['c', 'From', 'To', 'Length', 'Modes', 'Typ', 'Lan', 'VDF', 'Data1', 'Data2', 'Data3']]
+        # The links are selected instead of copying the network, which also kept the 'c' column in it
+        links = pd.DataFrame(self[['From', 'To', 'Length', 'Modes', 'Typ', 'Lan', 'VDF', 'Data1', 'Data2', 'Data3']])
+        links.insert(0, 'c', 'a')
         links = links[links['To']>0]
         nodes = self.nodes
 
-        nodes['X-coord'] = nodes['geometry'].x.apply(self.float_to_string)
-        nodes['Y-coord'] = nodes['geometry'].y.apply(self.float_to_string)
-        nodes['Data1'] = nodes['Data1'].apply(self.format_float)
-        nodes['Data2'] = nodes['Data2'].apply(self.format_float)
-        nodes['Data3'] = nodes['Data3'].apply(self.format_float)
+        nodes['X-coord'] = nodes['geometry'].x
+        nodes['Y-coord'] = nodes['geometry'].y
 
         # Drop 'geometry' column and create 'c' column based on 'is_centroid'
         nodes = nodes.drop(columns=['geometry'])
@@ -178,31 +523,40 @@ class EmmeNetwork(gpd.GeoDataFrame):
 
         # Reorder the columns
         nodes = nodes[['c', 'Node', 'X-coord', 'Y-coord', 'Data1', 'Data2', 'Data3', 'Label']]
-        links['Length'] = links['Length'].apply(self.format_float)
-        links['Typ'] = links['Typ'].apply(self.format_float)
-        links['Lan'] = links['Lan'].apply(self.format_float)
-        links['VDF'] = links['VDF'].apply(self.format_float)
-        links['Data1'] = links['Data1'].apply(self.format_float)
-        links['Data2'] = links['Data2'].apply(self.format_float)
-        links['Data3'] = links['Data3'].apply(self.format_float)
+        # The columns are formatted while they are written
+        node_formatters = {'X-coord': fixed_width.float_to_string, 'Y-coord': fixed_width.float_to_string,
+                           'Data1': fixed_width.format_float, 'Data2': fixed_width.format_float, 'Data3': fixed_width.format_float}
+        link_formatters = {col: fixed_width.format_float for col in ['Length', 'Typ', 'Lan', 'VDF', 'Data1', 'Data2', 'Data3']}
 
         output_path = Path(output_folder) / f"base_network_{scen_number}.txt"
         with open(output_path, 'w') as f:
             f.write(f"c Modeller - Base Network Transaction\nc Date: {current_date}\nc Project: {project_name}\nc Scenario {scen_number}: {scen_name}\nt nodes\n")
-            self._to_fwf(nodes, f)
+            self._to_fwf(nodes, f, node_formatters)
             f.write("\nt links\n")
-            self._to_fwf(links, f)
+            self._to_fwf(links, f, link_formatters)
 
     def _add_hsl_extra_attribute(self, nodes):
-        nodes['@hsl'] = 0
-        nodes['@hsl'] = nodes['Label'].apply(lambda x: 1 if any(char in x for char in 'ABCDE') else 0)
+        nodes['@hsl'] = nodes['Label'].astype(str).str.contains('[ABCDE]').astype('int64')
         return nodes
 
+    def fill_missing_values(self):
+        """
+        Replaces the missing values of all columns with 0, like they are written by export_extra_links.
+        """
+        # Columns with missing values are replaced instead of filled in place, so that the
+        # values of shared, read-only columns are never written to
+        for column in [column for column in self.columns if self[column].isna().any()]:
+            values = self[column]
+            # Categorical columns only accept values that are among their categories
+            if isinstance(values.dtype, pd.CategoricalDtype) and 0 not in values.cat.categories:
+                values = values.cat.add_categories([0])
+            self[column] = values.fillna(0)
+
     def export_extra_links(self, output_folder, scen_number=1, include_model_results=True):
         os.makedirs(output_folder, exist_ok=True)  # Ensure the output folder exists
         model_has_run = "@time_freeflow_car" in self.columns
         helmet_5 = "@kaltevuus" in self.columns
-        self.fillna(0, inplace=True)
+        self.fill_missing_values()
 
         # Allow user to remove model_results from extra_links
         if not include_model_results:
@@ -220,12 +574,9 @@ class EmmeNetwork(gpd.GeoDataFrame):
         to_be_printed = to_be_printed.sort_values(by=['inode', 'jnode'], ascending=True)
         to_be_printed = to_be_printed[to_be_printed['jnode']>0]
 
-        # Apply formatting functions
-        to_be_printed['inode'] = to_be_printed['inode'].apply(self.float_to_string)
-        to_be_printed['jnode'] = to_be_printed['jnode'].apply(self.float_to_string)
-        for col in to_be_printed.columns:
-            if col not in ['inode', 'jnode']:
-                to_be_printed[col] = to_be_printed[col].apply(self.format_float)
+        # Formatting functions of the columns, applied while the table is written
+        formatters = {col: fixed_width.format_float for col in to_be_printed.columns}
+        formatters.update(inode=fixed_width.float_to_string, jnode=fixed_width.float_to_string)
 
         # Prepare export by creating the extra_attribute definitions read by EMME
         definition_string = "t extra_attributes\n"
@@ -254,7 +605,7 @@ class EmmeNetwork(gpd.GeoDataFrame):
         output_path = Path(output_folder) / f"extra_links_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            self._to_fwf(to_be_printed, f)
+            self._to_fwf(to_be_printed, f, formatters)
 
     def export_extra_nodes(self, output_folder, scen_number=1):
         os.makedirs(output_folder, exist_ok=True)  # Ensure the output folder exists
@@ -277,12 +628,12 @@ class EmmeNetwork(gpd.GeoDataFrame):
                 definition_string += f"{column_name} NODE 0.0 ''\n"
         definition_string += "end extra_attributes\n"
         to_be_printed = to_be_printed.sort_values(by='inode', ascending=True)
-        formatted_df = to_be_printed.map(lambda x: f'{x:g}' if isinstance(x, (int, float)) else x)
+        formatters = {col: fixed_width.format_general for col in to_be_printed.columns}
 
         output_path = Path(output_folder) / f"extra_nodes_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            formatted_df.to_string(f, index=None)
+            fixed_width.write_table(f, to_be_printed, formatters, layout='pandas')
 
     def _get_transit_description(self, column_name):
         description_string = ''
@@ -303,28 +654,28 @@ class EmmeNetwork(gpd.GeoDataFrame):
     def export_netfield_links(self, output_folder, scen_number=1):  # Does not work
         os.makedirs(output_folder, exist_ok=True)  # Ensure the output folder exists
         #TODO: only continue if columns with # are present
-        to_be_printed = self.copy().reset_index()
-        netfield_columns = [col for col in to_be_printed.columns if '#' in col and '_to' not in col and '_from' not in col]
+        netfield_columns = [col for col in self.columns if '#' in col and '_to' not in col and '_from' not in col]
         if not netfield_columns:
             return None
         
-        to_be_printed = to_be_printed.loc[self['To']>0, ['From', 'To'] + netfield_columns]
+        # The columns are selected instead of copying the network, which also added an 'index' column to it
+        to_be_printed = pd.DataFrame(self.loc[(self['To']>0).to_numpy(), ['From', 'To'] + netfield_columns])
         to_be_printed = to_be_printed.rename(columns={'From': 'inode', 'To': 'jnode'})
         to_be_printed = to_be_printed.sort_values(by=['inode', 'jnode'], ascending=True)
-        formatted_df = to_be_printed.map(lambda x: f'{x:g}' if isinstance(x, (int, float)) else x)
+        formatters = {col: fixed_width.format_general for col in to_be_printed.columns}
         # Prepare export by creating the extra_attribute definitions read by EMME
         definition_string = "t network_fields\n"
         for column_name in to_be_printed.columns:
             if column_name in ['inode', 'jnode']:
                 continue
             definition_string += f"{column_name} LINK STRING '{column_name.lstrip('#')}'\n"
-            formatted_df[column_name] = formatted_df[column_name].apply(lambda x: f"'{x}'" if pd.notnull(x) else "''")
+            formatters[column_name] = lambda values: fixed_width.quoted(fixed_width.format_general(values))
         definition_string += "end network_fields\n"
 
         output_path = Path(output_folder) / f"netfield_links_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            formatted_df.to_string(f, index=None)
+            fixed_width.write_table(f, to_be_printed, formatters, layout='pandas')
 
     def export(self, output_folder):
         self.export_base_network(output_folder)
@@ -335,15 +686,14 @@ class EmmeNetwork(gpd.GeoDataFrame):
     def export_geopackage(self, filename):
         self.to_file(filename, driver='GPKG')
     
-    def _to_fwf(self, df, file):
-        content = tabulate(df.values.tolist(), list(df.columns), tablefmt="plain", disable_numparse=True)
-        # Adjust formatting to match the original file
-        # content = content.replace("  ", " ").replace(" \n", "\n")
-        file.write(content)
+    def _to_fwf(self, df, file, formatters=None):
+        fixed_width.write_table(file, df, formatters)
     
     def to_crs(self, crs=None, epsg=None, inplace=False):
         if inplace:
             super().to_crs(crs=crs, epsg=epsg, inplace=True)
+            self.reset_nodes()
+            self.reset_spatial_indexes()
             return None
         else:
             new_gdf = super().to_crs(crs=crs, epsg=epsg, inplace=False)
@@ -351,22 +701,51 @@ class EmmeNetwork(gpd.GeoDataFrame):
             new_emme_network = EmmeNetwork(new_gdf)
             # Ensure all the original metadata is copied to the new object
             new_emme_network.__dict__.update(self.__dict__)
+            # The cached nodes and spatial indexes are in the original crs
+            new_emme_network.reset_nodes()
+            new_emme_network.reset_spatial_indexes()
             return new_emme_network
         
 
     def drop(self, labels=None, axis=0, index=None, columns=None, level=None, inplace=False, errors='raise'):
         if inplace:
             super().drop(labels=labels, axis=axis, index=index, columns=columns, level=level, inplace=inplace, errors=errors)
+            self.reset_nodes()
+            self.reset_graphs()
+            self.reset_links()
+            self.reset_spatial_indexes()
             return None
         else:
             new_gdf = super().drop(labels=labels, axis=axis, index=index, columns=columns, level=level, inplace=inplace, errors=errors)
             new_emme_network = EmmeNetwork(new_gdf)
             return new_emme_network
         
+    def sort_values(self, by, *args, inplace=False, **kwargs):
+        if inplace:
+            super().sort_values(by, *args, inplace=True, **kwargs)
+            # The cached indexes refer to the rows by their positions
+            self.reset_nodes()
+            self.reset_graphs()
+            self.reset_links()
+            self.reset_spatial_indexes()
+            return None
+        else:
+            return EmmeNetwork(super().sort_values(by, *args, inplace=False, **kwargs))
+
+    def update(self, other, *args, **kwargs):
+        super().update(other, *args, **kwargs)
+        self.reset_nodes()
+        self.reset_graphs()
+        self.reset_links()
+        self.reset_spatial_indexes()
+
     def copy(self, deep=True):
         new_gdf = super().copy(deep=deep)
         new_emme_network = EmmeNetwork(new_gdf)
-        new_emme_network.__dict__.update(self.__dict__)
+        # Only the attributes of the network itself are copied, the data of the frame, e.g. its
+        # block manager, would otherwise be the original one and not the copy
+        new_emme_network.__dict__.update({key: value for key, value in self.__dict__.items()
+                                          if key not in new_emme_network.__dict__})
         return new_emme_network
 
     def add_lam_data(self, data_type='all'):
@@ -375,4 +754,9 @@ class EmmeNetwork(gpd.GeoDataFrame):
         fintraffic_lam = lam_data.fintraffic_lam_to_network(self)
         hel_lam = lam_data.hel_lam_to_network(fintraffic_lam)
         bike_lam = lam_data.bike_lam_to_network(hel_lam)
-        self.update(EmmeNetwork(bike_lam))
\ No newline at end of file
+        self.update(EmmeNetwork(bike_lam))
+
+
+def _link_keys(from_nodes, to_nodes):
+    # The node ids of Emme networks are below 2**32, so a link is one 64-bit integer
+    return from_nodes * 2 ** 32 + to_nodes
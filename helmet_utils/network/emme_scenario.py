@@ -1,25 +1,112 @@
 from .emme_network import EmmeNetwork
 from .transit_network import TransitNetwork
+from .turn_table import TurnTable
+from . import fixed_width
 
 import pandas as pd
 import os
 import csv
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from tabulate import tabulate
 
 
 class EmmeScenario:
-    def __init__(self, network: EmmeNetwork, transit: TransitNetwork, input_folder: str, project_name: str, scenario_name: str, link_shape: pd.DataFrame=None, modes=None, turns=None, vehicles=None):
+    """
+    An Emme scenario consisting of the road network, transit network and the scenario specific tables.
+
+    The transit network, link_shape, modes, turns and vehicles can be given as loaders, i.e.
+    functions without arguments that return the component. A loader is called on the first
+    access of the component and its result is memoized, so workflows that only need the road
+    network never parse the transit files.
+    """
+    LAZY_COMPONENTS = ('transit', 'link_shape', 'modes', 'turns', 'vehicles')
+
+    def __init__(self, network: EmmeNetwork, transit: TransitNetwork, input_folder: str, project_name: str, scenario_name: str, link_shape: pd.DataFrame=None, modes=None, turns=None, vehicles=None, loaders=None):
         self.network = network
-        self.transit = transit
         self.input_folder = input_folder
         self.project_name = project_name
         self.scenario_name = scenario_name
-        self.link_shape = link_shape
-        self.modes = modes
-        self.turns = turns
-        self.vehicles = vehicles
+        self._loaders = dict(loaders) if loaders else {}
+        self._components = {}
+        given = {'transit': transit, 'link_shape': link_shape, 'modes': modes, 'turns': turns, 'vehicles': vehicles}
+        for name, value in given.items():
+            if value is not None or name not in self._loaders:
+                setattr(self, name, value)
+
+    def _component(self, name):
+        if name not in self._components:
+            # The loader is dropped only after it succeeds, so a failed load is raised again on the next access
+            loader = self._loaders.get(name)
+            self._components[name] = loader() if loader is not None else None
+            self._loaders.pop(name, None)
+        return self._components[name]
+
+    def _set_component(self, name, value):
+        self._loaders.pop(name, None)
+        self._components[name] = value
+
+    @property
+    def transit(self) -> TransitNetwork:
+        return self._component('transit')
+
+    @transit.setter
+    def transit(self, value):
+        self._set_component('transit', value)
+
+    @property
+    def link_shape(self) -> pd.DataFrame:
+        return self._component('link_shape')
+
+    @link_shape.setter
+    def link_shape(self, value):
+        self._set_component('link_shape', value)
+
+    @property
+    def modes(self) -> pd.DataFrame:
+        return self._component('modes')
+
+    @modes.setter
+    def modes(self, value):
+        self._set_component('modes', value)
+
+    @property
+    def turns(self) -> TurnTable:
+        return self._component('turns')
+
+    @turns.setter
+    def turns(self, value):
+        self._set_component('turns', value)
+
+    @property
+    def vehicles(self) -> pd.DataFrame:
+        return self._component('vehicles')
+
+    @vehicles.setter
+    def vehicles(self, value):
+        self._set_component('vehicles', value)
+
+    def is_loaded(self, name):
+        """
+        Returns True if the component has already been materialized.
+        """
+        if name not in self.LAZY_COMPONENTS:
+            raise ValueError(f"Unknown scenario component: {name}")
+        return name in self._components
+
+    def diff(self, other, tables=None):
+        """
+        Compares this scenario to other, e.g. a modified version of the same scenario.
+
+        Nodes are matched by Node, links by (From, To), turns by (At, From, To), transit lines
+        by Line and segments by (Line, Segment_num). Returns a ScenarioDiff that has the added,
+        removed and modified rows and the changed values of each table, see scenario_diff.TableDiff.
+        tables can be used to compare only some of the tables, by default all of them are compared.
+        """
+        from .scenario_diff import diff_scenarios
+        return diff_scenarios(self, other, tables=tables)
 
     def add_gradients(self, api_key, processors=2, elevation_fixes=None, full=True):
         if api_key is None:
@@ -29,13 +116,20 @@ class EmmeScenario:
         self.network = self.network.add_gradients(api_key, processors, elevation_fixes=elevation_fixes, full=full)
 
     def export_link_shape(self, output_folder, project_name='default_project', scen_number='1', scen_name='default_scenario', export_datetime=None):
+        """
+        Writes the vertices of the curved links of the network, so that changes to the link
+        geometries are exported. If the network has no curved links, the link_shape table is written.
+        """
         os.makedirs(output_folder, exist_ok=True)  # Ensure the output folder exists
         current_date = export_datetime if export_datetime else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         output_path = Path(output_folder) / f"link_shape_{scen_number}.txt"
         with open(output_path, 'w') as f:
             f.write(f"c Modeller - Link Shape Transaction\nc Date: {current_date}\nc Project: {project_name}\nc Scenario {scen_number}: {scen_name}\nc I_Node J_Node Vertex_No. X-Coord Y-Coord\nt linkvertices\n")
-            if self.link_shape is not None:
-                self.link_shape.to_csv(f, index=False, sep=' ', header=False)
+            link_shape = self.network.link_vertices()
+            if link_shape.empty:
+                link_shape = self.link_shape
+            if link_shape is not None:
+                self._write_link_shape(link_shape, f)
     
     def export_modes(self, output_folder, project_name='default_project', scen_number='1', scen_name='default_scenario', export_datetime=None):
         os.makedirs(output_folder, exist_ok=True)  # Ensure the output folder exists
@@ -54,7 +148,8 @@ class EmmeScenario:
         with open(output_path, 'w') as f:
             f.write(f"c Modeller - Turn Transaction\nc Date: {current_date}\nc Project: {project_name}\nc Scenario {scen_number}: {scen_name}\nt turns\n")
             if self.turns is not None:
-                self.turns.to_csv(f, index=False, sep=' ', lineterminator='\n')
+                turns = self.turns.flat() if isinstance(self.turns, TurnTable) else self.turns
+                turns.to_csv(f, index=False, sep=' ', lineterminator='\n')
 
     # TODO: Perhaps integrate to TransitNetwork
     def export_vehicles(self, output_folder, project_name='default_project', scen_number='1', scen_name='default_scenario', export_datetime=None):
@@ -66,7 +161,20 @@ class EmmeScenario:
             if self.vehicles is not None:
                 self._to_fwf(self.vehicles, f)
 
-    def export(self, output_folder=None, project_name=None, scenario_name=None):
+    def export(self, output_folder=None, project_name=None, scenario_name=None, workers=None):
+        """
+        Exports the scenario as Emme transaction files to output_folder.
+
+        If workers is given, the files are written concurrently by a thread pool with this many
+        workers. The shared tables, i.e. the lazily loaded components and the node table of the
+        network, are then prepared once before the writing starts. The files are written to a
+        temporary folder inside output_folder and moved in place only after all of them have been
+        written, so a failed writer leaves no partially written files behind. Each file is moved
+        with its own rename, which replaces an earlier file of the same name atomically, but the
+        files are not moved together: if a rename fails, the files moved before it are new and
+        the rest are old. The output folder is not swapped as a whole, as it can contain other
+        files, e.g. the transit files copied by hand.
+        """
         print("Exporting network to Emme format... Please copy and paste the transit files manually for now.")
         export_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         if output_folder is None:
@@ -78,27 +186,71 @@ class EmmeScenario:
             project_name = self.project_name
         if not scenario_name:
             scenario_name = self.scenario_name
-        
-        # Export network files
-        self.network.export_base_network(output_folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime)
-        self.network.export_extra_links(output_folder)
-        self.network.export_extra_nodes(output_folder)
-        self.network.export_netfield_links(output_folder)
-        # Export the Scenario specific files
-        self.export_link_shape(output_folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime)
-        self.export_modes(output_folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime)
-        self.export_turns(output_folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime)
-        self.export_vehicles(output_folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime)
-        # Export transit lines
-        self.transit.export_transit_lines(output_folder, export_datetime=export_datetime)
-        self.transit.export_extra_transit_lines(output_folder)
-        self.transit.export_netfield_transit_lines(output_folder)
-        self.transit.export_segments(output_folder)
-        # self.transit.export_netfield_segments(output_folder)
-        # self.transit.export_extra_segments(output_folder)
-    
+
+        writers = self._export_writers(project_name, scenario_name, export_datetime)
+        if workers is None:
+            for write in writers:
+                write(output_folder)
+        else:
+            self._export_concurrently(writers, output_folder, workers)
+
+    def _export_writers(self, project_name, scenario_name, export_datetime):
+        # Functions that write the files of the scenario to the folder they are given, in the export order
+        return [
+            # Export network files
+            lambda folder: self.network.export_base_network(folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime),
+            lambda folder: self.network.export_extra_links(folder),
+            lambda folder: self.network.export_extra_nodes(folder),
+            lambda folder: self.network.export_netfield_links(folder),
+            # Export the Scenario specific files
+            lambda folder: self.export_link_shape(folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime),
+            lambda folder: self.export_modes(folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime),
+            lambda folder: self.export_turns(folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime),
+            lambda folder: self.export_vehicles(folder, project_name=project_name, scen_name=scenario_name, export_datetime=export_datetime),
+            # Export transit lines
+            lambda folder: self.transit.export_transit_lines(folder, export_datetime=export_datetime),
+            lambda folder: self.transit.export_extra_transit_lines(folder),
+            lambda folder: self.transit.export_netfield_transit_lines(folder),
+            lambda folder: self.transit.export_segments(folder),
+            # lambda folder: self.transit.export_netfield_segments(folder),
+            # lambda folder: self.transit.export_extra_segments(folder),
+        ]
+
+    def _prepare_export(self):
+        # The writers only read the shared tables: the lazy components and transit tables are
+        # loaded, the missing link values are filled and the node table is built before the
+        # writing starts
+        for name in self.LAZY_COMPONENTS:
+            getattr(self, name)
+        if self.transit is not None:
+            for name in TransitNetwork.TABLES:
+                getattr(self.transit, name)
+        self.network.fill_missing_values()
+        self.network.nodes
+
+    def _export_concurrently(self, writers, output_folder, workers):
+        self._prepare_export()
+        staging_folder = tempfile.mkdtemp(prefix='.export_', dir=output_folder)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(write, staging_folder) for write in writers]
+                for future in futures:
+                    future.result()
+            # Each rename is atomic on its own, a failure here leaves the earlier files moved
+            for file_name in sorted(os.listdir(staging_folder)):
+                os.replace(Path(staging_folder) / file_name, Path(output_folder) / file_name)
+        finally:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+
+    @staticmethod
+    def _write_link_shape(link_shape, file, chunk_size=2**16):
+        # Formatting the rows from lists of Python values is faster than DataFrame.to_csv,
+        # which spends most of its time formatting the coordinates
+        row_format = ' '.join(['{}'] * len(link_shape.columns)) + '\n'
+        for start in range(0, len(link_shape), chunk_size):
+            chunk = link_shape.iloc[start:start + chunk_size]
+            columns = [chunk[column].to_numpy().tolist() for column in chunk.columns]
+            file.write(''.join(map(row_format.format, *columns)))
+
     def _to_fwf(self, df, file):
-        content = tabulate(df.values.tolist(), list(df.columns), tablefmt="plain", disable_numparse=True)
-        # Adjust formatting to match the original file
-        # content = content.replace("  ", " ").replace(" \n", "\n")
-        file.write(content)
+        fixed_width.write_table(file, df)
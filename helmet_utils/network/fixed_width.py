@@ -0,0 +1,266 @@
+"""
+Fixed-width tables of the exported Emme transaction files.
+
+The exports used to format every cell with Series.apply or DataFrame.map and lay out the tables
+with tabulate or DataFrame.to_string. Here whole columns are formatted at once with numpy, and
+the rows are written in chunks of about CHUNK_CELLS cells, so that large tables never have to be
+held in memory as Python strings. The text is the same as before:
+
+- layout 'tabulate' is tabulate(..., tablefmt='plain', disable_numparse=True): left-aligned
+  columns separated by two spaces, stripped cells and lines, missing values written as ''
+- layout 'pandas' is DataFrame.to_string(index=None): right-aligned columns separated by a space
+"""
+import numpy as np
+import pandas as pd
+
+CHUNK_CELLS = 2 ** 21
+
+# Whole numbers below these limits are written as integers by the number formats below
+EXACT_INTEGER_LIMIT = 2.0 ** 53
+GENERAL_INTEGER_LIMIT = 1e6
+
+
+def write_table(file, df, formatters=None, layout='tabulate', chunk_cells=CHUNK_CELLS):
+    """
+    Writes df to file as a fixed-width table with a header row.
+
+    Parameters
+    ----------
+    file : file object
+        Open text file
+    df : pd.DataFrame
+        Table to write, the columns are written in their order
+    formatters : dict, optional
+        Functions by column name that format a Series into an array of strings,
+        the other columns are written as str() of their values
+    layout : str
+        'tabulate' or 'pandas'
+    chunk_cells : int
+        Approximate number of cells formatted at a time
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}', use one of {list(LAYOUTS)}")
+    if layout == 'pandas' and len(df) == 0:
+        # DataFrame.to_string describes an empty table instead of writing a header
+        file.write(df.to_string(index=None))
+        return
+    formatters = formatters or {}
+    header = np.array([str(column) for column in df.columns], dtype=str)
+    columns = [df.iloc[:, position] for position in range(df.shape[1])]
+    missing = 'None' if layout == 'pandas' else ''
+    format_functions = [formatters.get(column, partial_text(missing)) for column in df.columns]
+    chunk_rows = max(1, chunk_cells // max(1, len(columns)))
+    starts = range(0, len(df), chunk_rows)
+
+    def formatted(start):
+        return [_strings(format_column(column.iloc[start:start + chunk_rows]), layout)
+                for column, format_column in zip(columns, format_functions)]
+
+    # The column widths depend on all rows, so a table of several chunks is formatted twice
+    chunks = [formatted(start) for start in starts[:1]]
+    widths = _widths(header, chunks[0], layout) if chunks else _widths(header, None, layout)
+    if len(starts) > 1:
+        for start in starts[1:]:
+            widths = np.maximum(widths, _widths(header, formatted(start), layout))
+    write_line, separator = LAYOUTS[layout]
+    file.write(write_line([_strings(header[[i]], layout) for i in range(len(header))], widths, separator)[0])
+    for i, start in enumerate(starts):
+        cells = chunks[0] if i == 0 else formatted(start)
+        file.write('\n' + '\n'.join(write_line(cells, widths, separator)))
+
+
+def partial_text(missing):
+    return lambda values: text(values, missing)
+
+
+def text(values, missing=''):
+    """
+    Returns str() of the values, like they are written from DataFrame.values.tolist().
+    None is written as missing.
+    """
+    array = _values(values)
+    if array.dtype.kind in 'iub':
+        return _integers(array.astype('int64'))
+    if array.dtype.kind == 'f':
+        array = array.astype('float64')
+        whole = _whole(array, EXACT_INTEGER_LIMIT)
+        return _fill(np.char.add(_integers(np.where(whole, array, 0).astype('int64')), '.0'), ~whole, array, str)
+    return np.array([missing if value is None else 'NaN' if missing == 'None' and _is_nan(value) else str(value)
+                     for value in array.tolist()], dtype=object)
+
+
+def format_float(values):
+    """
+    Vectorized EmmeNetwork.format_float: numbers with at most six decimals, without trailing zeros.
+    """
+    array = _values(values)
+    if array.dtype.kind in 'iub':
+        return _integers(array.astype('int64'))
+    if array.dtype.kind != 'f':
+        return np.array([_format_float(value) for value in array.tolist()], dtype=object).astype(str)
+    array = array.astype('float64')
+    # The numbers are rounded to whole millionths and written from their integer and decimal
+    # parts. Numbers whose rounding is ambiguous in floating point are formatted by Python.
+    with np.errstate(invalid='ignore'):
+        scaled = np.abs(array) * 1e6
+        exact = np.isfinite(scaled) & (scaled < EXACT_INTEGER_LIMIT)
+        fraction = scaled - np.floor(scaled)
+        exact &= np.abs(fraction - 0.5) > scaled * 1e-15 + 1e-9
+    micro = np.round(np.where(exact, scaled, 0)).astype('int64')
+    integer_part, decimal_part = np.divmod(micro, 10 ** 6)
+    formatted = _compose(np.signbit(array), integer_part, decimal_part)
+    return _fill(formatted, ~exact, array, _format_float)
+
+
+def float_to_string(values):
+    """
+    Vectorized EmmeNetwork.float_to_string: whole numbers as integers, other numbers as str().
+    """
+    array = _values(values)
+    if array.dtype.kind in 'iub':
+        return _integers(array.astype('int64'))
+    array = array.astype('float64')
+    whole = _whole(array, EXACT_INTEGER_LIMIT, keep_negative_zero=False)
+    return _fill(_integers(np.where(whole, array, 0).astype('int64')), ~whole, array, str)
+
+
+def format_general(values):
+    """
+    Vectorized f'{x:g}' for the numbers among the values, other values are returned as they are.
+    """
+    array = _values(values)
+    if array.dtype.kind in 'iubf':
+        array = array.astype('float64')
+        whole = _whole(array, GENERAL_INTEGER_LIMIT)
+        return _fill(_integers(np.where(whole, array, 0).astype('int64')), ~whole, array, lambda value: f'{value:g}')
+    return np.array([f'{value:g}' if isinstance(value, (int, float)) else value for value in array.tolist()], dtype=object)
+
+
+def quoted(values):
+    """
+    Returns the values in single quotes, with missing values as ''.
+    """
+    return np.array([f"'{value}'" if pd.notnull(value) else "''" for value in _values(values).tolist()], dtype=object)
+
+
+def _format_float(value):
+    if type(value) == int:
+        return str(int(value))
+    return f"{value:.6f}".rstrip('0').rstrip('.')
+
+
+def _values(values):
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object).to_numpy()
+    return np.asarray(values)
+
+
+def _is_nan(value):
+    return isinstance(value, float) and value != value
+
+
+def _whole(array, limit, keep_negative_zero=True):
+    # Whole numbers whose integer text is the same as their formatted text. The formats
+    # write a negative zero as '-0', which an integer cannot represent.
+    with np.errstate(invalid='ignore'):
+        whole = (np.abs(array) < limit) & (array == np.round(array))
+    if keep_negative_zero:
+        whole &= ~((array == 0) & np.signbit(array))
+    return whole
+
+
+def _integers(integers):
+    return _compose(integers < 0, np.abs(integers))
+
+
+def _fill(formatted, mask, array, format_value):
+    # Formats the values that the vectorized formatting does not cover one by one
+    if not mask.any():
+        return formatted
+    formatted = formatted.astype(object)
+    formatted[mask] = [format_value(value) for value in array[mask].tolist()]
+    return formatted.astype(str)
+
+
+def _compose(negative, integers, decimals=None):
+    """
+    Writes numbers from their signs, non-negative integer parts and optionally their six decimals
+    as integers, e.g. (True, 12, 500000) as '-12.5'. Decimals are written without trailing zeros,
+    and without the decimal point if they are all zeros.
+
+    The digits are computed with a few vectorized operations per character and written as
+    character codes, which is several times faster than converting the integers with astype(str).
+    The integer parts are right-aligned and the padding is stripped at the end, the trailing
+    zero decimals are written as NUL characters, which numpy strings ignore.
+    """
+    rows = len(integers)
+    integer_width = 1 + (len(str(int(integers.max()))) if rows else 1)
+    codes = np.zeros((rows, integer_width + (7 if decimals is not None else 0)), dtype='uint32')
+    previous = integers
+    for column in range(integer_width - 1, -1, -1):
+        remaining, digit = np.divmod(previous, 10)
+        if column == integer_width - 1:
+            codes[:, column] = ord('0') + digit
+        else:
+            # The position left of the first digit gets the sign, the positions further left are padding
+            sign = negative & (previous == 0) & ((integers < 10) if column == integer_width - 2 else (last > 0))
+            codes[:, column] = np.where(previous > 0, ord('0') + digit, np.where(sign, ord('-'), ord(' ')))
+        last, previous = previous, remaining
+    if decimals is not None:
+        decimals = decimals.astype('int32')
+        remaining = decimals.copy()
+        trailing = np.ones(rows, dtype=bool)
+        for column in range(integer_width + 6, integer_width, -1):
+            remaining, digit = np.divmod(remaining, 10)
+            # Trailing zeros, and the decimal point of numbers without decimals, are NUL
+            trailing &= digit == 0
+            codes[:, column] = np.where(trailing, 0, ord('0') + digit)
+        codes[:, integer_width] = np.where(decimals > 0, ord('.'), 0)
+    return np.char.lstrip(codes.view(f'U{codes.shape[1]}').ravel())
+
+
+def _strings(formatted, layout):
+    strings = np.asarray(formatted)
+    if strings.dtype.kind != 'U':
+        strings = strings.astype(str)
+    if layout == 'tabulate':
+        strings = np.char.strip(strings)
+    return strings
+
+
+def _widths(header, cells, layout):
+    header_lengths = np.char.str_len(header) if len(header) else np.zeros(0, dtype='int64')
+    if layout == 'tabulate':
+        header_lengths = np.char.str_len(np.char.strip(header)) + 2 if len(header) else header_lengths
+        padding = 0
+    else:
+        padding = 1
+    if cells is None or not len(cells) or not len(cells[0]):
+        return header_lengths.astype('int64')
+    cell_lengths = np.array([np.char.str_len(column).max() + padding for column in cells])
+    return np.maximum(header_lengths, cell_lengths).astype('int64')
+
+
+def _tabulate_lines(cells, widths, separator):
+    padded = [np.char.ljust(column, width) for column, width in zip(cells, widths)]
+    return np.char.rstrip(_join(padded, widths, separator)).tolist()
+
+
+def _pandas_lines(cells, widths, separator):
+    padded = [np.char.rjust(column, width) for column, width in zip(cells, widths)]
+    return _join(padded, widths, separator).tolist()
+
+
+def _join(padded, widths, separator):
+    # The padded columns are joined as character matrices, which is linear in the line length
+    rows = len(padded[0])
+    parts = []
+    for column, width in zip(padded, widths):
+        if parts:
+            parts.append(np.full((rows, len(separator)), separator[0], dtype='U1'))
+        parts.append(np.ascontiguousarray(column.astype(f'U{max(width, 1)}')).view('U1').reshape(rows, max(width, 1)))
+    matrix = np.ascontiguousarray(np.concatenate(parts, axis=1))
+    return matrix.view(f'U{matrix.shape[1]}').ravel()
+
+
+LAYOUTS = {'tabulate': (_tabulate_lines, '  '), 'pandas': (_pandas_lines, ' ')}
@@ -0,0 +1,127 @@
+import numpy as np
+import shapely
+
+
+def points(x, y, z=None):
+    """
+    Creates Points from coordinate arrays in a single vectorized call.
+
+    Parameters
+    ----------
+    x, y : array-like
+        Coordinates of the points
+    z : array-like or float, optional
+        Elevations, a single value is used for all points
+
+    Returns
+    -------
+    np.ndarray of shapely Points
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    if z is None:
+        return shapely.points(x, y)
+    return shapely.points(x, y, np.broadcast_to(np.asarray(z, dtype='float64'), x.shape))
+
+
+def segments(x1, y1, x2, y2, z1=None, z2=None):
+    """
+    Creates two-point LineStrings from the coordinate arrays of their start and end points
+    in a single vectorized call. Elevations are used only if given for both ends.
+
+    Returns
+    -------
+    np.ndarray of shapely LineStrings
+    """
+    ends = [x1, y1, x2, y2] if z1 is None or z2 is None else [x1, y1, z1, x2, y2, z2]
+    ends = [np.asarray(coord, dtype='float64') for coord in ends]
+    ends = np.broadcast_arrays(*ends)
+    dims = len(ends) // 2
+    coords = np.stack(ends, axis=-1).reshape(-1, 2, dims)
+    return shapely.linestrings(coords)
+
+
+def polylines(x1, y1, x2, y2, vertex_index, vertex_x, vertex_y):
+    """
+    Creates LineStrings that run from the start points (x1, y1) through their vertices to the
+    end points (x2, y2) in a single vectorized call. vertex_index gives the line of each vertex
+    and must be sorted, the vertices of a line are used in the order they are given.
+    Lines without vertices are straight two-point LineStrings.
+    """
+    x1, y1, x2, y2 = (np.asarray(coord, dtype='float64') for coord in (x1, y1, x2, y2))
+    vertex_index = np.asarray(vertex_index, dtype='int64')
+    size = len(x1)
+    vertex_counts = np.bincount(vertex_index, minlength=size)
+    counts = vertex_counts + 2
+    starts = np.cumsum(counts) - counts
+    x = np.empty(counts.sum())
+    y = np.empty(counts.sum())
+    x[starts], y[starts] = x1, y1
+    x[starts + counts - 1], y[starts + counts - 1] = x2, y2
+    # Position of each vertex among the vertices of its line
+    rank = np.arange(len(vertex_index)) - (np.cumsum(vertex_counts) - vertex_counts)[vertex_index]
+    positions = starts[vertex_index] + 1 + rank
+    x[positions], y[positions] = vertex_x, vertex_y
+    return linestrings(x, y, np.repeat(np.arange(size), counts), size)
+
+
+def interior_vertices(geometries):
+    """
+    Returns the vertices of each LineString between its start and end points.
+
+    Returns
+    -------
+    index : np.ndarray
+        Position of the geometry that each vertex belongs to
+    vertex_no : np.ndarray
+        Number of the vertex on its LineString, starting from 1
+    coords : np.ndarray
+        (n, 2) array of the vertex coordinates
+    """
+    geometries = np.asarray(geometries, dtype='object')
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    counts = np.bincount(index, minlength=len(geometries))
+    vertex_no = np.arange(len(index)) - (np.cumsum(counts) - counts)[index]
+    interior = (vertex_no > 0) & (vertex_no < counts[index] - 1)
+    return index[interior], vertex_no[interior], coords[interior]
+
+
+def coordinates(geometries, include_z=False):
+    """
+    Returns the coordinates of the first point of each geometry as an (n, 2) or (n, 3) array.
+    Missing geometries get NaN coordinates, as do missing elevations.
+    """
+    geometries = np.asarray(geometries, dtype='object')
+    geometries = np.where(shapely.is_geometry(geometries), geometries, None)
+    first_points = shapely.get_point(geometries, 0)
+    # Points are not curves, so get_point returns None for them
+    first_points = np.where(shapely.get_type_id(geometries) == 0, geometries, first_points)
+    columns = [shapely.get_x(first_points), shapely.get_y(first_points)]
+    if include_z:
+        columns.append(shapely.get_z(first_points))
+    return np.column_stack(columns)
+
+
+def linestrings(x, y, indices, size):
+    """
+    Creates size LineStrings from the points (x, y), grouping the points by indices.
+    LineStrings without any points are empty.
+    """
+    coords = np.column_stack([np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')])
+    out = np.empty(size, dtype='object')
+    out[:] = shapely.LineString()
+    if len(coords):
+        shapely.linestrings(coords, indices=indices, out=out)
+    return out
+
+
+def multipoints(x, y, indices, size):
+    """
+    Creates size MultiPoints from the points (x, y), grouping the points by indices.
+    MultiPoints without any points are empty.
+    """
+    out = np.empty(size, dtype='object')
+    out[:] = shapely.MultiPoint()
+    if len(indices):
+        shapely.multipoints(points(x, y), indices=indices, out=out)
+    return out
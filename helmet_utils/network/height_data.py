@@ -14,6 +14,8 @@ import geopandas as gpd
 from shapely.geometry import Point, LineString, MultiPolygon
 from shapely.ops import split
 from rtree import index
+from . import geometry
+from .node_index import NodeIndex
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 
@@ -56,7 +58,7 @@ class HeightData:
         print("\t\tmain()")
         print("\ninstead of writing python code outside a main function\n")
         centroids = self.nodes[self.nodes['is_centroid']==1].copy()
-        centroids['geometry'] = centroids.apply(lambda row: Point([row.geometry.x, row.geometry.y, 0.0]), axis=1)
+        centroids['geometry'] = geometry.points(centroids.geometry.x, centroids.geometry.y, 0.0)
         self.nodes.loc[centroids.index, 'geometry'] = centroids['geometry']
         not_centroids = self.nodes[self.nodes['is_centroid'] == 0].copy()
         self._prepare_area(not_centroids)
@@ -250,25 +252,21 @@ class HeightData:
         return MultiPolygon(geometries)
 
     @staticmethod
-    def process_geometries(df_el, node_dict):
-        def create_linestring(geometry_i, geometry_j):
-            """
-            Creates a LineString object from two geometry points.
-            """
-            try:
-                return LineString([geometry_i, geometry_j])
-            except Exception as e:
-                print(f"The following geometries raised exception \"{e}\"")
-                print(f"geometry_i: {geometry_i}, geometry_j: {geometry_j}")
+    def process_geometries(df_el, node_index):
         """
         Processes the geometries to map nodes to Point objects and create LineString objects.
+        Links without a 'To' node get the Point of their 'From' node as line_geometry.
         """
-        # Map the jnode and inode columns to Point objects
-        df_el["geometry_j"] = df_el["To"].map(node_dict)
-        df_el["geometry_i"] = df_el["From"].map(node_dict)
+        # Look up the Points and coordinates of the jnode and inode columns from the NodeIndex
+        df_el["geometry_j"] = node_index.points(df_el["To"], missing='ignore')
+        df_el["geometry_i"] = node_index.points(df_el["From"], missing='ignore')
 
-        # Apply the create_linestring function to each row
-        df_el['line_geometry'] = df_el.apply(lambda row: create_linestring(row["geometry_i"], row['geometry_j']) if pd.notna(row['geometry_j']) else row["geometry_i"], axis=1)
+        # Create all the LineStrings at once from the node coordinates
+        coords_i = node_index.coordinates(df_el["From"], include_z=True, missing='ignore')
+        coords_j = node_index.coordinates(df_el["To"], include_z=True, missing='ignore')
+        lines = geometry.segments(coords_i[:, 0], coords_i[:, 1], coords_j[:, 0], coords_j[:, 1], coords_i[:, 2], coords_j[:, 2])
+        has_j = df_el["geometry_j"].notna().to_numpy()
+        df_el['line_geometry'] = np.where(has_j, lines, df_el["geometry_i"].to_numpy())
 
         return df_el
 
@@ -278,21 +276,23 @@ class HeightData:
         print("Writing gradients to network...")
         centroids = self.nodes[self.nodes["is_centroid"] == 1]
 
-        # Create a dictionary of Node to Point objects
-        node_dict = dict(zip(self.nodes["Node"], self.nodes["geometry"]))
+        # Node coordinates and elevations as arrays
+        node_index = NodeIndex.from_points(self.nodes["Node"], self.nodes["geometry"])
 
         df_fixes = pd.read_csv(elevation_fixes)
-        for i, row in df_fixes.iterrows():
-            geom = node_dict[row['node']]
-            new_geom = Point([geom.x, geom.y, row['elevation']])
-            node_dict.update({row['node']: new_geom})
+        node_index.set_elevations(df_fixes['node'], df_fixes['elevation'])
 
-        df_el = self.process_geometries(self.links, node_dict)
+        df_el = self.process_geometries(self.links, node_index)
         gdf_el = gpd.GeoDataFrame(df_el, geometry="line_geometry", crs="EPSG:3067")
-        gdf_el['@korkeus_from'] = gdf_el.apply(lambda row: row['geometry_i'].coords[0][2], axis=1)
-        gdf_el['@korkeus_to'] = gdf_el.apply(lambda row: row['geometry_j'].coords[0][2] if row['To']>0 else 0.0, axis=1)
+        has_j = (gdf_el['To'] > 0).to_numpy()
+        elevation_i = node_index.coordinates(gdf_el['From'], include_z=True, missing='ignore')[:, 2]
+        elevation_j = node_index.coordinates(gdf_el['To'], include_z=True, missing='ignore')[:, 2]
+        gdf_el['@korkeus_from'] = elevation_i
+        gdf_el['@korkeus_to'] = np.where(has_j, elevation_j, 0.0)
         gdf = gdf_el.drop(columns=["geometry_i", "geometry_j"])
-        gdf['@kaltevuus'] = gdf.apply(lambda row: ((row['line_geometry'].coords[0][2] - row['line_geometry'].coords[1][2]) / row['line_geometry'].length) * 100 if row['To']>0 else 0.0, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gradient = (elevation_i - elevation_j) / gdf['line_geometry'].length.to_numpy() * 100
+        gdf['@kaltevuus'] = np.where(has_j, gradient, 0.0)
         gdf.loc[gdf['From'].isin(centroids['Node']) | gdf['To'].isin(centroids['Node']), '@kaltevuus'] = 0.0
 
         if output:
@@ -10,6 +10,7 @@ import numpy as np
 import io
 
 from shapely.geometry import Point
+from . import geometry
 
 class LamData:
     def __init__(self):
@@ -419,7 +420,7 @@ class LamData:
         avg_df = pd.DataFrame(data=daily_df.mean(), columns=['vrk'])
 
         new_df = locations.join(avg_df, on='id')
-        new_df['geometry'] = new_df.apply(lambda row: Point([row['x'], row['y']]), axis=1)
+        new_df['geometry'] = geometry.points(new_df['x'], new_df['y'])
 
         gdf = gpd.GeoDataFrame(new_df,geometry=new_df['geometry'], crs='EPSG:3879')
         gdf = gdf.loc[gdf['vrk']>0]
@@ -529,25 +530,18 @@ class LamData:
 
     def fintraffic_lam_to_network(self, network):
         lam_data = self.fintraffic_lam_stations()
-        lam_cols = ['@lam_counts_vrk', '@lam_counts_aht', '@lam_counts_pt', '@lam_counts_iht', '#lam_name', '#lam_source']        
-        for lamid, linkpair in self.lam_links.items():
-            for i, link in enumerate(linkpair):
-                if link[0]:
-                    link_data = lam_data[lam_data['id'] == lamid][[f"vrk_{i+1}", f"aht_{i+1}", f"pt_{i+1}", f"iht_{i+1}", "name", "source"]]
-                    network.loc[(network['From']==link[0]) & (network['To']==link[1]), lam_cols] = link_data.values
+        columns = {f'@lam_counts_{period}': f'{period}_{{direction}}' for period in ['vrk', 'aht', 'pt', 'iht']}
+        counts = self._link_counts(self.lam_links, lam_data.set_index('id'), {**columns, '#lam_name': 'name', '#lam_source': 'source'})
+        network.set_link_attributes(counts, missing='ignore')
         network[['#lam_name','#lam_source']] = network[['#lam_name','#lam_source']].fillna("")
         return network
     
 
     def hel_lam_to_network(self, network):
         lam_data = self.hel_lam_stations()
-        lam_cols = ['@lam_counts_vrk', '#lam_name', '#lam_source']        
-        for lamname, linkpair in self.hel_link_map.items():
-            for i, link in enumerate(linkpair):
-                if link[0]:
-                    link_data = lam_data[lam_data['name'] == lamname][[f"vrk_{i+1}", "name", "source"]]
-                    if not link_data.empty:
-                        network.loc[(network['From']==link[0]) & (network['To']==link[1]), lam_cols] = link_data.values
+        columns = {'@lam_counts_vrk': 'vrk_{direction}', '#lam_name': 'name', '#lam_source': 'source'}
+        counts = self._link_counts(self.hel_link_map, lam_data.set_index('name', drop=False), columns)
+        network.set_link_attributes(counts, missing='ignore')
         network[['#lam_name','#lam_source']] = network[['#lam_name','#lam_source']].fillna("")
         return network
 
@@ -555,11 +549,35 @@ class LamData:
         lam_data = self.bike_lams()
         print(lam_data.columns)
         print(lam_data.head())
-        lam_cols = ['@bike_lam_counts_vrk', '@bike_lam_counts_aht', '@bike_lam_counts_pt', '@bike_lam_counts_iht', '#lam_name', '#lam_source']       
-        for lamid, link in self.bike_lam_links.items():
-            if lamid in lam_data.index:
-                link_data = lam_data.loc[lamid, [f"vrk", "aht", "pt", "iht", "name", "source"]]
-                network.loc[(network['From']==link[0]) & (network['To']==link[1]), lam_cols] = link_data.values
+        columns = {f'@bike_lam_counts_{period}': period for period in ['vrk', 'aht', 'pt', 'iht']}
+        # Every bike counter has one link
+        link_map = {lamid: [link] for lamid, link in self.bike_lam_links.items()}
+        counts = self._link_counts(link_map, lam_data, {**columns, '#lam_name': 'name', '#lam_source': 'source'})
+        network.set_link_attributes(counts, missing='ignore')
         network[['#lam_name','#lam_source']] = network[['#lam_name','#lam_source']].fillna("")
         return network
 
+    @staticmethod
+    def _link_counts(link_map, stations, columns):
+        """
+        Returns the counts of the counting stations on their links, as a DataFrame with From and To
+        columns for EmmeNetwork.set_link_attributes.
+
+        link_map has the links of each station by direction, stations the counts indexed by the
+        station and columns the station column of each network column, where {direction} is
+        replaced by the direction of the link, 1 or 2. Stations without counts are skipped.
+        """
+        links = pd.DataFrame(
+            [(station, direction, link[0], link[1])
+             for station, link_pair in link_map.items()
+             for direction, link in enumerate(link_pair, start=1) if link[0]],
+            columns=['station', 'direction', 'From', 'To'])
+        stations = stations[~stations.index.duplicated()]
+        links = links[links['station'].isin(stations.index)]
+        counts = pd.DataFrame({'From': links['From'].to_numpy(), 'To': links['To'].to_numpy()})
+        first = links['direction'].to_numpy() == 1
+        for network_col, station_col in columns.items():
+            values = [stations[station_col.format(direction=direction)].reindex(links['station']).to_numpy() for direction in (1, 2)]
+            counts[network_col] = np.where(first, values[0], values[1])
+        return counts
+
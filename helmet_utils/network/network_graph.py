@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+# The origins are routed in chunks of about this many origin-node distances at a time
+CHUNK_CELLS = 2 ** 24
+
+
+class NetworkGraph:
+    """
+    The links of an EmmeNetwork as a sparse adjacency matrix, for routing and connectivity
+    queries. Created with EmmeNetwork.graph.
+
+    The rows and columns of the matrix are the nodes of the links, in the order of their ids,
+    and the values are the link weights. The queries take whole arrays of node ids and run the
+    shortest path searches of all the origins at once in scipy.sparse.csgraph.
+
+    Attributes
+    ----------
+    nodes : np.ndarray
+        Sorted ids of the nodes, the node of each row and column of the matrix
+    matrix : scipy.sparse.csr_array
+        Weights of the links from the row node to the column node
+    link_rows : np.ndarray
+        Row position of the link of each value of the matrix in the network
+    modes : str or None
+        The modes whose links are in the graph, None for all links
+    weight : str or None
+        The column of the link weights, None if every link has the weight 1
+    """
+
+    def __init__(self, nodes, matrix, link_rows, modes=None, weight=None):
+        self.nodes = nodes
+        self.matrix = matrix
+        self.link_rows = link_rows
+        self.modes = modes
+        self.weight = weight
+
+    @classmethod
+    def from_network(cls, network, modes=None, weight='Length'):
+        """
+        Builds the graph of the links of the network that allow any of the modes, e.g. 'c' for
+        the car network or 'bgde' for the bus network. The node rows without links are left out.
+        """
+        links = network['To'].to_numpy() > 0
+        if modes is not None:
+            links &= network.allows_modes(modes)
+        rows = np.flatnonzero(links)
+        from_nodes = network['From'].to_numpy('int64')[rows]
+        to_nodes = network['To'].to_numpy('int64')[rows]
+        if weight is None:
+            weights = np.ones(len(rows))
+        else:
+            if weight not in network.columns:
+                raise KeyError(f"Weight column '{weight}' not found in the network")
+            weights = pd.to_numeric(network[weight]).to_numpy('float64')[rows]
+            invalid = ~np.isfinite(weights) | (weights < 0)
+            if invalid.any():
+                raise ValueError(f"{invalid.sum()} links have a missing or negative {weight}, e.g. "
+                                 f"{list(zip(from_nodes[invalid][:5].tolist(), to_nodes[invalid][:5].tolist()))}")
+
+        nodes = np.unique(np.concatenate([from_nodes, to_nodes]))
+        from_positions = np.searchsorted(nodes, from_nodes)
+        to_positions = np.searchsorted(nodes, to_nodes)
+        # The values are sorted by their row and column, a repeated link keeps its smallest weight
+        order = np.lexsort((weights, to_positions, from_positions))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (np.diff(from_positions[order]) != 0) | (np.diff(to_positions[order]) != 0)
+        order = order[first]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(from_positions[order], minlength=len(nodes)))])
+        matrix = sparse.csr_array((weights[order], to_positions[order], indptr), shape=(len(nodes), len(nodes)))
+        return cls(nodes, matrix, rows[order], modes=modes, weight=weight)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return bool(self.positions([node], missing='ignore')[0] >= 0)
+
+    def positions(self, nodes, missing='raise'):
+        """
+        Returns the matrix positions of the nodes. Nodes that are not in the graph raise a KeyError,
+        or get the position -1 if missing is 'ignore'.
+        """
+        nodes = np.atleast_1d(np.asarray(nodes, dtype='int64'))
+        if len(self.nodes):
+            found = np.minimum(np.searchsorted(self.nodes, nodes), len(self.nodes) - 1)
+            positions = np.where(self.nodes[found] == nodes, found, -1)
+        else:
+            positions = np.full(nodes.shape, -1, dtype='int64')
+        if missing == 'raise' and (positions < 0).any():
+            unknown = np.unique(nodes[positions < 0])
+            raise KeyError(f"{len(unknown)} nodes not in the graph: {unknown[:10].tolist()}")
+        return positions
+
+    def neighbors(self, nodes, direction='out'):
+        """
+        Returns the links from the nodes, or to them if direction is 'in', as a DataFrame with
+        the columns Node, Neighbor and weight.
+        """
+        if direction not in ('out', 'in'):
+            raise ValueError(f"Unknown direction '{direction}', use 'out' or 'in'")
+        positions = self.positions(nodes)
+        matrix = self.matrix if direction == 'out' else self.matrix.T.tocsr()
+        starts, ends = matrix.indptr[positions], matrix.indptr[positions + 1]
+        counts = ends - starts
+        # The values of each node are a run of the CSR arrays from its indptr
+        values = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return pd.DataFrame({
+            'Node': np.repeat(self.nodes[positions], counts),
+            'Neighbor': self.nodes[matrix.indices[values]],
+            'weight': matrix.data[values],
+        })
+
+    def distance_matrix(self, origins, destinations=None, limit=None):
+        """
+        Returns the shortest path distances from the origins to the destinations, or to all the
+        nodes of the graph, as a DataFrame indexed by the origins with a column per destination.
+        Destinations that cannot be reached, or are further than limit, have the distance inf.
+        """
+        origin_positions = self.positions(origins)
+        destination_positions = np.arange(len(self.nodes)) if destinations is None else self.positions(destinations)
+        distances = np.empty((len(origin_positions), len(destination_positions)))
+        for chunk in self._chunks(len(origin_positions)):
+            distances[chunk] = self._dijkstra(origin_positions[chunk], limit=limit)[:, destination_positions]
+        return pd.DataFrame(distances, index=self.nodes[origin_positions], columns=self.nodes[destination_positions])
+
+    def shortest_paths(self, origins, destinations, paths=False, limit=None):
+        """
+        Returns the shortest paths between pairs of nodes, the origins and destinations are
+        arrays of the same length. The paths are searched from every distinct origin once, or
+        along the reversed links from every distinct destination if there are fewer of them.
+
+        Returns a DataFrame with the columns origin, destination and distance, which is inf if
+        there is no path. If paths is True, the column path has the node ids of each path and
+        the column links the row positions of its links in the network, or None if there is no path.
+        """
+        origin_positions = self.positions(origins)
+        destination_positions = self.positions(destinations)
+        if len(origin_positions) != len(destination_positions):
+            raise ValueError("origins and destinations must have the same length")
+        reverse = len(np.unique(destination_positions)) < len(np.unique(origin_positions))
+        sources, targets = (destination_positions, origin_positions) if reverse else (origin_positions, destination_positions)
+        matrix = self.matrix.T.tocsr() if reverse else self.matrix
+        unique_sources, source_index = np.unique(sources, return_inverse=True)
+        distances = np.empty(len(sources))
+        node_paths = np.empty(len(sources), dtype=object) if paths else None
+        link_paths = np.empty(len(sources), dtype=object) if paths else None
+        for chunk in self._chunks(len(unique_sources)):
+            pairs = np.flatnonzero((source_index >= chunk.start) & (source_index < chunk.stop))
+            rows = source_index[pairs] - chunk.start
+            if paths:
+                chunk_distances, predecessors = self._dijkstra(unique_sources[chunk], limit=limit, return_predecessors=True, matrix=matrix)
+                for pair, row in zip(pairs, rows):
+                    node_paths[pair], link_paths[pair] = self._path(predecessors[row], sources[pair], targets[pair], reverse)
+            else:
+                chunk_distances = self._dijkstra(unique_sources[chunk], limit=limit, matrix=matrix)
+            distances[pairs] = chunk_distances[rows, targets[pairs]]
+        result = pd.DataFrame({'origin': self.nodes[origin_positions], 'destination': self.nodes[destination_positions], 'distance': distances})
+        if paths:
+            result['path'] = node_paths
+            result['links'] = link_paths
+        return result
+
+    def reachable(self, origins, limit=None):
+        """
+        Returns a boolean DataFrame of the nodes that can be reached from each origin, within
+        limit if given, indexed by the origins with a column per node.
+        """
+        return np.isfinite(self.distance_matrix(origins, limit=limit))
+
+    def components(self):
+        """
+        Returns the strongly connected component of every node as a Series indexed by the node ids.
+        Nodes in different components cannot reach each other in both directions.
+        """
+        _, labels = csgraph.connected_components(self.matrix, directed=True, connection='strong')
+        return pd.Series(labels, index=self.nodes, name='component')
+
+    def _dijkstra(self, source_positions, limit=None, return_predecessors=False, matrix=None):
+        return csgraph.dijkstra(self.matrix if matrix is None else matrix, directed=True, indices=source_positions,
+                                limit=np.inf if limit is None else limit, return_predecessors=return_predecessors)
+
+    def _chunks(self, count):
+        size = max(1, CHUNK_CELLS // max(len(self.nodes), 1))
+        return [slice(start, min(start + size, count)) for start in range(0, count, size)]
+
+    def _path(self, predecessors, source, target, reverse=False):
+        # Walks the predecessors back from the target. A search along the reversed links
+        # walks from the origin to the destination, so the path is already in order.
+        if source != target and predecessors[target] < 0:
+            return None, None
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        path = np.array(path if reverse else path[::-1], dtype='int64')
+        # The link of each step is the matrix value of its row and column
+        values = self.matrix.indptr[path[:-1]] + np.array([
+            np.searchsorted(self.matrix.indices[self.matrix.indptr[start]:self.matrix.indptr[start + 1]], end)
+            for start, end in zip(path[:-1], path[1:])], dtype='int64')
+        return self.nodes[path], self.link_rows[values]
@@ -0,0 +1,103 @@
+import numpy as np
+import shapely
+
+from . import geometry
+
+# Ids are resolved with a dense lookup table when it has at most this many slots per node,
+# otherwise with a binary search in the sorted ids
+DENSE_LOOKUP_RATIO = 8
+
+
+class NodeIndex:
+    """
+    Node ids and their coordinates as arrays, for resolving whole arrays of node ids at once.
+
+    Attributes
+    ----------
+    ids : np.ndarray
+        Node ids, in the order of the rows they were created from
+    x, y, z : np.ndarray
+        Coordinates of the nodes, z is NaN for nodes without an elevation
+    """
+
+    def __init__(self, ids, x, y, z=None):
+        self.ids = np.asarray(ids, dtype='int64')
+        self.x = np.asarray(x, dtype='float64')
+        self.y = np.asarray(y, dtype='float64')
+        self.z = np.full(len(self.ids), np.nan) if z is None else np.array(z, dtype='float64')
+        self._order = np.argsort(self.ids, kind='stable')
+        self._sorted_ids = self.ids[self._order]
+        if (np.diff(self._sorted_ids) == 0).any():
+            duplicates = np.unique(self._sorted_ids[1:][np.diff(self._sorted_ids) == 0])
+            raise ValueError(f"Node ids are not unique: {duplicates[:10].tolist()}")
+        self._lookup = None
+        if len(self.ids):
+            self._min_id = self._sorted_ids[0]
+            span = self._sorted_ids[-1] - self._min_id + 1
+            if span <= DENSE_LOOKUP_RATIO * len(self.ids):
+                self._lookup = np.full(span, -1, dtype='int64')
+                self._lookup[self.ids - self._min_id] = np.arange(len(self.ids))
+
+    @classmethod
+    def from_points(cls, ids, points):
+        """
+        Creates a NodeIndex from node ids and their Point geometries, keeping their elevations.
+        """
+        points = np.asarray(points, dtype='object')
+        return cls(ids, shapely.get_x(points), shapely.get_y(points), shapely.get_z(points))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node):
+        return bool(self.positions([node], missing='ignore')[0] >= 0)
+
+    def positions(self, ids, missing='raise'):
+        """
+        Returns the row positions of the nodes ids. Unknown ids raise a KeyError,
+        or get the position -1 if missing is 'ignore'.
+        """
+        ids = np.asarray(ids, dtype='int64')
+        if self._lookup is not None:
+            offsets = ids - self._min_id
+            inside = (offsets >= 0) & (offsets < len(self._lookup))
+            positions = np.full(ids.shape, -1, dtype='int64')
+            positions[inside] = self._lookup[offsets[inside]]
+        elif len(self.ids):
+            found = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self.ids) - 1)
+            positions = np.where(self._sorted_ids[found] == ids, self._order[found], -1)
+        else:
+            positions = np.full(ids.shape, -1, dtype='int64')
+        if missing == 'raise' and (positions < 0).any():
+            unknown = np.unique(ids[positions < 0])
+            raise KeyError(f"{len(unknown)} nodes not found: {unknown[:10].tolist()}")
+        return positions
+
+    def coordinates(self, ids, include_z=False, missing='raise'):
+        """
+        Returns the coordinates of the nodes ids as an (n, 2) or (n, 3) array. With missing='ignore',
+        unknown ids get NaN coordinates.
+        """
+        positions = self.positions(ids, missing=missing)
+        found = positions >= 0
+        columns = [self.x, self.y, self.z] if include_z else [self.x, self.y]
+        coords = np.full((len(positions), len(columns)), np.nan)
+        coords[found] = np.column_stack(columns)[positions[found]]
+        return coords
+
+    def points(self, ids, missing='raise'):
+        """
+        Returns the nodes ids as Points, with elevations if they have them. With missing='ignore',
+        unknown ids get None.
+        """
+        coords = self.coordinates(ids, include_z=True, missing=missing)
+        has_z = ~np.isnan(coords[:, 2])
+        points = np.where(has_z, geometry.points(coords[:, 0], coords[:, 1], np.where(has_z, coords[:, 2], 0.0)),
+                          geometry.points(coords[:, 0], coords[:, 1]))
+        return np.where(np.isnan(coords[:, 0]), None, points)
+
+    def set_elevations(self, ids, z):
+        """
+        Sets the elevations of the nodes ids.
+        """
+        self.z[self.positions(ids)] = np.asarray(z, dtype='float64')
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from .emme_network import EmmeNetwork
+from .node_index import NodeIndex
+from . import geometry
+from . import schema
+
+# Columns of the links table of the base network file, the link geometry follows them in an EmmeNetwork
+BASE_LINK_COLUMNS = ['c', 'From', 'To', 'Length', 'Modes', 'Typ', 'Lan', 'VDF', 'Data1', 'Data2', 'Data3']
+
+
+class NormalizedNetwork:
+    """
+    An Emme network stored as a node table and a link table. Created in scenario_reader.py
+
+    An EmmeNetwork copies the attributes of both end nodes to every link as '_from' and '_to'
+    columns and stores a LineString per link. Here every node is stored once, the links refer
+    to their end nodes by the integer node ids in From and To, and the link geometries are
+    derived from the node coordinates, and the link_shape vertices of curved links, when they
+    are needed. Moving a node therefore moves all its links, and nodes without links need no
+    placeholder links. Elevations are not stored.
+
+    Use to_network for the EmmeNetwork view with the '_from' and '_to' columns, e.g. for
+    the exports.
+
+    Attributes
+    ----------
+    nodes : pd.DataFrame
+        One row per node, with the columns of the nodes table of the base network file
+        (c, Node, X-coord, Y-coord, Data1-3, Label) and the extra node attributes
+    links : pd.DataFrame
+        One row per link, with From, To, the other link columns of the base network file,
+        the extra link attributes and the network fields
+    vertices : pd.DataFrame, optional
+        The link_shape table, the vertices of the curved links between their end nodes
+    crs : str
+        Coordinate reference system of the node coordinates
+    """
+
+    def __init__(self, nodes, links, vertices=None, crs='EPSG:3879'):
+        self.nodes = nodes.reset_index(drop=True)
+        self.links = links.reset_index(drop=True)
+        self.vertices = vertices if vertices is not None and len(vertices) else None
+        self.crs = crs
+
+    @classmethod
+    def from_network(cls, network, compact=True):
+        """
+        Creates a NormalizedNetwork from an EmmeNetwork, collecting the node attributes from
+        its '_from' and '_to' columns and the vertices from its curved link geometries.
+        """
+        node_columns = [col[:-len('_from')] for col in network.columns if col.endswith('_from') and col != 'c_from']
+        to_columns = [col for col in node_columns if f'{col}_to' in network.columns]
+        links = network[network['To'] > 0]
+
+        # Nodes with links from them, including the orphan nodes, get their attributes from
+        # the '_from' columns and the rest of the nodes from the '_to' columns of their links
+        first_from = network[~network['From'].duplicated().to_numpy()]
+        from_coords = geometry.coordinates(first_from.geometry.to_numpy())
+        nodes = pd.DataFrame({
+            'c': first_from['c_from'].to_numpy() if 'c_from' in network.columns else 'a',
+            'Node': first_from['From'].to_numpy('int64'),
+            'X-coord': from_coords[:, 0],
+            'Y-coord': from_coords[:, 1],
+        })
+        for col in node_columns:
+            nodes[col] = first_from[f'{col}_from'].to_numpy()
+        to_only = links[~links['To'].isin(nodes['Node']).to_numpy()]
+        to_only = to_only[~to_only['To'].duplicated().to_numpy()]
+        if len(to_only):
+            to_coords = shapely.get_coordinates(shapely.get_point(to_only.geometry.to_numpy(), -1))
+            to_nodes = pd.DataFrame({'c': 'a', 'Node': to_only['To'].to_numpy('int64'), 'X-coord': to_coords[:, 0], 'Y-coord': to_coords[:, 1]})
+            if 'is_connector' in network.columns and 'c_from' in network.columns:
+                # The node type of the end nodes is not stored, a node is a centroid if a link to it
+                # from a regular node is a connector
+                incoming = links[links['To'].isin(to_only['To']).to_numpy()]
+                from_centroid = incoming['c_from'].astype(str).str.startswith('a*').to_numpy()
+                centroids = incoming['To'].to_numpy()[incoming['is_connector'].to_numpy().astype(bool) & ~from_centroid]
+                to_nodes['c'] = np.where(to_nodes['Node'].isin(centroids), 'a*', 'a')
+            for col in to_columns:
+                to_nodes[col] = to_only[f'{col}_to'].to_numpy()
+            nodes = pd.concat([nodes, to_nodes], ignore_index=True)
+        nodes = nodes.sort_values('Node', ignore_index=True)
+
+        link_columns = [col for col in links.columns if col != 'is_connector' and col != links.geometry.name
+                        and not col.endswith(('_from', '_to'))]
+        links = pd.DataFrame(links[link_columns]).reset_index(drop=True)
+        vertices = network.link_vertices()
+        if compact:
+            nodes = schema.compact(nodes, 'nodes')
+            vertices = schema.compact(vertices, 'link_shape')
+        return cls(nodes, links, vertices, crs=network.crs)
+
+    @property
+    def node_index(self):
+        """
+        A NodeIndex of the current node table, for resolving node ids to positions and coordinates.
+        """
+        return NodeIndex(self.nodes['Node'], self.nodes['X-coord'], self.nodes['Y-coord'])
+
+    def endpoints(self):
+        """
+        Returns the positions of the start and end nodes of every link in the node table.
+        """
+        node_index = self.node_index
+        return node_index.positions(self.links['From']), node_index.positions(self.links['To'])
+
+    def node_geometries(self):
+        """
+        Returns the nodes as Points, indexed by the node id.
+        """
+        return gpd.GeoSeries(geometry.points(self.nodes['X-coord'], self.nodes['Y-coord']),
+                             index=self.nodes['Node'].to_numpy(), crs=self.crs)
+
+    def link_geometries(self):
+        """
+        Returns the link geometries, built from the current node coordinates and the vertices of
+        the curved links. The series has the index of the link table.
+        """
+        return gpd.GeoSeries(link_geometries(self.links['From'], self.links['To'], self.node_index, self.vertices),
+                             index=self.links.index, crs=self.crs)
+
+    def to_network(self):
+        """
+        Returns the network as an EmmeNetwork, with the node attributes joined to the links as
+        '_from' and '_to' columns and a Point row with To = 0 for every node without links.
+        This is the same table that ScenarioReader.network builds.
+        """
+        links = self.links.copy()
+        position = max(links.columns.get_loc(col) for col in BASE_LINK_COLUMNS if col in links.columns) + 1
+        links.insert(position, 'geometry', link_geometries(links['From'], links['To'], self.node_index, self.vertices))
+        nodes = self.nodes.copy()
+        nodes['geometry'] = geometry.points(nodes['X-coord'], nodes['Y-coord'])
+        network = join_node_data(links, nodes, self.node_index)
+        network['From'] = network['From'].astype('int64')
+        network['To'] = network['To'].astype('int64')
+        return EmmeNetwork(schema.compact(network, 'network'), geometry='geometry', crs=self.crs)
+
+    def memory_usage(self):
+        """
+        Returns the memory use of the node, link and vertex tables in bytes.
+        """
+        tables = [self.nodes, self.links] + ([self.vertices] if self.vertices is not None else [])
+        return int(sum(table.memory_usage(deep=True).sum() for table in tables))
+
+
+def link_geometries(from_nodes, to_nodes, node_index, vertices=None, source='the link_shape file'):
+    """
+    Creates the geometries of the links between the from_nodes and to_nodes, through the vertices
+    of the link_shape table if given. Links whose nodes are not in node_index get empty geometries.
+    """
+    from_coords = node_index.coordinates(from_nodes, missing='ignore')
+    to_coords = node_index.coordinates(to_nodes, missing='ignore')
+    if vertices is None:
+        return geometry.segments(from_coords[:, 0], from_coords[:, 1], to_coords[:, 0], to_coords[:, 1])
+    links = pd.MultiIndex.from_arrays([np.asarray(from_nodes, dtype='int64'), np.asarray(to_nodes, dtype='int64')])
+    link_index = links.get_indexer(pd.MultiIndex.from_arrays([vertices['I_Node'].to_numpy('int64'), vertices['J_Node'].to_numpy('int64')]))
+    found = link_index >= 0
+    if not found.all():
+        print(f"Ignoring the vertices of {len(vertices[~found].drop_duplicates(['I_Node', 'J_Node']))} links in {source} that are not in the network.")
+    # The vertices are sorted by link, but the links of the network may be in a different order
+    order = np.argsort(link_index[found], kind='stable')
+    found_vertices = vertices[found].iloc[order]
+    return geometry.polylines(from_coords[:, 0], from_coords[:, 1], to_coords[:, 0], to_coords[:, 1],
+                              link_index[found][order], found_vertices['X-Coord'], found_vertices['Y-Coord'])
+
+
+def join_node_data(df_links, gdf_nodes, node_index):
+    """
+    Joins the attributes of the end nodes to the links as '_from' and '_to' columns, and adds a
+    row with To = 0 and a Point geometry for every node without links.
+    """
+    # Find orphan nodes with no connecting links
+    link_nodes = node_index.positions(np.concatenate([df_links['From'], df_links['To']]), missing='ignore')
+    is_linked = np.zeros(len(node_index), dtype=bool)
+    is_linked[link_nodes[link_nodes >= 0]] = True
+
+    # Create DataFrame for orphan nodes with their geometries
+    orphan_df = gdf_nodes[~is_linked].copy()
+    orphan_df['From'] = orphan_df['Node']
+    orphan_df['To'] = 0  # No node has this id, used to find orphan nodes when exporting
+
+    # Append orphan nodes to links DataFrame
+    df_links = pd.concat([df_links, orphan_df[['From', 'To', 'geometry']]], ignore_index=True)
+
+    # Merge node data for 'From' nodes
+    df_links = df_links.merge(gdf_nodes.add_suffix('_from'), left_on='From', right_on='Node_from', how='left')
+    # Merge node data for 'To' nodes
+    df_links = df_links.merge(gdf_nodes.add_suffix('_to'), left_on='To', right_on='Node_to', how='left')
+    df_links['is_connector'] = ((df_links['c_to'] == 'a*') | (df_links['c_from'] == 'a*')).astype('int64')
+    return df_links.drop(columns=['c', 'c_to', 'Node_from', 'Node_to', 'X-coord_from', 'X-coord_to', 'Y-coord_from', 'Y-coord_to', 'geometry_from', 'geometry_to'], errors='ignore')
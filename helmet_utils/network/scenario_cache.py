@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+import geopandas as gpd
+
+from .emme_network import EmmeNetwork
+from .transit_network import TransitNetwork
+from .turn_table import TurnTable
+from .emme_scenario import EmmeScenario
+from .scenario_reader import ScenarioReader
+from .scenario_source import file_signature, open_file
+
+# Default upper limit for the total size of the cache directory, in bytes
+DEFAULT_MAX_SIZE = 2 * 1024**3
+
+# The input files each group of cached tables is parsed from, as ScenarioReader attributes
+TABLE_SOURCES = {
+    'network': ['base_network_file', 'extra_links_file', 'extra_nodes_file', 'netfield_links_file', 'link_shape_file'],
+    'transit': ['base_network_file', 'transit_lines_file', 'extra_transit_lines_file', 'extra_segments_file',
+                'netfield_segments_file', 'netfield_transit_lines_file'],
+    'link_shape': ['link_shape_file'],
+    'modes': ['modes_file'],
+    'turns': ['turns_file'],
+    'vehicles': ['vehicles_file'],
+}
+
+MANIFEST = 'manifest.json'
+# Increased whenever the layout of the cached tables changes, older entries are parsed again
+FORMAT_VERSION = 8
+
+
+class ScenarioCache:
+    """
+    On-disk cache of parsed Emme scenarios, stored as GeoParquet/Parquet tables.
+
+    Every input file is fingerprinted by its path, size, modification time and content hash.
+    The files are only hashed when their path, size or modification time differ from the
+    stored fingerprint, so reloading an unchanged scenario does not read its input files.
+    A group of tables (network, transit, link_shape, modes, turns, vehicles) is only parsed
+    again when the fingerprint of one of its own input files changes. The cache directory is
+    kept under max_size bytes by evicting the least recently used scenarios.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Directory where the parsed tables are stored
+    max_size : int
+        Upper limit for the total size of the cache directory, in bytes
+    verify_hashes : bool
+        Hash the input files on every load, also when their path, size and modification time
+        match the cached fingerprint, e.g. for files whose modification times are not reliable
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE, verify_hashes=False):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("The scenario cache requires pyarrow. Install it with 'pip install helmet_utils[cache]'")
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.verify_hashes = verify_hashes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def load(self, scenario_directory, attributes=None, workers=None, pool='thread') -> EmmeScenario:
+        """
+        Returns the scenario in scenario_directory, parsing only the tables whose input files have changed.
+        The network is loaded immediately, the rest of the scenario on first access. Scenarios loaded
+        with different attributes, see ScenarioReader, are cached separately. If workers is given,
+        the input files of a group of tables that is parsed again are parsed concurrently in a
+        thread or process pool.
+        """
+        reader = ScenarioReader(scenario_directory, read_network=False, attributes=attributes)
+        entry_dir = self._entry_dir(scenario_directory, attributes)
+        fingerprints = {}
+        parse = partial(self._build_group, workers=workers, pool=pool)
+        network = self._load_group(reader, entry_dir, 'network', fingerprints, parse)
+        self._evict(keep=entry_dir)
+
+        meta = self._read_manifest(entry_dir)['tables']['network']['meta']
+        loaders = {group: partial(self._load_group, reader, entry_dir, group, fingerprints, parse)
+                   for group in TABLE_SOURCES if group != 'network'}
+        return EmmeScenario(network, None, scenario_directory, meta['project_name'], meta['scenario_name'], loaders=loaders)
+
+    def _load_group(self, reader, entry_dir, group, fingerprints, parse=None):
+        """
+        Reads a group of tables from the cache, or parses and caches them if any of their input files has changed.
+        """
+        manifest = self._read_manifest(entry_dir)
+        for attr in TABLE_SOURCES[group]:
+            if attr not in fingerprints:
+                fingerprints[attr] = self._fingerprint(getattr(reader, attr), manifest['files'].get(attr))
+        sources = {attr: fingerprints[attr] for attr in TABLE_SOURCES[group]}
+
+        cached = manifest['tables'].get(group)
+        if cached is not None and cached['sources'] == sources:
+            try:
+                value = self._read_group(entry_dir, group, cached, manifest)
+            except (OSError, ValueError) as e:
+                print(f"Could not read cached {group} tables, parsing them again: {e}")
+                cached = None
+        else:
+            cached = None
+        if cached is None:
+            value = (parse or self._build_group)(reader, group)
+            manifest['tables'][group] = self._write_group(entry_dir, group, value, reader)
+            manifest['tables'][group]['sources'] = sources
+
+        manifest['files'].update(sources)
+        manifest['scenario_directory'] = str(Path(reader.input_folder).resolve())
+        manifest['last_access'] = time.time()
+        self._write_manifest(entry_dir, manifest)
+        return value
+
+    def clear(self):
+        """
+        Removes all cached scenarios.
+        """
+        for entry_dir in self._entries():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def size(self):
+        """
+        Returns the total size of the cached tables in bytes.
+        """
+        return sum(self._entry_size(entry_dir) for entry_dir in self._entries())
+
+    # Table groups
+
+    @staticmethod
+    def _build_group(reader, group, workers=None, pool='thread'):
+        if workers is not None:
+            files = TABLE_SOURCES[group]
+            if reader.gdf_nodes is not None and (group != 'network' or reader.df_links is not None):
+                # The base network has already been read for another group
+                files = [attr for attr in files if attr not in ('base_network_file', 'extra_nodes_file')]
+            reader.read_files(files, workers=workers, pool=pool)
+        if group == 'network':
+            return reader.network()
+        elif group == 'transit':
+            return reader.transit()
+        else:
+            return getattr(reader, f'import_{group}')()
+
+    def _write_group(self, entry_dir, group, value, reader):
+        record = {'tables': {}}
+        if group == 'network':
+            record['tables']['network'] = self._write_table(entry_dir, 'network', gpd.GeoDataFrame(value))
+            record['meta'] = {'project_name': reader.project_name, 'scenario_name': reader.scenario_name}
+        elif group == 'transit':
+            for name in ('segments', 'transit_lines', 'stops'):
+                record['tables'][name] = self._write_table(entry_dir, name, getattr(value, name))
+        else:
+            record['tables'][group] = self._write_table(entry_dir, group, value)
+        return record
+
+    def _read_group(self, entry_dir, group, record, manifest):
+        tables = {name: self._read_table(entry_dir, name, written) for name, written in record['tables'].items()}
+        if group == 'network':
+            return EmmeNetwork(tables['network'])
+        elif group == 'transit':
+            transit = TransitNetwork(tables['segments'], tables['transit_lines'], tables['stops'])
+            meta = manifest['tables']['network']['meta']
+            transit.project_name = meta['project_name']
+            transit.scenario_name = meta['scenario_name']
+            return transit
+        elif group == 'turns' and tables['turns'] is not None:
+            return TurnTable(tables['turns'])
+        else:
+            return tables[group]
+
+    @staticmethod
+    def _write_table(entry_dir, name, df):
+        if df is None:
+            return False
+        os.makedirs(entry_dir, exist_ok=True)
+        path = entry_dir / f'{name}.parquet'
+        temp_path = entry_dir / f'{name}.parquet.tmp'
+        df.to_parquet(temp_path)
+        os.replace(temp_path, path)
+        return True
+
+    @staticmethod
+    def _read_table(entry_dir, name, written):
+        if not written:
+            return None
+        path = entry_dir / f'{name}.parquet'
+        try:
+            return gpd.read_parquet(path)
+        except ValueError:
+            # Not a GeoParquet file
+            return pd.read_parquet(path)
+
+    # Fingerprints and manifests
+
+    def _fingerprint(self, path, previous=None):
+        if path is None:
+            return None
+        full_path, size, mtime = file_signature(path)
+        fingerprint = {'path': full_path, 'size': size, 'mtime': mtime}
+        if not self.verify_hashes and previous and all(previous[key] == fingerprint[key] for key in fingerprint):
+            fingerprint['hash'] = previous['hash']
+        else:
+            fingerprint['hash'] = self._hash_file(path)
+        return fingerprint
+
+    @staticmethod
+    def _hash_file(path, block_size=2**20):
+        digest = hashlib.blake2b(digest_size=16)
+        with open_file(path, 'rb') as file:
+            while block := file.read(block_size):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_dir(self, scenario_directory, attributes=None):
+        location = str(Path(scenario_directory).resolve())
+        if attributes is not None:
+            location += '\n' + '\n'.join([attributes] if isinstance(attributes, str) else attributes)
+        key = hashlib.blake2b(location.encode(), digest_size=8).hexdigest()
+        return self.cache_dir / key
+
+    @staticmethod
+    def _read_manifest(entry_dir):
+        try:
+            with open(entry_dir / MANIFEST, 'r') as file:
+                manifest = json.load(file)
+            if manifest.get('version') == FORMAT_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': FORMAT_VERSION, 'files': {}, 'tables': {}}
+
+    @staticmethod
+    def _write_manifest(entry_dir, manifest):
+        os.makedirs(entry_dir, exist_ok=True)
+        temp_path = entry_dir / f'{MANIFEST}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(temp_path, entry_dir / MANIFEST)
+
+    # Size limit
+
+    def _entries(self):
+        return [path for path in self.cache_dir.iterdir() if path.is_dir()]
+
+    @staticmethod
+    def _entry_size(entry_dir):
+        return sum(path.stat().st_size for path in entry_dir.iterdir() if path.is_file())
+
+    def _evict(self, keep=None):
+        """
+        Removes the least recently used scenarios until the cache fits in max_size.
+        """
+        entries = []
+        for entry_dir in self._entries():
+            last_access = self._read_manifest(entry_dir).get('last_access', 0)
+            entries.append((last_access, entry_dir, self._entry_size(entry_dir)))
+        total_size = sum(size for _, _, size in entries)
+        for _, entry_dir, size in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_size:
+                break
+            if entry_dir == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
@@ -0,0 +1,229 @@
+import hashlib
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from .emme_scenario import EmmeScenario
+from .transit_network import TransitNetwork
+
+
+class SharedArrays:
+    """
+    Interns the column arrays of scenario tables, so that identical columns of different
+    scenarios are stored once.
+
+    Arrays are identified by their dtype, length and a hash of their contents, and compared
+    in full before they are shared. The arrays are read-only, since writing to a shared array
+    would change every scenario that uses it. Geometries are also interned one by one, so that
+    an unchanged link of a modified network still reuses the geometry object of the other
+    scenarios.
+    """
+
+    def __init__(self):
+        self._arrays = {}
+        self._dtypes = {}
+        self._indexes = {}
+        self._geometries = {}
+
+    def share_frame(self, df):
+        """
+        Returns a table with the same content as df whose columns are shared with earlier tables.
+        """
+        if df is None or not isinstance(df, pd.DataFrame):
+            return df
+        arrays = {position: self.share_values(df.iloc[:, position].array) for position in range(df.shape[1])}
+        shared = pd.DataFrame(arrays, index=self.share_index(df.index), copy=False)
+        shared.columns = df.columns
+        shared.attrs = df.attrs
+        if isinstance(df, gpd.GeoDataFrame):
+            geometry_column = df._geometry_column_name
+            if geometry_column == 'geometry':
+                shared = gpd.GeoDataFrame(shared, copy=False)
+            else:
+                shared = gpd.GeoDataFrame(shared).set_geometry(geometry_column)
+            if type(df) is not gpd.GeoDataFrame:
+                shared = type(df)(shared)
+        elif type(df) is not pd.DataFrame:
+            shared = type(df)(shared)
+        return shared
+
+    def share_values(self, values):
+        if isinstance(values, gpd.array.GeometryArray):
+            return gpd.array.GeometryArray(self._share_geometries(values._data), crs=values.crs)
+        if isinstance(values, pd.Categorical):
+            dtype = self._share_dtype(values.dtype)
+            return pd.Categorical.from_codes(self._share_array(values.codes), dtype=dtype, validate=False)
+        if isinstance(values, pd.arrays.NumpyExtensionArray):
+            return self._share_array(values.to_numpy())
+        # Other extension arrays, e.g. nullable integers, are kept as they are
+        return values
+
+    def share_index(self, index):
+        if isinstance(index, pd.RangeIndex) or isinstance(index, pd.MultiIndex):
+            return index
+        key = (str(index.dtype), len(index), self._digest(index.to_numpy()))
+        shared = self._indexes.setdefault(key, index)
+        return shared if shared.equals(index) else index
+
+    def _share_array(self, values):
+        key = (values.dtype.str, values.shape, self._digest(values))
+        shared = self._arrays.get(key)
+        if shared is None:
+            values = values.view()
+            values.flags.writeable = False
+            self._arrays[key] = values
+            return values
+        if shared is values or not np.array_equal(shared, values, equal_nan=values.dtype.kind in 'fc'):
+            return values
+        return shared
+
+    def _share_dtype(self, dtype):
+        key = (dtype.ordered, str(dtype.categories.dtype), self._digest(dtype.categories.to_numpy()))
+        shared = self._dtypes.setdefault(key, dtype)
+        return shared if shared == dtype else dtype
+
+    def _share_geometries(self, geometries):
+        wkb = shapely.to_wkb(geometries)
+        interned = np.empty(len(geometries), dtype=object)
+        for i, (geometry, key) in enumerate(zip(geometries, wkb)):
+            interned[i] = geometry if key is None else self._geometries.setdefault(key, geometry)
+        key = ('geometry', len(wkb), hashlib.blake2b(b'\0'.join(b'' if value is None else value for value in wkb)).hexdigest())
+        interned.flags.writeable = False
+        shared = self._arrays.get(key)
+        if shared is None:
+            self._arrays[key] = interned
+            return interned
+        if len(shared) == len(interned) and all(a is b for a, b in zip(shared, interned)):
+            return shared
+        return interned
+
+    @staticmethod
+    def _digest(values):
+        if values.dtype == object:
+            values = pd.util.hash_array(values)
+        return hashlib.blake2b(np.ascontiguousarray(values).view(np.uint8)).hexdigest()
+
+
+class ScenarioCollection:
+    """
+    A set of Emme scenarios that share their identical data, created with load_scenarios.
+
+    The scenarios are accessed by their name, which is the name of the scenario directory.
+    Tables that are identical in several scenarios, column by column, are stored only once,
+    and the same goes for identical geometries. The loaded tables are read-only: writing to
+    their values raises ValueError ('assignment destination is read-only'), while adding or
+    replacing whole columns works as usual. Use detach to get a scenario with its own copy
+    of the data before modifying it, or load the collection with share=False.
+
+    Lazily loaded components, e.g. the transit network, are shared when they are first accessed.
+    """
+
+    def __init__(self, scenarios=None, share=True):
+        self.shared_arrays = SharedArrays() if share else None
+        self._scenarios = {}
+        self._detached = set()
+        for name, scenario in (scenarios or {}).items():
+            self.add(name, scenario)
+
+    def add(self, name, scenario):
+        """
+        Adds a scenario to the collection and shares its data with the earlier scenarios.
+        """
+        if name in self._scenarios:
+            raise ValueError(f"The collection already has a scenario named {name}")
+        self._scenarios[name] = scenario
+        if self.shared_arrays is not None:
+            self._share_scenario(name, scenario)
+
+    def __getitem__(self, name):
+        try:
+            return self._scenarios[name]
+        except KeyError:
+            raise KeyError(f"No scenario named {name} in the collection, the scenarios are: {', '.join(self._scenarios)}")
+
+    def __iter__(self):
+        return iter(self._scenarios)
+
+    def __len__(self):
+        return len(self._scenarios)
+
+    def __contains__(self, name):
+        return name in self._scenarios
+
+    @property
+    def names(self):
+        return list(self._scenarios)
+
+    def items(self):
+        return self._scenarios.items()
+
+    def values(self):
+        return self._scenarios.values()
+
+    def _share_scenario(self, name, scenario):
+        scenario.network = self.shared_arrays.share_frame(scenario.network)
+        for component in EmmeScenario.LAZY_COMPONENTS:
+            if scenario.is_loaded(component):
+                setattr(scenario, component, self._share_component(name, getattr(scenario, component)))
+            else:
+                loader = scenario._loaders[component]
+                scenario._loaders[component] = lambda loader=loader: self._share_component(name, loader())
+
+    def _share_component(self, name, component):
+        if name in self._detached:
+            return component
+        if not isinstance(component, TransitNetwork):
+            return self.shared_arrays.share_frame(component)
+        for table in TransitNetwork.TABLES:
+            if table in component._tables:
+                component._tables[table] = self.shared_arrays.share_frame(component._tables[table])
+            else:
+                loader = component._loaders[table]
+                component._loaders[table] = lambda loader=loader: self._share_component(name, loader())
+        return component
+
+    def detach(self, name):
+        """
+        Gives the scenario its own copy of all its data, so that it can be modified without
+        affecting the other scenarios. Returns the scenario.
+        """
+        scenario = self[name]
+        if self.shared_arrays is None or name in self._detached:
+            return scenario
+        self._detached.add(name)
+        scenario.network = type(scenario.network)(scenario.network.copy())
+        for component in EmmeScenario.LAZY_COMPONENTS:
+            if not scenario.is_loaded(component):
+                continue
+            value = getattr(scenario, component)
+            if isinstance(value, TransitNetwork):
+                for table, df in list(value._tables.items()):
+                    value._tables[table] = df.copy() if df is not None else None
+            elif value is not None:
+                setattr(scenario, component, value.copy())
+        return scenario
+
+
+def load_scenarios(scenario_directories, share=True, cache_dir=None, max_cache_size=None, workers=None, pool='thread', attributes=None):
+    """
+    Reads several Emme scenarios into a ScenarioCollection, in which the identical tables and
+    geometries of the scenarios are stored only once.
+
+    The scenarios are named after their directories, or by their full paths if the directory
+    names are not unique. The other arguments are the same as in get_emme_scenario.
+    """
+    from .scenario_reader import get_emme_scenario
+    directories = [Path(directory) for directory in scenario_directories]
+    unique_names = len({directory.name for directory in directories}) == len(directories)
+    collection = ScenarioCollection(share=share)
+    for directory in directories:
+        name = directory.name if unique_names else str(directory)
+        if name in collection:
+            raise ValueError(f"Scenario directory {directory} is given more than once")
+        # Each scenario is shared right after it is read, so its duplicate tables are freed
+        # before the next scenario is read
+        collection.add(name, get_emme_scenario(directory, cache_dir=cache_dir, max_cache_size=max_cache_size, workers=workers, pool=pool, attributes=attributes))
+    return collection
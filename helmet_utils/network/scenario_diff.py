@@ -0,0 +1,213 @@
+"""
+Structural differences between two Emme scenarios.
+
+The rows of each table are matched by their key columns with a hash join, and the matched
+rows are compared column by column with vectorized operations.
+"""
+import numpy as np
+import pandas as pd
+import shapely
+
+from .turn_table import TurnTable
+
+# Key columns of the compared tables
+TABLE_KEYS = {
+    'nodes': ['Node'],
+    'links': ['From', 'To'],
+    'turns': ['At', 'From', 'To'],
+    'transit_lines': ['Line'],
+    'segments': ['Line', 'Segment_num'],
+}
+
+
+class TableDiff:
+    """
+    Differences of one table between two scenarios.
+
+    Attributes
+    ----------
+    name : str
+        Name of the table, e.g. 'links'
+    key : list of str
+        Columns that identify a row
+    added : DataFrame
+        Rows that are only in the other scenario
+    removed : DataFrame
+        Rows that are only in this scenario
+    modified : DataFrame
+        Rows of the other scenario whose values differ from the row with the same key in this scenario
+    changes : DataFrame
+        One row per modified value, with the key columns, 'column', 'old' and 'new'
+    added_columns, removed_columns : list of str
+        Columns that are only in the other or only in this scenario, these are not compared
+    """
+
+    def __init__(self, name, key, added, removed, modified, changes, added_columns, removed_columns):
+        self.name = name
+        self.key = key
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.changes = changes
+        self.added_columns = added_columns
+        self.removed_columns = removed_columns
+
+    @property
+    def changed_columns(self):
+        return list(self.changes['column'].unique())
+
+    def __bool__(self):
+        return bool(len(self.added) or len(self.removed) or len(self.modified) or self.added_columns or self.removed_columns)
+
+    def __repr__(self):
+        return (f"<TableDiff {self.name}: {len(self.added)} added, {len(self.removed)} removed, "
+                f"{len(self.modified)} modified, changed columns: {self.changed_columns}>")
+
+
+class ScenarioDiff:
+    """
+    Differences between two scenarios, created with EmmeScenario.diff. The TableDiff of each
+    compared table is available as an attribute, e.g. diff.links, or with diff['links'].
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def __getattr__(self, name):
+        tables = self.__dict__.get('tables', {})
+        if name in tables:
+            return tables[name]
+        raise AttributeError(name)
+
+    def __bool__(self):
+        return any(self.tables.values())
+
+    def summary(self):
+        """
+        Returns the number of added, removed and modified rows and the changed columns of each table.
+        """
+        return pd.DataFrame([{
+            'table': name,
+            'added': len(table.added),
+            'removed': len(table.removed),
+            'modified': len(table.modified),
+            'changed_columns': ', '.join(table.changed_columns),
+        } for name, table in self.tables.items()]).set_index('table')
+
+    def __repr__(self):
+        return self.summary().to_string()
+
+
+def diff_scenarios(scenario, other, tables=None):
+    """
+    Compares two EmmeScenarios, see EmmeScenario.diff.
+    """
+    tables = list(TABLE_KEYS) if tables is None else tables
+    for name in tables:
+        if name not in TABLE_KEYS:
+            raise ValueError(f"Unknown table: {name}, use some of {list(TABLE_KEYS)}")
+    return ScenarioDiff({name: diff_tables(_table(scenario, name), _table(other, name), TABLE_KEYS[name], name) for name in tables})
+
+
+def _table(scenario, name):
+    if name == 'nodes':
+        # The cached node table of the network, without its index so that Node is compared as a key column
+        return scenario.network.nodes.reset_index(drop=True)
+    if name == 'links':
+        return scenario.network[scenario.network['To'] > 0]
+    if name == 'turns':
+        return scenario.turns.flat() if isinstance(scenario.turns, TurnTable) else scenario.turns
+    if scenario.transit is None:
+        return None
+    if name == 'transit_lines':
+        return scenario.transit.transit_lines
+    return scenario.transit.segments.reset_index()
+
+
+def diff_tables(table, other, key, name=None):
+    """
+    Compares two tables whose rows are identified by the key columns.
+    Returns a TableDiff, where table is the old and other the new version.
+    """
+    if table is None:
+        table = pd.DataFrame(columns=other.columns if other is not None else key)
+    if other is None:
+        other = pd.DataFrame(columns=table.columns)
+    for df in (table, other):
+        missing = [column for column in key if column not in df.columns]
+        if missing:
+            raise ValueError(f"The {name} table has no key columns {missing}")
+        if df.duplicated(subset=key).any():
+            raise ValueError(f"The key {key} of the {name} table is not unique")
+
+    # Hash join on the key columns only, the positions are used to align the rest of the columns
+    left = _keys(table, key).assign(_left=np.arange(len(table)))
+    right = _keys(other, key).assign(_right=np.arange(len(other)))
+    joined = left.merge(right, on=key, how='outer', indicator=True, sort=False)
+    removed = table.iloc[joined.loc[joined['_merge'] == 'left_only', '_left'].astype('int64').to_numpy()]
+    added = other.iloc[joined.loc[joined['_merge'] == 'right_only', '_right'].astype('int64').to_numpy()]
+    both = joined[joined['_merge'] == 'both']
+    left_rows = both['_left'].astype('int64').to_numpy()
+    right_rows = both['_right'].astype('int64').to_numpy()
+
+    compared = [column for column in table.columns if column in other.columns and column not in key]
+    changed_rows = np.zeros(len(both), dtype=bool)
+    changes = []
+    for column in compared:
+        old = table[column].to_numpy()[left_rows]
+        new = other[column].to_numpy()[right_rows]
+        different = ~_equal(old, new)
+        if different.any():
+            changed_rows |= different
+            change = both.loc[different, key].reset_index(drop=True)
+            change['column'] = column
+            change['old'] = pd.Series(old[different], dtype=object)
+            change['new'] = pd.Series(new[different], dtype=object)
+            changes.append(change)
+    if changes:
+        changes = pd.concat(changes, ignore_index=True)
+    else:
+        changes = pd.DataFrame(columns=key + ['column', 'old', 'new'])
+    modified = other.iloc[right_rows[changed_rows]]
+    return TableDiff(name, key, added, removed, modified, changes,
+                     added_columns=[column for column in other.columns if column not in table.columns],
+                     removed_columns=[column for column in table.columns if column not in other.columns])
+
+
+def _keys(df, key):
+    keys = df[key].reset_index(drop=True)
+    # Categorical keys of different scenarios have different categories, join them as values
+    for column in key:
+        if isinstance(keys[column].dtype, pd.CategoricalDtype):
+            keys[column] = keys[column].astype(keys[column].cat.categories.dtype)
+    return keys
+
+
+def _equal(old, new):
+    """
+    Elementwise equality of two aligned arrays, where missing values equal each other.
+    """
+    if isinstance(old, pd.Categorical) or isinstance(new, pd.Categorical):
+        old, new = np.asarray(old, dtype=object), np.asarray(new, dtype=object)
+    if old.dtype.kind in 'biuf' and new.dtype.kind in 'biuf':
+        # A column can be float32 in one scenario and float64 in the other, compare them in the lower precision
+        if old.dtype == 'float32' or new.dtype == 'float32':
+            old, new = old.astype('float32'), new.astype('float32')
+        equal = old == new
+        if old.dtype.kind == 'f' or new.dtype.kind == 'f':
+            equal |= np.isnan(old.astype('float64')) & np.isnan(new.astype('float64'))
+        return equal
+    old, new = old.astype(object), new.astype(object)
+    if len(old) and (isinstance(_first(old), shapely.Geometry) or isinstance(_first(new), shapely.Geometry)):
+        return shapely.equals_exact(old, new, tolerance=0) | (pd.isna(old) & pd.isna(new))
+    return (old == new) | (pd.isna(old) & pd.isna(new))
+
+
+def _first(values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
@@ -1,11 +1,42 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point, LineString, MultiPoint
 from .emme_network import EmmeNetwork
 from .transit_network import TransitNetwork
+from .turn_table import TurnTable
+from .node_index import NodeIndex
+from .normalized_network import NormalizedNetwork
+from . import normalized_network
 from .emme_scenario import EmmeScenario
-import re
+from . import transaction_parser
+from . import geometry
+from . import schema
+from . import scenario_source
+
+# Parsers of the input files that can be read independently of each other, by ScenarioReader attribute
+FILE_PARSERS = {
+    'base_network_file': transaction_parser.read_base_network,
+    'extra_links_file': transaction_parser.read_extra_attributes,
+    'extra_nodes_file': transaction_parser.read_extra_attributes,
+    'netfield_links_file': transaction_parser.read_netfield_links,
+    'transit_lines_file': transaction_parser.read_transit_lines,
+    'extra_transit_lines_file': transaction_parser.read_extra_transit_lines,
+    'extra_segments_file': transaction_parser.read_extra_segments,
+    'netfield_segments_file': transaction_parser.read_netfield_segments,
+    'netfield_transit_lines_file': transaction_parser.read_netfield_transit_lines,
+    'link_shape_file': transaction_parser.read_link_shape,
+    'modes_file': transaction_parser.read_modes,
+    'turns_file': transaction_parser.read_turns,
+    'vehicles_file': transaction_parser.read_vehicles,
+}
+
+# Files whose extra attributes can be selected with the attributes argument of ScenarioReader
+ATTRIBUTE_FILES = ['extra_links_file', 'extra_nodes_file', 'extra_segments_file']
+
+POOLS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
 
 class ScenarioReader:
     """
@@ -16,7 +47,21 @@ class ScenarioReader:
     Attributes
     ----------
     scenario_directory : str
-        Scenario directory location
+        Scenario directory location, or a .zip, .tar, .tar.gz or .tar.zst archive of the directory
+    read_network : bool
+        Parse the base network immediately, otherwise it is parsed when first needed
+    workers : int, optional
+        If given, all input files are parsed concurrently with this many workers on initialization
+    pool : str
+        'thread' or 'process', the kind of worker pool used when workers is given
+    compact : bool
+        Store the tables with the compact column types declared in schema.SCHEMAS
+    categorical : bool
+        Also store the repeated strings, e.g. modes and labels, as categoricals. This saves
+        memory, but the columns no longer accept new values, so use it for tables that are only read.
+    attributes : list of str, optional
+        Glob patterns of the extra link, node and segment attributes to load, e.g. ['@car_*_aht'].
+        The other attributes are skipped when the files are parsed. By default all attributes are loaded.
 
     Methods
     -------
@@ -25,406 +70,251 @@ class ScenarioReader:
 
     """
 
-    def __init__(self, scenario_directory) -> None:
+    def __init__(self, scenario_directory, read_network=True, workers=None, pool='thread', compact=True, categorical=False, attributes=None) -> None:
         self.input_folder = scenario_directory
         print("Currently only supports an Emme/Helmet scenario that has not been run. Make sure that data has not been lost if the model has run.")
         self.scenario_dir = Path(scenario_directory)
+        # A directory, or a zip or tar archive whose files are read without extracting them
+        self.source = scenario_source.open_source(scenario_directory)
+        self.compact = compact
+        self.categorical = categorical
+        self.attributes = attributes
         # Network
-        self.base_network_file = next(self.scenario_dir.glob('base_network*.txt'), None)
-        self.extra_links_file = next(self.scenario_dir.glob('extra_links*.txt'), None)
-        self.extra_nodes_file = next(self.scenario_dir.glob('extra_nodes*.txt'), None)
+        self.base_network_file = self.source.find('base_network*.txt')
+        self.extra_links_file = self.source.find('extra_links*.txt')
+        self.extra_nodes_file = self.source.find('extra_nodes*.txt')
         # Transit
-        self.transit_lines_file = next(self.scenario_dir.glob('transit_lines*.txt'), None)
-        self.extra_transit_lines_file = next(self.scenario_dir.glob('extra_transit_lines*.txt'), None)
+        self.transit_lines_file = self.source.find('transit_lines*.txt')
+        self.extra_transit_lines_file = self.source.find('extra_transit_lines*.txt')
         # Only present if the model has run
-        self.extra_segments_file = next(self.scenario_dir.glob('*extra_segments*.txt'), None)
+        self.extra_segments_file = self.source.find('*extra_segments*.txt')
         # Optional netfield values
-        self.netfield_links_file = next(self.scenario_dir.glob('netfield_links*.txt'), None)
-        self.netfield_nodes_file = next(self.scenario_dir.glob('netfield_nodes*.txt'), None)
-        self.netfield_segments_file = next(self.scenario_dir.glob('netfield_segments*.txt'), None)
-        self.netfield_transit_lines_file = next(self.scenario_dir.glob('netfield_transit_lines*.txt'), None)
+        self.netfield_links_file = self.source.find('netfield_links*.txt')
+        self.netfield_nodes_file = self.source.find('netfield_nodes*.txt')
+        self.netfield_segments_file = self.source.find('netfield_segments*.txt')
+        self.netfield_transit_lines_file = self.source.find('netfield_transit_lines*.txt')
         # Additional files
-        self.link_shape_file = next(self.scenario_dir.glob('link_shape_*.txt'), None)
-        self.modes_file = next(self.scenario_dir.glob('modes_*.txt'), None)
-        self.turns_file = next(self.scenario_dir.glob('turns_*.txt'), None)
-        self.vehicles_file = next(self.scenario_dir.glob('vehicles_*.txt'), None)
-        # Process the files if they exist
-        if self.base_network_file:
-            self.gdf_nodes, self.df_links = self._extract_df_from_base_network()
-            # Create a dictionary to map node geometries to node numbers
-            self.node_dict = dict(zip(self.gdf_nodes['Node'], self.gdf_nodes['geometry']))
-        else:
+        self.link_shape_file = self.source.find('link_shape_*.txt')
+        self.modes_file = self.source.find('modes_*.txt')
+        self.turns_file = self.source.find('turns_*.txt')
+        self.vehicles_file = self.source.find('vehicles_*.txt')
+        if not self.base_network_file:
             raise FileNotFoundError("Scenario directory not found.")
-
+        self.gdf_nodes = None
+        self.df_links = None
+        # Parsed input files that have not been joined into the network or transit yet
+        self._parsed = {}
+        if workers is not None:
+            self.read_files(workers=workers, pool=pool)
+        # The base network is needed by both the network and transit, parse it now unless deferred
+        if read_network:
+            self._read_base_network()
+
+    def _read_base_network(self):
+        self.gdf_nodes, self.df_links = self._extract_df_from_base_network()
+        # Node ids and coordinates as arrays, for looking up whole columns of node ids at once
+        self.node_index = NodeIndex(self.gdf_nodes['Node'], self.gdf_nodes['X-coord'], self.gdf_nodes['Y-coord'])
+
+    def read_files(self, files=None, workers=None, pool='thread'):
+        """
+        Parses the independent input files concurrently. The results are joined into
+        the network and transit when they are built.
+
+        Parameters
+        ----------
+        files : list of str, optional
+            ScenarioReader file attributes to parse, all files in FILE_PARSERS by default
+        workers : int, optional
+            Maximum number of workers, by default decided by the executor
+        pool : str
+            'thread' or 'process'. Processes avoid the GIL in the pure Python parsers,
+            but the results have to be pickled back to the main process.
+        """
+        if pool not in POOLS:
+            raise ValueError(f"Unknown pool '{pool}', use one of {list(POOLS)}")
+        files = [attr for attr in (files or FILE_PARSERS) if getattr(self, attr) and attr not in self._parsed]
+        if workers == 1 or len(files) < 2:
+            for attr in files:
+                self._parsed[attr] = self._parser(attr)(getattr(self, attr))
+            return
+        with POOLS[pool](max_workers=workers) as executor:
+            futures = {attr: executor.submit(self._parser(attr), getattr(self, attr)) for attr in files}
+            for attr, future in futures.items():
+                self._parsed[attr] = future.result()
+
+    def _parsed_file(self, attr):
+        """
+        Returns the parsed contents of an input file, parsing it now if it was not read in advance.
+        """
+        if attr in self._parsed:
+            return self._parsed.pop(attr)
+        return self._parser(attr)(getattr(self, attr))
+
+    def _parser(self, attr):
+        if self.attributes is not None and attr in ATTRIBUTE_FILES:
+            return partial(FILE_PARSERS[attr], attributes=self.attributes)
+        return FILE_PARSERS[attr]
+
+    def _compact(self, df, table):
+        return schema.compact(df, table, categorical=self.categorical) if self.compact else df
 
     def scenario(self) -> EmmeScenario:
+        network = self.network()
+        # The links are now part of the network, the loaders below only need the nodes
+        self.df_links = None
+        # The rest of the scenario is parsed when first accessed
+        loaders = {
+            'transit': self.transit,
+            'link_shape': self.import_link_shape,
+            'modes': self.import_modes,
+            'turns': self.import_turns,
+            'vehicles': self.import_vehicles,
+        }
+        return EmmeScenario(network, None, self.input_folder, self.project_name, self.scenario_name, loaders=loaders)
+
+    def network(self) -> EmmeNetwork:
+        if self.gdf_nodes is None or self.df_links is None:
+            self._read_base_network()
         gdf_links = self.links_to_gdf()
 
         gdf_links['From'] = gdf_links['From'].astype('int64')
         gdf_links['To'] = gdf_links['To'].astype('int64')
-        network = EmmeNetwork(gdf_links, geometry='geometry', crs='EPSG:3879')
-        transit = self.transit()
-        link_shape = self.import_link_shape()
-        modes = self.import_modes()
-        turns = self.import_turns()
-        vehicles = self.import_vehicles()
-        return EmmeScenario(network, transit, self.input_folder, self.project_name, self.scenario_name, link_shape, modes, turns, vehicles)
+        return EmmeNetwork(self._compact(gdf_links, 'network'), geometry='geometry', crs='EPSG:3879')
 
 
     def _extract_df_from_base_network(self):
-        with open(self.base_network_file, 'r') as file:
-            lines = file.readlines()
-
-        # Identifiers for the start of each table
-        nodes_start = 't nodes'
-        links_start = 't links'
-
-        # Lists to hold the lines for each table
-        nodes_lines = []
-        links_lines = []
-
-        # Flags to identify which table we're currently reading
-        reading_nodes = False
-        reading_links = False
-
-        # Regular expression to fix centroids with missing space after 'a*'
-        node_line_regex = re.compile(r'^(a\*)\s*(\d+)')
-
-        # Process each line in the file
-        for line in lines:
-            if "Project:" in line:
-                self.project_name = line.split('Project:')[-1].strip()
-            if "Scenario" in line:
-                self.scenario_number = line.split('Scenario')[-1].split(':')[0]
-                self.scenario_name = line.split('Scenario')[-1].split(':')[-1].strip()
-            if nodes_start in line:
-                reading_nodes = True
-                reading_links = False
-                continue  # Skip the line with the table identifier
-            elif links_start in line:
-                reading_nodes = False
-                reading_links = True
-                continue  # Skip the line with the table identifier
-
-            # If we're reading a table, add the line to the appropriate list
-            if reading_nodes:
-                line = node_line_regex.sub(r'\1 \2', line)
-                nodes_lines.append(line)
-            elif reading_links:
-                links_lines.append(line)
-
-        # Convert lists to DataFrames
-        df_nodes = pd.DataFrame([line.split() for line in nodes_lines[1:]], columns=nodes_lines[0].split())
-        df_links = pd.DataFrame([line.split() for line in links_lines[1:]], columns=links_lines[0].split())
-
-        # Explicitly set the data types for each column
-        df_nodes = df_nodes.astype({
-            'Node': 'Int32',
-            'X-coord': 'float64',
-            'Y-coord': 'float64',
-            'Data1': 'float64',
-            'Data2': 'float64',
-            'Data3': 'float64',
-            'Label': 'str'
-        })
-        df_links = df_links.astype({
-            'From': 'Int32',
-            'To': 'Int32',
-            'Length': 'float64',
-            'Modes': 'str',
-            'Typ': 'int32',
-            'Lan': 'float64',
-            'VDF': 'int32',
-            'Data1': 'float64',
-            'Data2': 'float64',
-            'Data3': 'float64'
-        })
+        header, df_nodes, df_links = self._parsed_file('base_network_file')
+        self.project_name = header['project_name']
+        self.scenario_number = header['scenario_number']
+        self.scenario_name = header['scenario_name']
 
         # Read extra nodes file if it exists
         if self.extra_nodes_file:
-            df_extra_nodes, _ = self.extra_attributes_to_df(self.extra_nodes_file)
+            df_extra_nodes, _ = self._parsed_file('extra_nodes_file')
             df_nodes = df_nodes.merge(df_extra_nodes, left_on='Node', right_on='inode', how='left').drop(columns=['inode'])
 
-        df_nodes['geometry'] = df_nodes.apply(lambda row: Point(row['X-coord'], row['Y-coord']), axis=1)
+        df_nodes['geometry'] = geometry.points(df_nodes['X-coord'], df_nodes['Y-coord'])
         gdf_nodes = gpd.GeoDataFrame(df_nodes, geometry="geometry", crs="EPSG:3879")
         return gdf_nodes, df_links
         
     def nodes_to_gdf(self):
-        self.df_nodes['geometry'] = self.df_nodes.apply(lambda row: Point(row['X-coord'], row['Y-coord']), axis=1)
+        self.df_nodes['geometry'] = geometry.points(self.df_nodes['X-coord'], self.df_nodes['Y-coord'])
         return gpd.GeoDataFrame(self.df_nodes, geometry="geometry", crs="EPSG:3879")
 
     def links_to_gdf(self, include_node_data=True):     
-        # Map geometries to the 'From' and 'To' columns
-        self.df_links['geometry_from'] = self.df_links['From'].map(self.node_dict)
-        self.df_links['geometry_to'] = self.df_links['To'].map(self.node_dict)
+        # Look up the coordinates of the 'From' and 'To' nodes and create the LineStrings from them
+        vertices = self._link_shape_vertices() if self.link_shape_file else None
+        self.df_links['geometry'] = normalized_network.link_geometries(self.df_links['From'], self.df_links['To'], self.node_index,
+                                                                       vertices, source=self.link_shape_file)
+        self.df_links = self._merge_link_attributes(self.df_links)
+
+        if include_node_data:
+            self.df_links = normalized_network.join_node_data(self.df_links, self.gdf_nodes, self.node_index)
 
-        # Create LineStrings from geometries
-        self.df_links['geometry'] = self.df_links.apply(lambda row: LineString([row['geometry_from'], row['geometry_to']]), axis=1)
-        self.df_links = self.df_links.drop(columns=['geometry_from', 'geometry_to'])
+        # Convert to GeoDataFrame
+        return gpd.GeoDataFrame(self.df_links, geometry='geometry', crs='EPSG:3879')
 
+    def _merge_link_attributes(self, df_links):
         # Read extra links file if it exists
         if self.extra_links_file:
-            df_extra_links, _ = self.extra_attributes_to_df(self.extra_links_file)
-            self.df_links = self.df_links.merge(df_extra_links, left_on=['From', 'To'], right_on=['inode', 'jnode'], how='left').drop(columns=['inode', 'jnode'])
+            df_extra_links, _ = self._parsed_file('extra_links_file')
+            df_links = df_links.merge(df_extra_links, left_on=['From', 'To'], right_on=['inode', 'jnode'], how='left').drop(columns=['inode', 'jnode'])
 
         # Read netfield links file if it exists
         if self.netfield_links_file:
             df_netfield_links = self._netfield_links_to_df()
             try:
-                self.df_links = self.df_links.merge(df_netfield_links, left_on=['From', 'To'], right_on=['inode', 'jnode'], how='left')
+                df_links = df_links.merge(df_netfield_links, left_on=['From', 'To'], right_on=['inode', 'jnode'], how='left')
             except KeyError:
-                self.df_links = self.df_links.merge(df_netfield_links, on=['From', 'To'], how='left')
-
-        if include_node_data:
-            # Find orphan nodes with no connecting links
-            all_nodes = set(self.gdf_nodes['Node'])
-            linked_nodes = set(self.df_links['From']).union(set(self.df_links['To']))
-            orphan_nodes = all_nodes - linked_nodes
-
-            # Create DataFrame for orphan nodes with their geometries
-            orphan_df = self.gdf_nodes[self.gdf_nodes['Node'].isin(orphan_nodes)].copy()
-            orphan_df['From'] = orphan_df['Node']
-            orphan_df['To'] = 0  # No node has this id, used to find orphan nodes when exporting
-            orphan_df['geometry'] = orphan_df['geometry']
-
-            # Append orphan nodes to links DataFrame
-            self.df_links = pd.concat([self.df_links, orphan_df[['From', 'To', 'geometry']]], ignore_index=True)
-
-            # Merge node data for 'From' nodes
-            self.df_links = self.df_links.merge(self.gdf_nodes.add_suffix('_from'), left_on='From', right_on='Node_from', how='left')
-            # Merge node data for 'To' nodes
-            self.df_links = self.df_links.merge(self.gdf_nodes.add_suffix('_to'), left_on='To', right_on='Node_to', how='left')
-            self.df_links['is_connector'] = self.df_links.apply(lambda row: 1 if row['c_to']=='a*' or row['c_from']=='a*' else 0, axis=1)
-            self.df_links = self.df_links.drop(columns=['c', 'c_to', 'Node_from', 'Node_to', 'X-coord_from', 'X-coord_to', 'Y-coord_from', 'Y-coord_to','geometry_from', 'geometry_to'])
-
-        
-        # Convert to GeoDataFrame
-        return gpd.GeoDataFrame(self.df_links, geometry='geometry', crs='EPSG:3879')
+                df_links = df_links.merge(df_netfield_links, on=['From', 'To'], how='left')
+        return df_links
+
+    def _link_shape_vertices(self):
+        """
+        Returns the vertices of the link_shape file. The parsed vertices are kept for
+        import_link_shape, so the file is read only once.
+        """
+        df_link_shape = self._parsed_file('link_shape_file')
+        self._parsed['link_shape_file'] = df_link_shape
+        return df_link_shape
+
+    def normalized_network(self) -> NormalizedNetwork:
+        """
+        Returns the network as separate node and link tables, without the '_from' and '_to'
+        columns and link geometries of the EmmeNetwork.
+        """
+        if self.gdf_nodes is None or self.df_links is None:
+            self._read_base_network()
+        # Every link has the same transaction marker, which the EmmeNetwork drops as well
+        links = self._merge_link_attributes(self.df_links.drop(columns='c'))
+        vertices = self._link_shape_vertices() if self.link_shape_file else None
+        nodes = pd.DataFrame(self.gdf_nodes.drop(columns='geometry'))
+        return NormalizedNetwork(self._compact(nodes, 'nodes'), self._compact(links, 'network'),
+                                 self._compact(vertices, 'link_shape'), crs='EPSG:3879')
 
     def extra_attributes_to_df(self, extra_attributes_file):
-        with open(extra_attributes_file, 'r') as file:
-            # Skip lines until the end of the header
-            header = []
-            while True:
-                line = file.readline()
-                if line.startswith('t extra_attributes'):
-                    continue
-                elif line.startswith('end extra_attributes'):
-                    break
-                else:
-                    header.append(line)
-            
-            # The next line contains the column names
-            columns = file.readline().strip().split()
-            
-            # Read the rest of the file into a DataFrame
-            df_extra_attributes = pd.read_csv(file, names=columns, sep=r'\s+')
-        return df_extra_attributes, header
-    
+        return transaction_parser.read_extra_attributes(extra_attributes_file, attributes=self.attributes)
+
     def _netfield_links_to_df(self):
-        with open(self.netfield_links_file, 'r') as file:
-            # Skip lines until the end of the header
-            header = []
-            while True:
-                line = file.readline()
-                if line.startswith('t network_fields'):
-                    continue
-                elif line.startswith('end network_fields'):
-                    break
-                else:
-                    header.append(line)
-            
-            # The next line contains the column names
-            columns = file.readline().strip().split()
-            
-            # Read the rest of the file into a DataFrame
-            df_netfield_links = pd.read_csv(file, names=columns, sep=r'\s+')
-        
-        return df_netfield_links
-    
+        return self._parsed_file('netfield_links_file')
+
     def _extra_segments_to_df(self):
-        # Extra segments has a weird structure, requires its own parser
-        data = []
-        with open(self.extra_segments_file, 'r') as file:
-            header = []
-            while True:
-                line = file.readline()
-                if line.startswith('t extra_attributes'):
-                    continue
-                elif line.startswith('end extra_attributes'):
-                    break
-                else:
-                    header.append(line)
-            # The next line contains the column names
-            columns = file.readline().strip().split()
-            columns.append('Segment_num')  # Add segment_num to columns
-            current_line_id = None
-            segment_num = 0
-            for line in file.readlines():
-                parts = line.strip().split("'")
-                line_id = str(parts[1]).strip()
-                if line_id != current_line_id:
-                    current_line_id = line_id
-                    segment_num = 1
-                else:
-                    segment_num += 1
-                data.append([line_id] + parts[2].strip().split() + [segment_num])  # Add segment_num to data
-
-        df_segments = pd.DataFrame(data, columns=columns)
-        df_segments = df_segments.rename(columns={'line': 'Line', 'segment_num': 'Segment_num'})
-        return df_segments
-    
+        return self._parsed_file('extra_segments_file')
+
     def _netfield_segments_to_df(self):
-        data = []
-        with open(self.netfield_segments_file, 'r') as file:
-            # Skip lines until the end of the header
-            while True:
-                line = file.readline()
-                if line.startswith('end network_fields'):
-                    break
-
-            # The next line contains the column names
-            columns = file.readline().strip().split()
-            columns.append('segment_num')  # Add segment_num to columns
-            current_line_id = None
-            segment_num = 0
-            for line in file.readlines():
-                parts = line.strip().split("'")
-                line_id = parts[1].strip()
-                if line_id != current_line_id:
-                    current_line_id = line_id
-                    segment_num = 1
-                else:
-                    segment_num += 1
-                data.append([line_id] + parts[2].strip().split() + [parts[3]] + [segment_num])  # Add segment_num to data
-
-        df_netfield_segments = pd.DataFrame(data, columns=columns)
-        df_netfield_segments = df_netfield_segments.rename(columns={'line': 'Line', 'segment_num': 'Segment_num'})
-        return df_netfield_segments
-    
+        return self._parsed_file('netfield_segments_file')
+
     def _netfield_transit_lines_to_df(self):
-        data = []
-        with open(self.netfield_transit_lines_file, 'r') as file:
-            # Skip lines until the end of the header
-            while True:
-                line = file.readline()
-                if line.startswith('end network_fields'):
-                    break
-            
-            # The next line contains the column names
-            columns = file.readline().strip().split()
-            for line in file.readlines():
-                parts = re.split("'\s+'", line.strip())
-                data.append([part.strip("'").strip() for part in parts])  # Add segment_num to data
-            
-        # Read the rest of the file into a DataFrame
-        df_netfield_transit_lines = pd.DataFrame(data, columns=columns)
-        return df_netfield_transit_lines
-    
-    
+        return self._parsed_file('netfield_transit_lines_file')
+
     def extra_transit_lines_to_df(self):
-        with open(self.extra_transit_lines_file, 'r') as file:
-            # Skip lines until the end of the header
-            while True:
-                line = file.readline()
-                if line.startswith('end extra_attributes'):
-                    break
-            
-            # The next line contains the column names
-            columns = file.readline().strip().split()
-            columns[0] = 'Line'
-            rows = []
-            for line in file.readlines():
-                sections = line.split()
-                linenum = sections[0].strip("'").strip()
-                try:
-                    aht, pt, iht = sections[2:]
-                except ValueError:
-                    aht, pt, iht = sections[1:]
-                rows.append([linenum, aht, pt, iht])
-            
-            # Read the rest of the file into a DataFrame
-            df_headways = pd.DataFrame(rows, columns=columns)
-        return df_headways
-    
+        return self._parsed_file('extra_transit_lines_file')
+
     def transit(self):
-        segments, transit_lines, stops = self.parse_transit()
-        transit_network = TransitNetwork(segments, transit_lines, stops)
+        if self.gdf_nodes is None:
+            self._read_base_network()
+        routes = self._parsed_file('transit_lines_file')
+        # The tables and their geometries are built when first accessed
+        loaders = {
+            'segments': partial(self._transit_segments, routes),
+            'transit_lines': partial(self._transit_lines, routes),
+            'stops': partial(self._transit_stops, routes),
+        }
+        transit_network = TransitNetwork(None, None, None, routes=routes, loaders=loaders)
         transit_network.project_name = self.project_name
         transit_network.scenario_name = self.scenario_name
         return transit_network
 
+    def transit_line_index(self):
+        """
+        Returns the byte-offset index of the transit_lines file for reading or rewriting single lines.
+        The index is stored next to the file and rebuilt when the file changes.
+        """
+        from .transit_line_index import TransitLineIndex
+        if not self.transit_lines_file:
+            raise FileNotFoundError("No transit_lines file in the scenario directory.")
+        if isinstance(self.transit_lines_file, scenario_source.ArchiveMember):
+            raise ValueError("The transit line index can only be built for a transit_lines file on disk, not in an archive.")
+        return TransitLineIndex.load(self.transit_lines_file)
 
     def parse_transit(self):
-        with open(self.transit_lines_file, 'r') as file:
-            lines = file.readlines()
-        
-        # Read the extra attributes file, skipping the lines before the column names
-        df_headways = self.extra_transit_lines_to_df()
-
-        # Identifiers for the start of each transit line
-        transit_line_header = "a'"
-        transit_line_route = "path="
-        transit_line_end = "c '"
-
-        # Dictionary to hold the lines for each transit line
-        transit_lines = []
-        transit_line_routes = {}
-        transit_line_stops = {}
-        transit_lines_data = []
-
-        # Flags to identify which part we're currently reading
-        reading_transit_routes = False
-
-        # Temporary variables to hold data
-        current_line_code = None
-        single_route = []
-
-        # Process each line in the file
-        for line in lines:
-            if transit_line_header in line: # Get the line header for the current transit line
-                current_line_code = str(line.split("'")[1]).strip()
-                direction = current_line_code[-1]
-                parts = line.split()
-                mod, veh, headwy, speed = parts[1:5]
-                description = ' '.join(parts[5:-3]).strip("'")
-                data1, data2, data3 = map(float, parts[-3:])
-            elif transit_line_route in line: # Start reading the route for the current transit line
-                reading_transit_routes = True
-                single_route = []  # Reset the route list for a new transit line
-                single_route_numbers = []
-                continue
-            elif transit_line_end in line and current_line_code: # Save the route data for the transit line
-                first_dwt = line.split('dwt=')[1].split()[0]  # Extract first_dwt
-                transit_lines.append([current_line_code, direction, mod, int(veh), float(headwy), float(speed), description, data1, data2, data3, first_dwt])
-                route_stops, transit_lines_data = self.separate_route_links(single_route, transit_lines_data, current_line_code)
-                transit_line_routes[current_line_code] = [self.node_dict[int(node_id)] for node_id in single_route_numbers]
-                transit_line_stops[current_line_code] = [self.node_dict[int(node_id)] for node_id in route_stops]
-                reading_transit_routes = False
-                current_line_code = None  # Reset the line code for the next transit line
-                direction = None
-            # If no other indicators are found, we're between header and end, or reading the route data
-            if reading_transit_routes and line and not (line.startswith(transit_line_route) or line.startswith(transit_line_end)):
-                node_id = int(line.split()[0])
-                single_route_numbers.append(node_id)
-                single_route.append(line)  # Add the route data, skipping the identifier line
-            
-        df_routes = pd.DataFrame(transit_lines_data, columns=['Line', 'Segment_num', 'From', 'To', 'dwt', 'lay', 'ttf', 'us1', 'us2', 'us3', 'geometry'])
-
-        df_transit_lines = pd.DataFrame(transit_lines, columns=['Line', 'Direction', 'Mod', 'Veh', 'Headwy', 'Speed', 'Description', 'Data1', 'Data2', 'Data3', 'first_dwt'])
-        if self.netfield_transit_lines_file:
-            df_netfield_transit_lines = self._netfield_transit_lines_to_df()
-            df_transit_lines_with_geom = df_transit_lines.merge(df_netfield_transit_lines, left_on="Line", right_on='line', how='left')
-        else:
-            df_transit_lines_with_geom = df_transit_lines.copy()
-        
-        df_transit_stops = df_transit_lines.copy()
-        df_transit_stops['geometry'] = df_transit_stops['Line'].map(lambda x: MultiPoint(transit_line_stops.get(x, [])))
-        df_transit_lines_with_geom['geometry'] = df_transit_lines_with_geom['Line'].map(lambda x: LineString(transit_line_routes.get(x, [])))
-        df_transit_lines_with_geom = pd.merge(df_transit_lines_with_geom, df_headways, on="Line", how='left')
-
+        routes = self._parsed_file('transit_lines_file')
+        return self._transit_segments(routes), self._transit_lines(routes), self._transit_stops(routes)
+
+    def _route_coords(self, routes):
+        return self.node_index.coordinates(routes.node)
+
+    def _transit_segments(self, routes):
+        df_routes = routes.segments()
+        # Each segment is a line to the next node of the route, the last one is the Point of its node
+        from_coords = self._route_coords(routes)
+        to_coords = np.roll(from_coords, -1, axis=0)
+        segment_lines = geometry.segments(from_coords[:, 0], from_coords[:, 1], to_coords[:, 0], to_coords[:, 1])
+        end_points = geometry.points(from_coords[:, 0], from_coords[:, 1])
+        df_routes['geometry'] = np.where(routes.is_last, end_points, segment_lines)
+
+        df_transit_lines = routes.lines.set_index('Line')
         df_routes.set_index(['Line', 'Segment_num'], inplace=True)
-        df_transit_lines.set_index('Line', inplace=True)
         combined_gdf = df_routes.merge(df_transit_lines, left_index=True, right_index=True, how='left')
         if self.extra_segments_file:
             df_extra_segments = self._extra_segments_to_df().drop(columns=['inode', 'jnode'])
@@ -433,122 +323,72 @@ class ScenarioReader:
             if 'loop_idx_y' in combined_gdf.columns:
                 combined_gdf = combined_gdf.drop(columns=['loop_idx_y'])
 
-        
         if self.netfield_segments_file:
             df_netfield_segments = self._netfield_segments_to_df().drop(columns=['inode', 'jnode'])
             df_netfield_segments.set_index(['Line', 'Segment_num'], inplace=True)
-            combined_gdf = combined_gdf.merge(df_netfield_segments, left_index=True, right_index=True, how='left')        
-
-        # Convert the DataFrames to GeoDataFrames
-        transit_segments_gdf = gpd.GeoDataFrame(combined_gdf, crs='EPSG:3879')  # Full data, each segment of each line
-        transit_lines_gdf = gpd.GeoDataFrame(df_transit_lines_with_geom, geometry="geometry", crs='EPSG:3879')  # Complete routes of each line
-        stops_gdf = gpd.GeoDataFrame(df_transit_stops, geometry='geometry', crs='EPSG:3879')  # Stops of each line as a MultiPoint
-
-        return transit_segments_gdf, transit_lines_gdf, stops_gdf
-    
-
-    def separate_route_links(self, single_route, transit_lines_data, current_line_code):
-        route_stops = []
-        stop_flag = False
-        route_length = len(single_route)
-        segment_number = 0
-        for i, turn in enumerate(single_route):
-            segment_number += 1
-            # Extract the node id and its data
-            node_data = turn.split()
-            node_id = int(node_data[0])
-            dwt = node_data[1].split('=')[1]
-            if stop_flag == True or i == 0:
-                route_stops.append(node_id)
-                stop_flag = False
-            if dwt == '+0.01':
-                stop_flag = True
-            
-            try:
-                ttf, us1, us2, us3 = [data.split('=')[1] for data in node_data[2:6]]
-                lay = None
-            except ValueError:
-                lay = dwt
-
-            # Get the Point for the current node
-            current_point = self.node_dict[node_id]
-            # Check if there's a next node in the list
-            if i < route_length - 1:
-                next_node_id = int(single_route[i + 1].split()[0])
-                next_point = self.node_dict[next_node_id]
-                geometry = LineString([current_point, next_point])
-            else:
-                # If there's no next node, create a Point geometry
-                next_node_id = 0
-                geometry = current_point
-
-            # Append the extracted data to the transit_lines_data list
-            transit_lines_data.append([current_line_code, segment_number, node_id, next_node_id, dwt, lay, ttf, us1, us2, us3, geometry])
-        
-        return route_stops, transit_lines_data
-    
+            combined_gdf = combined_gdf.merge(df_netfield_segments, left_index=True, right_index=True, how='left')
+
+        return self._compact(gpd.GeoDataFrame(combined_gdf, crs='EPSG:3879'), 'segments')  # Full data, each segment of each line
+
+    def _transit_lines(self, routes):
+        df_transit_lines = routes.lines
+        if self.netfield_transit_lines_file:
+            df_netfield_transit_lines = self._netfield_transit_lines_to_df()
+            df_transit_lines_with_geom = df_transit_lines.merge(df_netfield_transit_lines, left_on="Line", right_on='line', how='left')
+        else:
+            df_transit_lines_with_geom = df_transit_lines.copy()
+        coords = self._route_coords(routes)
+        df_transit_lines_with_geom['geometry'] = geometry.linestrings(coords[:, 0], coords[:, 1], routes.line_index, len(routes.lines))
+        if self.extra_transit_lines_file:
+            df_headways = self.extra_transit_lines_to_df()
+            df_transit_lines_with_geom = pd.merge(df_transit_lines_with_geom, df_headways, on="Line", how='left')
+        return self._compact(gpd.GeoDataFrame(df_transit_lines_with_geom, geometry="geometry", crs='EPSG:3879'), 'transit_lines')  # Complete routes of each line
+
+    def _transit_stops(self, routes):
+        df_transit_stops = routes.lines.copy()
+        is_stop = routes.is_stop
+        coords = self._route_coords(routes)[is_stop]
+        df_transit_stops['geometry'] = geometry.multipoints(coords[:, 0], coords[:, 1], routes.line_index[is_stop], len(routes.lines))
+        return self._compact(gpd.GeoDataFrame(df_transit_stops, geometry='geometry', crs='EPSG:3879'), 'stops')  # Stops of each line as a MultiPoint
+
     # Import additional files
 
     def import_link_shape(self):
         if self.link_shape_file:
-            with open(self.link_shape_file, 'r') as file:
-                lines = file.readlines()
-            try:
-                columns = lines[6].strip().split()
-                data = [line.strip().split() for line in lines[7:]]
-                df_link_shape = pd.DataFrame(data, columns=columns, sep=r'\s+')
-                return df_link_shape
-            except IndexError:
-                return None
+            return self._compact(self._parsed_file('link_shape_file'), 'link_shape')
         else:
             return None
 
     def import_modes(self):
         if self.modes_file:
-            with open(self.modes_file, 'r') as file:
-                lines = file.readlines()
-            columns = lines[5].strip().split()
-            data = []
-            for line in lines[6:]:
-                parts = line.strip().split("'")
-                marker, id = parts[0].strip().split()
-                description = f"'{parts[1]}'"
-                rest = parts[2].strip().split()
-                mode_type = rest[0]
-                colour = rest[1]
-                cost_time_coeff = rest[2] if len(rest) > 2 else None
-                cost_distance_coeff = rest[3] if len(rest) > 3 else None
-                energy_time_coeff = rest[4] if len(rest) > 4 else None
-                energy_distance_coeff = rest[5] if len(rest) > 5 else None
-                speed_factor = rest[6] if len(rest) > 6 else None
-                data.append([marker, id, description, mode_type, colour, cost_time_coeff, cost_distance_coeff, energy_time_coeff, energy_distance_coeff, speed_factor])
-            df_modes = pd.DataFrame(data, columns=columns)
-            return df_modes
+            return self._compact(self._parsed_file('modes_file'), 'modes')
         else:
             return None
 
     def import_turns(self):
         if self.turns_file:
-            with open(self.turns_file, 'r') as file:
-                lines = file.readlines()
-            columns = lines[5].strip().split()
-            data = [line.strip().split() for line in lines[6:]]
-            df_turns = pd.DataFrame(data, columns=columns)
-            return df_turns
+            return TurnTable.from_frame(self._compact(self._parsed_file('turns_file'), 'turns'))
         else:
             return None
 
     def import_vehicles(self):
         if self.vehicles_file:
-            with open(self.vehicles_file, 'r') as file:
-                lines = file.readlines()
-            columns = lines[5].strip().split()
-            data = [line.strip().split() for line in lines[6:]]
-            df_vehicles = pd.DataFrame(data, columns=columns)
-            return df_vehicles
+            return self._compact(self._parsed_file('vehicles_file'), 'vehicles')
         else:
             return None
 
-def get_emme_scenario(scenario_directory: str) -> EmmeScenario:
-    scenario_reader = ScenarioReader(scenario_directory)
+def get_emme_scenario(scenario_directory: str, cache_dir: str = None, max_cache_size: int = None, workers: int = None, pool: str = 'thread', attributes: list = None) -> EmmeScenario:
+    """
+    Reads the Emme scenario in scenario_directory, which can also be a .zip, .tar, .tar.gz or
+    .tar.zst archive of the scenario files. If cache_dir is given, the parsed tables
+    are stored there and reused on later calls for as long as their input files are unchanged.
+    If workers is given, the input files are parsed concurrently in a thread or process pool.
+    attributes limits the extra link, node and segment attributes that are loaded to the ones
+    matching its glob patterns, e.g. ['@car_*_aht', '@hinta_*'].
+    """
+    if cache_dir is not None:
+        from .scenario_cache import ScenarioCache, DEFAULT_MAX_SIZE
+        cache = ScenarioCache(cache_dir, max_size=max_cache_size or DEFAULT_MAX_SIZE)
+        return cache.load(scenario_directory, attributes=attributes, workers=workers, pool=pool)
+    scenario_reader = ScenarioReader(scenario_directory, workers=workers, pool=pool, attributes=attributes)
     return scenario_reader.scenario()
\ No newline at end of file
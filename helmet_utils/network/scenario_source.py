@@ -0,0 +1,261 @@
+"""
+Access to the input files of a scenario, stored either in a directory or in an archive.
+
+Archives (.zip, .tar, .tar.gz and .tar.zst) are read without extracting them into the
+scenario directory. A zip member is decompressed as a stream straight into the parser that
+reads it. Compressed tar archives have no index, so a member can only be found by decompressing
+the archive from its beginning: the members of a tar archive are instead spooled into a private
+temporary folder in the single pass that lists them, and opened from there.
+"""
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import weakref
+import zipfile
+from datetime import datetime
+from fnmatch import fnmatchcase
+from pathlib import Path, PurePosixPath
+
+# Archive suffix -> (archive format, compression)
+ARCHIVE_SUFFIXES = {
+    '.zip': ('zip', None),
+    '.tar': ('tar', None),
+    '.tar.gz': ('tar', 'gz'),
+    '.tgz': ('tar', 'gz'),
+    '.tar.zst': ('tar', 'zst'),
+    '.tzst': ('tar', 'zst'),
+}
+
+
+def archive_type(path):
+    """
+    Returns the (format, compression) of an archive path, or None if the path is not an archive.
+    """
+    name = Path(path).name.lower()
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return kind
+    return None
+
+
+def open_source(path):
+    """
+    Returns the DirectorySource or ArchiveSource of a scenario directory or archive.
+    """
+    path = Path(path)
+    kind = archive_type(path)
+    if kind is None or path.is_dir():
+        return DirectorySource(path)
+    if not path.is_file():
+        raise FileNotFoundError(f"Scenario archive {path} not found.")
+    return ArchiveSource(path, *kind)
+
+
+def open_file(path, mode='r'):
+    """
+    Opens a scenario input file, which is either a path or an ArchiveMember.
+    """
+    if isinstance(path, ArchiveMember):
+        return path.open(mode)
+    return open(path, mode)
+
+
+def file_signature(path):
+    """
+    Returns the full path, size and modification time in nanoseconds of a scenario input file.
+    """
+    if isinstance(path, ArchiveMember):
+        return str(path), path.size, path.mtime_ns
+    stat = os.stat(path)
+    return str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns
+
+
+class DirectorySource:
+    """
+    Scenario input files in a directory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def find(self, pattern):
+        return next(self.path.glob(pattern), None)
+
+
+class ArchiveSource:
+    """
+    Scenario input files in a zip or tar archive. The files can be at the root of the
+    archive or in a directory inside it.
+    """
+
+    def __init__(self, path, archive_format, compression=None):
+        self.path = Path(path).resolve()
+        self.archive_format = archive_format
+        self.compression = compression
+        self.spool_folder = None
+        self.members = self._list_members()
+
+    def _list_members(self):
+        members = []
+        if self.archive_format == 'zip':
+            with zipfile.ZipFile(self.path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        mtime = int(datetime(*info.date_time).timestamp() * 1e9)
+                        members.append(ArchiveMember(self, info.filename, info.file_size, mtime))
+        else:
+            self.spool_folder = tempfile.mkdtemp(prefix='helmet_archive_')
+            # The spooled members are removed with the source, or at exit
+            weakref.finalize(self, shutil.rmtree, self.spool_folder, ignore_errors=True)
+            with self.open_tar() as archive:
+                for info in archive:
+                    if info.isfile():
+                        spooled = Path(self.spool_folder) / str(len(members))
+                        with archive.extractfile(info) as member, open(spooled, 'wb') as file:
+                            shutil.copyfileobj(member, file, 2**20)
+                        members.append(ArchiveMember(self, info.name, info.size, int(info.mtime * 1e9), spooled))
+        return members
+
+    def find(self, pattern):
+        """
+        Returns the member whose file name matches pattern, preferring the ones closest to the root.
+        """
+        matches = [member for member in self.members if fnmatchcase(member.filename, pattern)]
+        if not matches:
+            return None
+        return min(matches, key=lambda member: (len(PurePosixPath(member.name).parts), member.name))
+
+    def open_tar(self):
+        """
+        Opens the tar archive as a stream, so that it is decompressed only as far as it is read.
+        """
+        file = open(self.path, 'rb')
+        try:
+            if self.compression == 'zst':
+                return _ClosingTarFile(tarfile.open(fileobj=_zstd_reader(file), mode='r|'), file)
+            mode = 'r|gz' if self.compression == 'gz' else 'r|'
+            return _ClosingTarFile(tarfile.open(fileobj=file, mode=mode), file)
+        except BaseException:
+            file.close()
+            raise
+
+    def open_member(self, name):
+        """
+        Returns a binary stream of a member of the archive.
+        """
+        if self.archive_format == 'zip':
+            archive = zipfile.ZipFile(self.path)
+            try:
+                return io.BufferedReader(_MemberStream(archive.open(name), [archive]))
+            except BaseException:
+                archive.close()
+                raise
+        for member in self.members:
+            if member.name == name:
+                return member.open('rb')
+        raise FileNotFoundError(f"{name} not found in {self.path}")
+
+
+class ArchiveMember:
+    """
+    An input file inside a scenario archive. Used in place of a path by the parsers,
+    which open it with open_file.
+    """
+
+    def __init__(self, source, name, size, mtime_ns, spooled=None):
+        self.source = source
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # The decompressed copy of a tar member in the spool folder of its source
+        self.spooled = spooled
+
+    @property
+    def filename(self):
+        return PurePosixPath(self.name).name
+
+    def open(self, mode='r'):
+        if mode not in ('r', 'rb'):
+            raise ValueError(f"Archive members can only be opened for reading, not with mode '{mode}'")
+        stream = open(self.spooled, 'rb') if self.spooled is not None else self.source.open_member(self.name)
+        return stream if mode == 'rb' else io.TextIOWrapper(stream)
+
+    def __getstate__(self):
+        # Only the location of the member is needed to open it, e.g. in a worker process. The
+        # spooled copy of a tar member is kept by the source in the parent process
+        state = dict(self.__dict__)
+        state['source'] = (self.source.path, self.source.archive_format, self.source.compression)
+        return state
+
+    def __setstate__(self, state):
+        path, archive_format, compression = state['source']
+        source = ArchiveSource.__new__(ArchiveSource)
+        source.path, source.archive_format, source.compression, source.members = path, archive_format, compression, []
+        source.spool_folder = None
+        state['source'] = source
+        self.__dict__.update(state)
+
+    def __str__(self):
+        return f"{self.source.path}/{self.name}"
+
+    def __repr__(self):
+        return f"ArchiveMember('{self}')"
+
+
+class _MemberStream(io.RawIOBase):
+    """
+    A member stream that also closes the archive it was opened from.
+    """
+
+    def __init__(self, stream, resources):
+        self._stream = stream
+        self._resources = resources
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._stream.readinto(buffer)
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            for resource in reversed(self._resources):
+                resource.close()
+        super().close()
+
+
+class _ClosingTarFile:
+    """
+    A streamed tar archive that closes the underlying file with the archive.
+    """
+
+    def __init__(self, archive, file):
+        self._archive = archive
+        self._file = file
+
+    def __iter__(self):
+        return iter(self._archive)
+
+    def extractfile(self, info):
+        return self._archive.extractfile(info)
+
+    def close(self):
+        self._archive.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _zstd_reader(file):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .tar.zst archives requires zstandard, install it with pip install helmet_utils[archives]")
+    return zstandard.ZstdDecompressor().stream_reader(file)
@@ -0,0 +1,225 @@
+"""
+Compact column types of the parsed scenario tables.
+
+Every table has a declared schema that maps column names, or fnmatch patterns like '@*',
+to a compact type:
+
+- 'category' for repeated strings, e.g. modes, labels and network field values. Categorical
+  columns do not accept values that are not among their categories, so edits like
+  network.loc[0, 'Modes'] = 'cbh' or a fillna('') would fail. They are only used when
+  categorical=True, e.g. for tables that are only read, and strings stay objects by default.
+- 'int32' for ids and other integer columns
+- ('float32', format) for decimal columns, where format is the way the column is written
+  by the exports: 'fixed' for six decimals, 'general' for six significant digits ({:g})
+  and 'text' for the plain string representation used by to_csv and tabulate
+- ('number', format) for columns that are parsed as text: they become int32 if all values
+  are integers, otherwise float32 or float64
+
+A numeric column is only cast if the exported text of every value stays the same,
+otherwise the column keeps its original type. The first matching pattern of a column is used.
+"""
+from fnmatch import fnmatchcase
+
+import numpy as np
+import pandas as pd
+
+SCHEMAS = {
+    'network': {
+        'From': 'int32',
+        'To': 'int32',
+        'Modes': 'category',
+        'Typ': ('number', 'fixed'),
+        'VDF': ('number', 'fixed'),
+        'Length': ('float32', 'fixed'),
+        'Lan': ('float32', 'fixed'),
+        'Data?': ('float32', 'fixed'),
+        'Data?_from': ('float32', 'fixed'),
+        'Data?_to': ('float32', 'fixed'),
+        'Label_from': 'category',
+        'Label_to': 'category',
+        'c_from': 'category',
+        'is_connector': 'int32',
+        '#*': 'category',
+        '@*_from': ('float32', 'general'),
+        '@*_to': ('float32', 'general'),
+        '@*': ('float32', 'fixed'),
+    },
+    'nodes': {
+        'c': 'category',
+        'Node': 'int32',
+        'Data?': ('float32', 'fixed'),
+        'Label': 'category',
+        '@*': ('float32', 'general'),
+    },
+    'segments': {
+        'From': 'int32',
+        'To': 'int32',
+        'dwt': 'category',
+        'lay': 'category',
+        'ttf': 'int32',
+        'us?': ('number', 'text'),
+        'Direction': 'category',
+        'Mod': 'category',
+        'Veh': 'int32',
+        'Description': 'category',
+        'first_dwt': 'category',
+        'loop_idx*': ('number', 'general'),
+        '@*': ('number', 'general'),
+        '#*': 'category',
+    },
+    'transit_lines': {
+        'Direction': 'category',
+        'Mod': 'category',
+        'Veh': 'int32',
+        'first_dwt': 'category',
+        '#*': 'category',
+        '@hw_*': ('number', 'general'),
+    },
+    'stops': {
+        'Direction': 'category',
+        'Mod': 'category',
+        'Veh': 'int32',
+        'first_dwt': 'category',
+    },
+    'modes': {
+        'c': 'category',
+        'Type': 'category',
+        '*': ('number', 'text'),
+    },
+    'turns': {
+        'c': 'category',
+        '*': ('number', 'text'),
+    },
+    'vehicles': {
+        'c': 'category',
+        'Mode': 'category',
+        '*': ('number', 'text'),
+    },
+    'link_shape': {
+        'c': 'category',
+        '?_Node': ('number', 'text'),
+        'Vertex_No.': ('number', 'text'),
+    },
+}
+
+
+def column_type(table, column):
+    """
+    Returns the declared compact type of a column, or None if it has none.
+    """
+    for pattern, compact_type in SCHEMAS[table].items():
+        if fnmatchcase(str(column), pattern):
+            return compact_type
+    return None
+
+
+def compact(df, table, categorical=False):
+    """
+    Casts the columns of df to the compact types declared for table, in place where possible.
+    The string columns are only made categorical if categorical is True. Returns df for convenience.
+    """
+    if df is None:
+        return None
+    for column in df.columns:
+        if df[column].dtype.name == 'geometry':
+            continue
+        compact_type = column_type(table, column)
+        if compact_type is None or (compact_type == 'category' and not categorical):
+            continue
+        compacted = _compact_series(df[column], compact_type)
+        if compacted is not None:
+            df[column] = compacted
+    return df
+
+
+def _compact_series(series, compact_type):
+    kind, text_format = compact_type if isinstance(compact_type, tuple) else (compact_type, None)
+    if kind == 'category':
+        if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_numeric_dtype(series):
+            return None
+        return series.astype('category')
+    if kind == 'int32':
+        return _to_int32(series)
+    if kind == 'float32':
+        if not pd.api.types.is_float_dtype(series) or series.dtype == 'float32':
+            return None
+        values = series.to_numpy()
+        compacted = values.astype('float32')
+        if _same_text(values, compacted, text_format):
+            return pd.Series(compacted, index=series.index)
+        return None
+    if kind == 'number':
+        return _to_number(series, text_format)
+    raise ValueError(f"Unknown column type: {compact_type}")
+
+
+def _to_int32(series):
+    if series.dtype == 'int32' or not pd.api.types.is_numeric_dtype(series) or series.isna().any():
+        return None
+    values = series.to_numpy()
+    if pd.api.types.is_float_dtype(values) and not np.array_equal(values, np.round(values)):
+        return None
+    if len(values) and (values.min() < np.iinfo('int32').min or values.max() > np.iinfo('int32').max):
+        return None
+    return pd.Series(values.astype('int32'), index=series.index)
+
+
+def _to_number(series, text_format):
+    """
+    Converts a column to int32 if it only has integers, otherwise to float32 or float64,
+    whichever is the smallest that keeps the exported text unchanged.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        as_int = _to_int32(series)
+        if as_int is not None:
+            return as_int
+        if pd.api.types.is_float_dtype(series) and series.dtype != 'float32':
+            values = series.to_numpy()
+            compacted = values.astype('float32')
+            if _same_text(values, compacted, text_format):
+                return pd.Series(compacted, index=series.index)
+        return None
+    if series.dtype != object or series.isna().any():
+        return None
+    text = series.to_numpy().astype(str)
+    numbers = pd.to_numeric(series, errors='coerce').to_numpy()
+    if np.isnan(numbers).any():
+        return None
+    if np.array_equal(numbers, np.round(numbers)) and np.all(np.abs(numbers) <= np.iinfo('int32').max):
+        integers = numbers.astype('int32')
+        if np.array_equal(integers.astype(str), text):
+            return pd.Series(integers, index=series.index)
+    for dtype in ('float32', 'float64'):
+        compacted = numbers.astype(dtype)
+        if np.array_equal(_format(compacted, text_format), text):
+            return pd.Series(compacted, index=series.index)
+    return None
+
+
+def _format(values, text_format):
+    """
+    The text the exports write for each value.
+    """
+    if text_format == 'general':
+        return np.char.mod('%g', values.astype('float64'))
+    if text_format == 'fixed':
+        return np.char.rstrip(np.char.rstrip(np.char.mod('%.6f', values.astype('float64')), '0'), '.')
+    # Python floats are written with repr, float32 values are converted to Python floats first
+    return np.array([repr(value) for value in values.astype('float64').tolist()])
+
+
+def _same_text(values, compacted, text_format):
+    """
+    True if the float32 values are written exactly as the original float64 values.
+    Values are compared after rounding them the way the export format does.
+    """
+    values = values.astype('float64')
+    widened = compacted.astype('float64')
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        if text_format == 'fixed':
+            return np.array_equal(np.round(values, 6), np.round(widened, 6), equal_nan=True)
+        if text_format == 'general':
+            magnitude = np.floor(np.log10(np.abs(np.where(values == 0, 1, values))))
+            scale = np.where(np.isfinite(magnitude), 10.0 ** (5 - magnitude), 1)
+            return np.array_equal(np.rint(values * scale), np.rint(widened * scale), equal_nan=True)
+    return np.array_equal(_format(values, text_format), _format(compacted, text_format))
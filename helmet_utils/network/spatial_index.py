@@ -0,0 +1,180 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+# The links are indexed in straight pieces of at most this length in the units of the crs, so
+# that long links, e.g. ferry lines and long connectors, do not have large envelopes in the tree
+PIECE_LENGTH = 100.0
+
+class NodeTree:
+    """
+    A k-d tree of the node coordinates of an EmmeNetwork, for finding the nearest nodes of
+    many points at once. Created with EmmeNetwork.nearest_nodes. Requires scipy.
+
+    Attributes
+    ----------
+    nodes : np.ndarray
+        Ids of the nodes in the tree
+    tree : scipy.spatial.cKDTree
+        Tree of the x and y coordinates of the nodes
+    modes : str or None
+        The modes whose nodes are in the tree, None for all nodes
+    """
+
+    def __init__(self, nodes, coordinates, modes=None):
+        from scipy.spatial import cKDTree
+        self.nodes = nodes
+        self.tree = cKDTree(coordinates)
+        self.modes = modes
+
+    @classmethod
+    def from_network(cls, network, modes=None):
+        """
+        Builds the tree of the nodes of the network, or of the nodes of the links that allow any
+        of the modes.
+        """
+        nodes = network.nodes
+        if modes is not None:
+            links = (network['To'].to_numpy() > 0) & network.allows_modes(modes)
+            used = np.union1d(network['From'].to_numpy('int64')[links], network['To'].to_numpy('int64')[links])
+            nodes = nodes[nodes['Node'].isin(used).to_numpy()]
+        points = nodes.geometry.to_numpy()
+        coordinates = np.column_stack([shapely.get_x(points), shapely.get_y(points)])
+        return cls(nodes['Node'].to_numpy('int64'), coordinates, modes=modes)
+
+    def nearest(self, points, k=1, max_distance=None, crs=None):
+        """
+        Returns the k nearest nodes of each point as a DataFrame with the columns point, Node and
+        distance, with the nodes of each point in the order of their distance. Nodes further than
+        max_distance are left out, so a point can have fewer than k rows or none.
+        """
+        points, labels = query_points(points, crs)
+        coordinates = np.column_stack([shapely.get_x(points), shapely.get_y(points)])
+        valid = np.flatnonzero(np.isfinite(coordinates).all(axis=1))
+        # A list of k always gives two-dimensional results, missing neighbors have the distance inf
+        distances, positions = self.tree.query(coordinates[valid], k=list(range(1, k + 1)),
+                                               distance_upper_bound=np.inf if max_distance is None else max_distance)
+        found = np.isfinite(distances)
+        return pd.DataFrame({
+            'point': labels[np.repeat(valid, k).reshape(-1, k)[found]],
+            'Node': self.nodes[positions[found]],
+            'distance': distances[found],
+        })
+
+
+class LinkTree:
+    """
+    STRtrees of the link geometries of an EmmeNetwork, split into short straight pieces, and of
+    the vertices of the pieces, for snapping many points to their nearest links at once.
+    Created with EmmeNetwork.nearest_links.
+
+    The nearest link of a point is at most as far as the nearest vertex, which is found quickly
+    in the tree of the vertices. Only the pieces within that distance are then compared. This is
+    many times faster than the nearest search of shapely in a tree of the whole links, which is
+    slowed down by the large and overlapping envelopes of the long links.
+
+    Attributes
+    ----------
+    rows : np.ndarray
+        Row position of each link of the tree in the network
+    from_nodes, to_nodes : np.ndarray
+        Start and end nodes of the links
+    geometries : np.ndarray
+        Geometries of the links
+    tree : shapely.STRtree
+        Tree of the pieces of the geometries
+    piece_links : np.ndarray
+        Position of the link of each piece in the tree
+    vertex_tree : shapely.STRtree
+        Tree of the vertices of the pieces
+    modes : str or None
+        The modes whose links are in the tree, None for all links
+    """
+
+    def __init__(self, rows, from_nodes, to_nodes, geometries, modes=None):
+        self.rows = rows
+        self.from_nodes = from_nodes
+        self.to_nodes = to_nodes
+        self.geometries = geometries
+        coordinates, index = shapely.get_coordinates(shapely.segmentize(geometries, PIECE_LENGTH), return_index=True)
+        # A piece between each pair of consecutive vertices of a link
+        starts = np.flatnonzero(index[1:] == index[:-1])
+        self.piece_links = index[starts]
+        self.tree = shapely.STRtree(shapely.linestrings(np.stack([coordinates[starts], coordinates[starts + 1]], axis=1)))
+        self.vertex_tree = shapely.STRtree(shapely.points(coordinates))
+        self.modes = modes
+
+    @classmethod
+    def from_network(cls, network, modes=None):
+        """
+        Builds the tree of the links of the network, or of the links that allow any of the modes.
+        """
+        links = network['To'].to_numpy() > 0
+        if modes is not None:
+            links &= network.allows_modes(modes)
+        rows = np.flatnonzero(links)
+        return cls(rows, network['From'].to_numpy('int64')[rows], network['To'].to_numpy('int64')[rows],
+                   network.geometry.to_numpy()[rows], modes=modes)
+
+    def nearest(self, points, max_distance=None, crs=None):
+        """
+        Returns the nearest link of each point as a GeoDataFrame with the columns point, From, To,
+        distance, position and fraction. position is the distance along the link from its start
+        to the point projected on it, fraction the same as a share of the link length, and the
+        geometry is the projected point. Points without a link within max_distance are left out.
+
+        The links in both directions of a road have the same geometry, and of equally near links
+        the first one in the network is returned.
+        """
+        points, labels = query_points(points, crs)
+        (vertex_points, _), bounds = self.vertex_tree.query_nearest(points, return_distance=True, all_matches=False)
+        radius = np.full(len(points), -1.0)
+        # The bounds are widened by a rounding margin, so that the piece of the nearest vertex is always found
+        radius[vertex_points] = bounds * (1 + 1e-9) + 1e-9
+        if max_distance is not None:
+            radius = np.minimum(radius, max_distance)
+        searched = np.flatnonzero(radius >= 0)
+        candidate_points, candidate_pieces = self.tree.query(points[searched], predicate='dwithin', distance=radius[searched])
+        candidate_points = searched[candidate_points]
+        candidate_distances = shapely.distance(points[candidate_points], self.tree.geometries[candidate_pieces])
+        candidate_links = self.piece_links[candidate_pieces]
+        # The nearest candidate of each point, the first link of equally near ones
+        order = np.lexsort((candidate_links, candidate_distances, candidate_points))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = np.diff(candidate_points[order]) != 0
+        nearest = order[first]
+        point_positions, link_positions, distances = candidate_points[nearest], candidate_links[nearest], candidate_distances[nearest]
+        lines = self.geometries[link_positions]
+        position = shapely.line_locate_point(lines, points[point_positions])
+        lengths = shapely.length(lines)
+        fraction = np.divide(position, lengths, out=np.zeros(len(lines)), where=lengths > 0)
+        return gpd.GeoDataFrame({
+            'point': labels[point_positions],
+            'From': self.from_nodes[link_positions],
+            'To': self.to_nodes[link_positions],
+            'distance': distances,
+            'position': position,
+            'fraction': fraction,
+        }, geometry=shapely.line_interpolate_point(lines, position), crs=crs)
+
+
+def query_points(points, crs=None):
+    """
+    Returns the query points as an array of geometries in crs, and the label of each point.
+
+    points is a GeoSeries or a GeoDataFrame, whose index gives the labels and which is transformed
+    to crs if it has another one, or an array of Points or of (x, y) coordinates in crs, which
+    are labelled by their positions.
+    """
+    if isinstance(points, gpd.GeoDataFrame):
+        points = points.geometry
+    if isinstance(points, gpd.GeoSeries):
+        if crs is not None and points.crs is not None and points.crs != crs:
+            points = points.to_crs(crs)
+        return points.to_numpy(), points.index.to_numpy()
+    points = np.asarray(points)
+    if points.dtype != object:
+        points = shapely.points(points)
+    points = np.atleast_1d(points)
+    return points, np.arange(len(points))
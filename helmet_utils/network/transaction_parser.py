@@ -0,0 +1,553 @@
+import io
+import re
+from fnmatch import fnmatchcase
+
+import numpy as np
+import pandas as pd
+
+from .scenario_source import open_file
+
+# Number of characters read from a transaction file at a time, and the size of the
+# text blocks that are converted into typed columns
+CHUNK_SIZE = 2**24
+
+BASE_NETWORK_DTYPES = {
+    'nodes': {
+        'Node': 'Int32',
+        'X-coord': 'float64',
+        'Y-coord': 'float64',
+        'Data1': 'float64',
+        'Data2': 'float64',
+        'Data3': 'float64',
+        'Label': 'str'
+    },
+    'links': {
+        'From': 'Int32',
+        'To': 'Int32',
+        'Length': 'float64',
+        'Modes': 'str',
+        'Typ': 'int32',
+        'Lan': 'float64',
+        'VDF': 'int32',
+        'Data1': 'float64',
+        'Data2': 'float64',
+        'Data3': 'float64'
+    }
+}
+
+# Fixes centroids with a missing space after 'a*', e.g. 'a*1001'
+CENTROID_REGEX = re.compile(r'^(a\*)\s*(\d+)', flags=re.MULTILINE)
+# Comment and table identifier lines, everything else inside a table is data
+CONTROL_LINE_REGEX = re.compile(r'^[ct][^\n]*(?:\n|$)', flags=re.MULTILINE)
+
+
+def _iter_blocks(file, block_size):
+    """
+    Yields blocks of roughly block_size characters that always end at a line break.
+    """
+    remainder = ''
+    while True:
+        block = file.read(block_size)
+        if not block:
+            if remainder:
+                yield remainder
+            return
+        block = remainder + block
+        cut = block.rfind('\n') + 1
+        remainder = block[cut:]
+        if cut:
+            yield block[:cut]
+
+
+def _chunk_to_df(text, columns, dtypes):
+    """
+    Converts a block of whitespace separated data lines into a typed DataFrame.
+
+    The C parser reads numbers straight into NumPy columns, only the string columns
+    need to be declared up front so that e.g. labels like '0' are kept as text.
+    """
+    df = pd.read_csv(
+        io.StringIO(text),
+        sep=r'\s+',
+        header=None,
+        names=columns,
+        dtype={col: dtype for col, dtype in dtypes.items() if col in columns and dtype == 'str'},
+        keep_default_na=False,
+        na_values=[''],
+        float_precision='round_trip'
+    )
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in columns and dtype != 'str'})
+
+
+def _empty_df(columns, dtypes):
+    return pd.DataFrame({col: pd.Series(dtype=dtypes.get(col, 'object')) for col in columns})
+
+
+def read_base_network(base_network_file, chunk_size=CHUNK_SIZE):
+    """
+    Reads the nodes and links tables of a base_network transaction file.
+
+    The file is read chunk_size characters at a time. Comment and table identifier lines
+    are located with a single regex pass per block, and the data lines in between are
+    handed to the C parser in blocks, so no per-line Python work or intermediate lists
+    of split strings are needed.
+
+    Returns
+    -------
+    header : dict
+        project_name, scenario_number and scenario_name read from the comment lines
+    df_nodes : pd.DataFrame
+    df_links : pd.DataFrame
+    """
+    header = {'project_name': None, 'scenario_number': None, 'scenario_name': None}
+    columns = {}
+    chunks = {'nodes': [], 'links': []}
+    state = {'table': None, 'size': 0}
+    buffer = []
+
+    def flush():
+        table = state['table']
+        text = ''.join(buffer)
+        buffer.clear()
+        state['size'] = 0
+        if table and text.strip():
+            if table == 'nodes':
+                text = CENTROID_REGEX.sub(r'\1 \2', text)
+            chunks[table].append(_chunk_to_df(text, columns[table], BASE_NETWORK_DTYPES[table]))
+
+    def add_data(text):
+        if state['table'] and text:
+            buffer.append(text)
+            state['size'] += len(text)
+            if state['size'] >= chunk_size:
+                flush()
+
+    def handle_control_line(line):
+        if line.startswith('c'):
+            if "Project:" in line:
+                header['project_name'] = line.split('Project:')[-1].strip()
+            if "Scenario" in line:
+                header['scenario_number'] = line.split('Scenario')[-1].split(':')[0]
+                header['scenario_name'] = line.split('Scenario')[-1].split(':')[-1].strip()
+            # The first comment line of a table holds the column names
+            if state['table'] and state['table'] not in columns:
+                columns[state['table']] = line.split()
+        elif line.startswith('t '):
+            flush()
+            table = line.split()[1]
+            state['table'] = table if table in chunks else None
+        else:
+            add_data(line)
+
+    with open_file(base_network_file) as file:
+        for block in _iter_blocks(file, chunk_size):
+            position = 0
+            for match in CONTROL_LINE_REGEX.finditer(block):
+                add_data(block[position:match.start()])
+                handle_control_line(match.group())
+                position = match.end()
+            add_data(block[position:])
+        flush()
+
+    tables = []
+    for table in ('nodes', 'links'):
+        if table not in columns:
+            raise ValueError(f"No '{table}' table found in {base_network_file}")
+        if chunks[table]:
+            tables.append(pd.concat(chunks[table], ignore_index=True))
+        else:
+            tables.append(_empty_df(columns[table], BASE_NETWORK_DTYPES[table]))
+    df_nodes, df_links = tables
+    return header, df_nodes, df_links
+
+
+def _skip_header(file, end_marker):
+    """
+    Reads the lines before end_marker, leaving the file at the column names line.
+    """
+    header = []
+    while True:
+        line = file.readline()
+        if line.startswith(end_marker) or not line:
+            return header
+        header.append(line)
+
+
+def read_table(file, end_marker, dtype=None, quoted_columns=(), keep_quotes=False, string_fields=False, attributes=None):
+    """
+    Reads a table in the common layout of the extra attribute, network field, mode, turn
+    and vehicle transaction files: header lines up to end_marker, a line of column names
+    and whitespace separated data lines, in which text in single quotes can contain whitespace.
+
+    The data lines are tokenized by the C parser of pandas, which reads the file in chunks
+    and converts the values straight into typed columns.
+
+    Parameters
+    ----------
+    file : file object
+        An open transaction file
+    end_marker : str
+        Start of the last header line, e.g. 'end extra_attributes' or 't modes'
+    dtype : type or dict, optional
+        Column types, e.g. str to keep all values as text. By default the types are inferred.
+    quoted_columns : list of str
+        Columns whose values are quoted in the file. Their empty values ('') are kept as empty
+        strings, while empty values of the other text columns are missing trailing fields and become None.
+    keep_quotes : bool
+        Keep the quotes around the values of quoted_columns
+    string_fields : bool
+        Treat the STRING fields declared in a network fields header as quoted text columns
+    attributes : list of str, optional
+        Glob patterns of the extra attributes and network fields to read, e.g. ['@car_*_aht'].
+        The other '@' and '#' columns are skipped by the parser. By default all columns are read.
+
+    Returns
+    -------
+    df : pd.DataFrame
+    header : list of str
+        The lines before end_marker
+    """
+    header = _skip_header(file, end_marker)
+    columns = file.readline().split()
+    if string_fields:
+        strings = _string_fields(header)
+        quoted_columns = list(quoted_columns) + strings
+        if dtype is None:
+            dtype = {column: str for column in strings}
+    usecols = select_attributes(columns, attributes) if attributes is not None else None
+    df = pd.read_csv(file, sep=r'\s+', header=None, names=columns, usecols=usecols, quotechar="'", dtype=dtype, na_filter=False)
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        if column in quoted_columns:
+            if keep_quotes:
+                # Quoted values repeat a lot, so only the distinct values are quoted
+                codes, uniques = pd.factorize(df[column])
+                df[column] = np.array([f"'{value}'" for value in uniques], dtype=object).take(codes)
+        else:
+            missing = df[column].to_numpy() == ''
+            if missing.any():
+                df[column] = df[column].where(~missing, None)
+    return df, header
+
+
+def select_attributes(columns, attributes):
+    """
+    Returns the columns that are not extra attributes or network fields, and the attributes
+    that match one of the glob patterns in attributes.
+    """
+    if isinstance(attributes, str):
+        attributes = [attributes]
+    return [column for column in columns
+            if not column.startswith(('@', '#')) or any(fnmatchcase(column, pattern) for pattern in attributes)]
+
+
+def _string_fields(header):
+    """
+    Names of the STRING network fields declared in the header of a network fields file.
+    """
+    return [parts[0] for parts in (line.split() for line in header) if len(parts) > 2 and parts[2] == 'STRING']
+
+
+def _segment_numbers(lines):
+    """
+    Numbers the segments of each line from 1, restarting whenever the line changes.
+    """
+    runs = (lines != lines.shift()).cumsum()
+    return runs.groupby(runs).cumcount().to_numpy() + 1
+
+
+def read_extra_attributes(extra_attributes_file, attributes=None):
+    """
+    Reads an extra_links or extra_nodes file into a DataFrame. If attributes is given,
+    only the extra attributes matching its glob patterns are read.
+
+    Returns
+    -------
+    df_extra_attributes : pd.DataFrame
+    header : list of str
+        The lines before the column names, excluding the 't extra_attributes' line
+    """
+    with open_file(extra_attributes_file) as file:
+        df_extra_attributes, header = read_table(file, 'end extra_attributes', attributes=attributes)
+    header = [line for line in header if not line.startswith('t extra_attributes')]
+    return df_extra_attributes, header
+
+
+def read_netfield_links(netfield_links_file):
+    with open_file(netfield_links_file) as file:
+        df_netfield_links, _ = read_table(file, 'end network_fields', keep_quotes=True, string_fields=True)
+    return df_netfield_links
+
+
+def read_extra_segments(extra_segments_file, attributes=None):
+    with open_file(extra_segments_file) as file:
+        df_segments, _ = read_table(file, 'end extra_attributes', dtype=str, quoted_columns=['line'], attributes=attributes)
+    df_segments['line'] = df_segments['line'].str.strip()
+    df_segments['Segment_num'] = _segment_numbers(df_segments['line'])
+    df_segments = df_segments.rename(columns={'line': 'Line', 'segment_num': 'Segment_num'})
+    return df_segments
+
+
+def read_netfield_segments(netfield_segments_file):
+    with open_file(netfield_segments_file) as file:
+        df_netfield_segments, _ = read_table(file, 'end network_fields', dtype=str, quoted_columns=['line'], string_fields=True)
+    df_netfield_segments['line'] = df_netfield_segments['line'].str.strip()
+    df_netfield_segments['segment_num'] = _segment_numbers(df_netfield_segments['line'])
+    df_netfield_segments = df_netfield_segments.rename(columns={'line': 'Line', 'segment_num': 'Segment_num'})
+    return df_netfield_segments
+
+
+def read_netfield_transit_lines(netfield_transit_lines_file):
+    with open_file(netfield_transit_lines_file) as file:
+        df_netfield_transit_lines, _ = read_table(file, 'end network_fields', dtype=str, quoted_columns=['line'], string_fields=True)
+    for column in df_netfield_transit_lines.columns:
+        df_netfield_transit_lines[column] = df_netfield_transit_lines[column].str.strip()
+    return df_netfield_transit_lines
+
+
+def read_extra_transit_lines(extra_transit_lines_file):
+    with open_file(extra_transit_lines_file) as file:
+        df_extra_transit_lines, _ = read_table(file, 'end extra_attributes', dtype=str, quoted_columns=['line'])
+    df_extra_transit_lines['line'] = df_extra_transit_lines['line'].str.strip()
+    return df_extra_transit_lines.rename(columns={'line': 'Line'})
+
+
+def read_modes(modes_file):
+    with open_file(modes_file) as file:
+        df_modes, _ = read_table(file, 't modes', dtype=str, quoted_columns=['Description'], keep_quotes=True)
+    return df_modes
+
+
+def read_turns(turns_file):
+    with open_file(turns_file) as file:
+        df_turns, _ = read_table(file, 't turns', dtype=str)
+    return df_turns
+
+
+def read_vehicles(vehicles_file):
+    with open_file(vehicles_file) as file:
+        df_vehicles, _ = read_table(file, 't vehicles', dtype=str, quoted_columns=['Description'], keep_quotes=True)
+    return df_vehicles
+
+
+LINK_SHAPE_DTYPES = {
+    'c': 'str',
+    'I_Node': 'int64',
+    'J_Node': 'int64',
+    'Vertex_No.': 'int64',
+    'X-Coord': 'float64',
+    'Y-Coord': 'float64'
+}
+
+
+def read_link_shape(link_shape_file, chunk_size=CHUNK_SIZE):
+    """
+    Reads the vertices of a link_shape transaction file, one row per vertex.
+
+    Like in read_base_network, the comment and table identifier lines are removed with a
+    regex pass per block and the data lines are handed to the C parser in blocks. The
+    vertices are sorted by link and vertex number, so the vertices of each link are
+    consecutive rows in the order they are on the link.
+    """
+    columns = list(LINK_SHAPE_DTYPES)
+    chunks = []
+    with open_file(link_shape_file) as file:
+        for block in _iter_blocks(file, chunk_size):
+            text = CONTROL_LINE_REGEX.sub('', block)
+            if text.strip():
+                chunks.append(_chunk_to_df(text, columns, LINK_SHAPE_DTYPES))
+    if not chunks:
+        return _empty_df(columns, LINK_SHAPE_DTYPES)
+    df_link_shape = pd.concat(chunks, ignore_index=True)
+    return df_link_shape.sort_values(['I_Node', 'J_Node', 'Vertex_No.'], kind='stable', ignore_index=True)
+
+
+TRANSIT_LINE_COLUMNS = ['Line', 'Direction', 'Mod', 'Veh', 'Headwy', 'Speed', 'Description', 'Data1', 'Data2', 'Data3', 'first_dwt']
+TRANSIT_SEGMENT_COLUMNS = ['Line', 'Segment_num', 'From', 'To', 'dwt', 'lay', 'ttf', 'us1', 'us2', 'us3']
+
+# Number of route nodes collected as Python objects before they are packed into typed arrays
+SEGMENT_CHUNK_SIZE = 2**16
+
+
+class TransitRoutes:
+    """
+    The routes of the transit lines in a transit_lines file, stored as flat typed columns.
+
+    Column i of every segment array belongs to the line lines.iloc[j] where
+    offsets[j] <= i < offsets[j + 1]. The last node of each route has no segment
+    data of its own: its dwt holds the layover and ttf and us1-us3 repeat the values
+    of the previous node, as in Emme exports.
+
+    Attributes
+    ----------
+    lines : pd.DataFrame
+        Header data of each transit line, in file order
+    offsets : np.ndarray
+        Start of the route of each line in the segment arrays, and the total number of segments
+    node : np.ndarray
+        Node id of each route node
+    dwt : np.ndarray
+        Dwell time codes, e.g. '+0.01' or '>0.5', kept as text
+    ttf : np.ndarray
+    us1, us2, us3 : np.ndarray
+        User data of the segments, kept as text so that they are exported unchanged
+    lay : np.ndarray
+        Layover time at the last node of each route as text, None for the other nodes
+    """
+
+    def __init__(self, lines, offsets, node, dwt, ttf, us1, us2, us3, lay):
+        self.lines = lines
+        self.offsets = offsets
+        self.node = node
+        self.dwt = dwt
+        self.ttf = ttf
+        self.us1 = us1
+        self.us2 = us2
+        self.us3 = us3
+        self.lay = lay
+
+    def __len__(self):
+        return len(self.node)
+
+    @property
+    def line_index(self):
+        """Position of the line of each segment in lines."""
+        return np.repeat(np.arange(len(self.lines)), np.diff(self.offsets))
+
+    @property
+    def segment_num(self):
+        """Running number of each segment within its line, starting from 1."""
+        return np.arange(len(self.node)) - np.repeat(self.offsets[:-1], np.diff(self.offsets)) + 1
+
+    @property
+    def is_last(self):
+        is_last = np.zeros(len(self.node), dtype=bool)
+        ends = self.offsets[1:][np.diff(self.offsets) > 0] - 1
+        is_last[ends] = True
+        return is_last
+
+    @property
+    def next_node(self):
+        """Node id of the next node of the route, 0 for the last node."""
+        next_node = np.zeros_like(self.node)
+        next_node[:-1] = self.node[1:]
+        next_node[self.is_last] = 0
+        return next_node
+
+    @property
+    def is_stop(self):
+        """The first node of a route and every node after a '+0.01' dwell time are stops."""
+        is_first = np.zeros(len(self.node), dtype=bool)
+        is_first[self.offsets[:-1][np.diff(self.offsets) > 0]] = True
+        after_stop = np.zeros(len(self.node), dtype=bool)
+        after_stop[1:] = self.dwt[:-1] == '+0.01'
+        return is_first | (after_stop & ~is_first)
+
+    def segments(self):
+        """
+        Returns the segments as a DataFrame with the columns in TRANSIT_SEGMENT_COLUMNS.
+        """
+        return pd.DataFrame({
+            'Line': self.lines['Line'].to_numpy()[self.line_index],
+            'Segment_num': self.segment_num,
+            'From': self.node,
+            'To': self.next_node,
+            'dwt': self.dwt,
+            'lay': self.lay,
+            'ttf': self.ttf,
+            'us1': self.us1,
+            'us2': self.us2,
+            'us3': self.us3,
+        })
+
+
+def read_transit_lines(transit_lines_file, chunk_size=SEGMENT_CHUNK_SIZE):
+    """
+    Reads a transit_lines transaction file in a single streaming pass, see parse_transit_lines.
+    """
+    with open_file(transit_lines_file) as file:
+        return parse_transit_lines(file, chunk_size)
+
+
+def parse_transit_lines(transaction_lines, chunk_size=SEGMENT_CHUNK_SIZE):
+    """
+    Parses the lines of a transit_lines transaction in a single streaming pass without building any geometries.
+
+    Each line of the file is classified by its first character: line headers start with "a'",
+    route nodes with a digit and line ends with "c '". The route node fields are collected
+    into lists that are packed into typed arrays every chunk_size nodes.
+
+    Parameters
+    ----------
+    transaction_lines : iterable of str
+        E.g. an open transit_lines file or a single line block
+
+    Returns
+    -------
+    TransitRoutes
+    """
+    lines = []
+    offsets = [0]
+    columns = {name: [] for name in ('node', 'dwt', 'ttf', 'us1', 'us2', 'us3', 'lay')}
+    chunks = {name: [] for name in columns}
+    dwt_codes = {}
+    current = None
+    ttf = us1 = us2 = us3 = '0'
+    reading_route = False
+    node_count = 0
+
+    def flush():
+        if not columns['node']:
+            return
+        chunks['node'].append(np.array(columns['node'], dtype='int32'))
+        chunks['dwt'].append(np.array(columns['dwt'], dtype=object))
+        chunks['ttf'].append(np.array(columns['ttf'], dtype='float64').astype('int32'))
+        for name in ('us1', 'us2', 'us3', 'lay'):
+            chunks[name].append(np.array(columns[name], dtype=object))
+        for values in columns.values():
+            values.clear()
+
+    for line in transaction_lines:
+        first = line[:1]
+        if reading_route and (first == ' ' or first.isdigit()):
+            fields = line.split()
+            if not fields or not fields[0].isdigit():
+                continue
+            dwt = fields[1].partition('=')[2]
+            dwt = dwt_codes.setdefault(dwt, dwt)
+            if len(fields) >= 6:
+                ttf, us1, us2, us3 = [field.partition('=')[2] for field in fields[2:6]]
+                lay = None
+            else:
+                lay = dwt
+            columns['node'].append(fields[0])
+            columns['dwt'].append(dwt)
+            columns['ttf'].append(ttf)
+            columns['us1'].append(us1)
+            columns['us2'].append(us2)
+            columns['us3'].append(us3)
+            columns['lay'].append(lay)
+            node_count += 1
+            if len(columns['node']) >= chunk_size:
+                flush()
+        elif line.startswith("a'"):
+            # Line header, e.g. a'1000N2' m   4  10.00  40.00 'Kamppi-Toolo'      0      1      0
+            code = line.split("'")[1].strip()
+            parts = line.split()
+            description = ' '.join(parts[5:-3]).strip("'")
+            current = [code, code[-1], parts[1], int(parts[2]), float(parts[3]), float(parts[4]), description] + [float(part) for part in parts[-3:]]
+        elif line.lstrip().startswith('path='):
+            reading_route = True
+        elif line.startswith("c '") and current:
+            current.append(line.split('dwt=')[1].split()[0])
+            lines.append(current)
+            offsets.append(node_count)
+            reading_route = False
+            current = None
+    flush()
+
+    dtypes = {'node': 'int32', 'ttf': 'int32'}
+    arrays = {name: np.concatenate(chunks[name]) if chunks[name] else np.array([], dtype=dtypes.get(name, object))
+              for name in columns}
+    return TransitRoutes(pd.DataFrame(lines, columns=TRANSIT_LINE_COLUMNS), np.array(offsets, dtype='int64'), **arrays)
@@ -0,0 +1,155 @@
+import json
+import locale
+import mmap
+import os
+import re
+from pathlib import Path
+
+from .transaction_parser import parse_transit_lines
+
+# Start of a transit line block, e.g. a'1001N2' and its end line, e.g. c '1001N2' first: ...
+LINE_HEADER_REGEX = re.compile(rb"^a'([^']*)'", flags=re.MULTILINE)
+LINE_END_REGEX = re.compile(rb"^c '", flags=re.MULTILINE)
+
+INDEX_SUFFIX = '.idx'
+
+
+class TransitLineIndex:
+    """
+    Byte offsets of the a'...' line blocks in a transit_lines transaction file.
+
+    The index is built with a single regex pass over the memory-mapped file and stored next
+    to it, so that the header and route of a single line can be read, parsed or rewritten
+    without reading the rest of the file. A stored index is only used if the size and
+    modification time of the file still match it, otherwise it is built again.
+
+    Attributes
+    ----------
+    transit_lines_file : Path
+        The indexed transit_lines file
+    blocks : dict
+        Line code -> (start, end) byte offsets of its block, from the header to the end line
+    encoding : str
+        Encoding of the file, the same one open() uses by default
+    """
+
+    def __init__(self, transit_lines_file, blocks, encoding=None, index_file=None):
+        self.transit_lines_file = Path(transit_lines_file)
+        self.blocks = blocks
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.index_file = Path(index_file) if index_file else self.transit_lines_file.with_name(self.transit_lines_file.name + INDEX_SUFFIX)
+
+    @classmethod
+    def build(cls, transit_lines_file, encoding=None, index_file=None):
+        """
+        Indexes transit_lines_file and stores the index.
+        """
+        blocks = {}
+        with open(transit_lines_file, 'rb') as file:
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for match in LINE_HEADER_REGEX.finditer(mm):
+                        end_match = LINE_END_REGEX.search(mm, match.end())
+                        if end_match is None:
+                            raise ValueError(f"Transit line {match.group(1).decode().strip()} has no end line in {transit_lines_file}")
+                        end = mm.find(b'\n', end_match.end())
+                        end = len(mm) if end == -1 else end + 1
+                        blocks[match.group(1).decode(encoding or locale.getpreferredencoding(False)).strip()] = (match.start(), end)
+        index = cls(transit_lines_file, blocks, encoding, index_file)
+        index.save()
+        return index
+
+    @classmethod
+    def load(cls, transit_lines_file, encoding=None, index_file=None):
+        """
+        Returns the stored index of transit_lines_file, or builds it if it is missing or out of date.
+        """
+        index = cls(transit_lines_file, {}, encoding, index_file)
+        try:
+            with open(index.index_file, 'r') as file:
+                stored = json.load(file)
+            if stored['file'] == index._file_signature():
+                index.blocks = {code: tuple(offsets) for code, offsets in stored['blocks'].items()}
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        return cls.build(transit_lines_file, encoding, index_file)
+
+    def save(self):
+        temp_file = self.index_file.with_name(self.index_file.name + '.tmp')
+        try:
+            with open(temp_file, 'w') as file:
+                json.dump({'file': self._file_signature(), 'blocks': self.blocks}, file)
+            os.replace(temp_file, self.index_file)
+        except OSError as e:
+            print(f"Could not store the transit line index {self.index_file}: {e}")
+
+    def _file_signature(self):
+        stat = os.stat(self.transit_lines_file)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    @property
+    def codes(self):
+        return list(self.blocks)
+
+    def __contains__(self, line_code):
+        return line_code in self.blocks
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def _offsets(self, line_code):
+        try:
+            return self.blocks[line_code]
+        except KeyError:
+            raise KeyError(f"Transit line {line_code} not found in {self.transit_lines_file}")
+
+    def read(self, line_code):
+        """
+        Returns the transaction block of a single line as text.
+        """
+        start, end = self._offsets(line_code)
+        with open(self.transit_lines_file, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[start:end].decode(self.encoding)
+
+    def parse(self, line_code):
+        """
+        Parses a single line into TransitRoutes, see transaction_parser.parse_transit_lines.
+        """
+        return parse_transit_lines(self.read(line_code).splitlines(keepends=True))
+
+    def rewrite(self, line_code, block):
+        """
+        Replaces the block of a single line with block, e.g. from TransitNetwork.format_transit_line.
+
+        A block of the same size is written in place through the memory map. Otherwise only the
+        part of the file after the line is moved, and the offsets of the following lines are updated.
+        """
+        start, end = self._offsets(line_code)
+        data = block.encode(self.encoding)
+        if not data.endswith(b'\n'):
+            data += b'\n'
+        codes = LINE_HEADER_REGEX.findall(data)
+        if len(codes) != 1 or codes[0].decode(self.encoding).strip() != line_code or not LINE_END_REGEX.search(data):
+            raise ValueError(f"The new block must contain exactly the line {line_code}, from its header to its end line")
+
+        shift = len(data) - (end - start)
+        with open(self.transit_lines_file, 'r+b') as file:
+            if shift == 0:
+                with mmap.mmap(file.fileno(), 0) as mm:
+                    mm[start:end] = data
+                    mm.flush()
+            else:
+                file.seek(end)
+                tail = file.read()
+                file.seek(start)
+                file.write(data)
+                file.write(tail)
+                file.truncate()
+
+        for code, (block_start, block_end) in self.blocks.items():
+            if block_start >= end:
+                self.blocks[code] = (block_start + shift, block_end + shift)
+        self.blocks[line_code] = (start, start + len(data))
+        self.save()
@@ -2,17 +2,67 @@ import webbrowser
 from datetime import datetime
 from pathlib import Path
 
-from tabulate import tabulate
+import numpy as np
 import pandas as pd
 
 import os
 
-class TransitNetwork():
+from . import fixed_width
 
-    def __init__(self, segments, transit_lines, stops):
-        self.transit_lines = transit_lines
-        self.segments = segments
-        self.stops = stops
+class TransitNetwork():
+    """
+    Transit lines, their segments and stops.
+
+    The tables can be given as loaders, i.e. functions without arguments that return the
+    table, in which case the table and its geometries are only built when first accessed.
+    routes holds the parsed route data as flat arrays, if available.
+    """
+    TABLES = ('segments', 'transit_lines', 'stops')
+
+    def __init__(self, segments, transit_lines, stops, routes=None, loaders=None):
+        self.routes = routes
+        self._loaders = dict(loaders) if loaders else {}
+        self._tables = {}
+        given = {'segments': segments, 'transit_lines': transit_lines, 'stops': stops}
+        for name, value in given.items():
+            if value is not None or name not in self._loaders:
+                self._set_table(name, value)
+
+    def _table(self, name):
+        if name not in self._tables:
+            # The loader is dropped only after it succeeds, so a failed load is raised again on the next access
+            loader = self._loaders.get(name)
+            self._tables[name] = loader() if loader is not None else None
+            self._loaders.pop(name, None)
+        return self._tables[name]
+
+    def _set_table(self, name, value):
+        self._loaders.pop(name, None)
+        self._tables[name] = value
+
+    @property
+    def segments(self):
+        return self._table('segments')
+
+    @segments.setter
+    def segments(self, value):
+        self._set_table('segments', value)
+
+    @property
+    def transit_lines(self):
+        return self._table('transit_lines')
+
+    @transit_lines.setter
+    def transit_lines(self, value):
+        self._set_table('transit_lines', value)
+
+    @property
+    def stops(self):
+        return self._table('stops')
+
+    @stops.setter
+    def stops(self, value):
+        self._set_table('stops', value)
 
     def modify_headways(self, lines, ahts=None, pts=None, ihts=None, inplace=False):
 
@@ -95,24 +145,35 @@ class TransitNetwork():
         lines_content = [header]
 
         for line in self.transit_lines.itertuples():
-            start_str = (
-                f"a'{line.Line}' {line.Mod}   {line.Veh}  {line.Headwy:.2f}  {line.Speed:.2f} "
-                f"'{line.Description}'      {line.Data1}      {line.Data2}      {line.Data3}\n"
-                "  path=no\n"
-            )
-            lines_content.append(start_str)
-            route_nodes = self.segments.loc[line.Line]
-            for i, node in enumerate(route_nodes.itertuples()):
-                if i == len(route_nodes) - 1:
-                    lines_content.append(f"   {node.From}        lay={node.lay}\n")
-                else:
-                    lines_content.append(f"   {node.From}      dwt={node.dwt}   ttf={node.ttf}   us1={node.us1}   us2={node.us2}   us3={node.us3}\n")
-            end_str = f"c '{line.Line}' first:      dwt={line.first_dwt} hidden:    us1=0   us2=0   us3=0\n"
-            lines_content.append(end_str)
+            lines_content.extend(self._transit_line_block(line))
 
         with open(output_path, 'w') as f:
             f.writelines(lines_content)
 
+    def format_transit_line(self, line_code):
+        """
+        Returns the transaction block of a single transit line, from its a'...' header to its end line.
+        """
+        lines = self.transit_lines[self.transit_lines['Line'] == line_code]
+        if lines.empty:
+            raise KeyError(f"Transit line {line_code} not found")
+        return ''.join(self._transit_line_block(next(lines.itertuples())))
+
+    def _transit_line_block(self, line):
+        block = [(
+            f"a'{line.Line}' {line.Mod}   {line.Veh}  {line.Headwy:.2f}  {line.Speed:.2f} "
+            f"'{line.Description}'      {line.Data1}      {line.Data2}      {line.Data3}\n"
+            "  path=no\n"
+        )]
+        route_nodes = self.segments.loc[line.Line]
+        for i, node in enumerate(route_nodes.itertuples()):
+            if i == len(route_nodes) - 1:
+                block.append(f"   {node.From}        lay={node.lay}\n")
+            else:
+                block.append(f"   {node.From}      dwt={node.dwt}   ttf={node.ttf}   us1={node.us1}   us2={node.us2}   us3={node.us3}\n")
+        block.append(f"c '{line.Line}' first:      dwt={line.first_dwt} hidden:    us1=0   us2=0   us3=0\n")
+        return block
+
 
     # TODO: rewrite in a more general way like EmmeNetwork functions
     def export_extra_transit_lines(self, output_folder, scen_number=1):
@@ -120,7 +181,7 @@ class TransitNetwork():
         to_be_printed = self.transit_lines[['Line', '@hw_aht', '@hw_pt', '@hw_iht']].copy()
         # Reformat line numbers to match emme format
         to_be_printed = to_be_printed.rename(columns={'Line':'line'})
-        to_be_printed['line'] = to_be_printed['line'].apply(lambda num: f"'{str(num).ljust(6)}'")
+        to_be_printed['line'] = "'" + to_be_printed['line'].astype(str).str.ljust(6) + "'"
 
         # Prepare export by creating the extra_attribute definitions read by EMME
         definition_string = "t extra_attributes\n@hw_aht TRANSIT_LINE 0.0 ''\n"\
@@ -133,9 +194,16 @@ class TransitNetwork():
             # Use to_string with formatters to ensure proper spacing and alignment
             f.write(to_be_printed.to_string(index=False, header=True, formatters={
             'line': '{:<8}'.format,
-            '@hw_aht': '{:>9}'.format,
-            '@hw_pt': '{:>9}'.format,
-            '@hw_iht': '{:>9}'.format}))
+            '@hw_aht': self._format_headway,
+            '@hw_pt': self._format_headway,
+            '@hw_iht': self._format_headway}))
+
+    @staticmethod
+    def _format_headway(headway):
+        # Numeric headways are written like they are in the input files, e.g. 5 instead of 5.0
+        if isinstance(headway, (int, float, np.number)):
+            headway = f'{headway:g}'
+        return f'{headway:>9}'
 
     def export_segments(self, output_folder, scen_number=1):
         os.makedirs(output_folder, exist_ok=True)
@@ -152,7 +220,7 @@ class TransitNetwork():
         os.makedirs(output_folder, exist_ok=True)
         to_be_printed = to_be_printed[['Line','From','To', 'loop_idx'] + extra_columns]
         to_be_printed = to_be_printed.rename(columns={'Line': 'line', 'From': 'inode', 'To': 'jnode'})
-        to_be_printed['line'] = to_be_printed['line'].apply(lambda num: f"'{str(num).ljust(6)}'")
+        to_be_printed['line'] = "'" + to_be_printed['line'].astype(str).str.ljust(6) + "'"
 
         definition_string = "t extra_attributes\n"
         for column_name in extra_columns:
@@ -170,32 +238,42 @@ class TransitNetwork():
                 definition_string += f"{column_name} TRANSIT_SEGMENT 0.0 ''\n"
         definition_string += "end extra_attributes\n"
 
-        formatted_df = to_be_printed.map(lambda x: f'{x:g}' if isinstance(x, (int, float)) else x)
+        formatters = {col: fixed_width.format_general for col in to_be_printed.columns}
         output_path = Path(output_folder) / f"extra_segments_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            f.write(formatted_df.to_string(index=None))
+            fixed_width.write_table(f, to_be_printed, formatters, layout='pandas')
 
     def _export_netfield_segments(self, to_be_printed, output_folder, scen_number, netfield_columns):
         os.makedirs(output_folder, exist_ok=True)
         to_be_printed = to_be_printed[['Line','From','To', 'loop_idx'] + netfield_columns]
         to_be_printed = to_be_printed.rename(columns={'Line': 'line', 'From': 'inode', 'To': 'jnode'})
-        to_be_printed['line'] = to_be_printed['line'].apply(lambda num: f"'{str(num).ljust(6)}'")
+        to_be_printed['line'] = "'" + to_be_printed['line'].astype(str).str.ljust(6) + "'"
 
         definition_string = "t network_fields\n"
         for column_name in netfield_columns:
             definition_string += f"{column_name} TRANSIT_SEGMENT 0.0 ''\n"
         definition_string += "end network_fields\n"
 
-        formatted_df = to_be_printed.map(lambda x: f'{x:g}' if isinstance(x, (int, float)) else x)
-        for column in netfield_columns:
-            formatted_df[column] = formatted_df[column].apply(lambda x: f"'{x}'" if pd.notnull(x) else "''")
-
-        formatted_df['jnode'] = formatted_df['jnode'].apply(lambda node: "None" if node=="0" else node)
+        formatters = self._netfield_segment_formatters(to_be_printed.columns, netfield_columns)
         output_path = Path(output_folder) / f"netfield_segments_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            self._to_fwf(formatted_df, f)
+            self._to_fwf(to_be_printed, f, formatters)
+
+    @staticmethod
+    def _netfield_segment_formatters(columns, netfield_columns):
+        formatters = {col: fixed_width.format_general for col in columns}
+        for column in netfield_columns:
+            formatters[column] = lambda values: fixed_width.quoted(fixed_width.format_general(values))
+
+        def jnode(values):
+            # The last segment of a line has no jnode
+            formatted = fixed_width.format_general(values)
+            return np.where(formatted == '0', 'None', formatted)
+
+        formatters['jnode'] = jnode
+        return formatters
 
     def export_extra_segments(self, output_folder, scen_number=1):
         os.makedirs(output_folder, exist_ok=True)
@@ -209,7 +287,7 @@ class TransitNetwork():
         to_be_printed = to_be_printed.rename(columns={'Line': 'line', 'From': 'inode', 'To': 'jnode'})
         
         # Reformat line numbers to match emme format
-        to_be_printed['line'] = to_be_printed['line'].apply(lambda num: f"'{str(num).ljust(6)}'")
+        to_be_printed['line'] = "'" + to_be_printed['line'].astype(str).str.ljust(6) + "'"
 
         # Prepare export by creating the extra_attribute definitions read by EMME
         definition_string = "t extra_attributes\n"
@@ -230,12 +308,12 @@ class TransitNetwork():
                 definition_string += f"{column_name} TRANSIT_SEGMENT 0.0 ''\n"
         definition_string += "end extra_attributes\n"
 
-        formatted_df = to_be_printed.map(lambda x: f'{x:g}' if isinstance(x, (int, float)) else x)
+        formatters = {col: fixed_width.format_general for col in to_be_printed.columns}
 
         output_path = Path(output_folder) / f"extra_segments_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            f.write(formatted_df.to_string(index=None))
+            fixed_width.write_table(f, to_be_printed, formatters, layout='pandas')
 
     def export_netfield_transit_lines(self, output_folder, scen_number=1):
         os.makedirs(output_folder, exist_ok=True)
@@ -246,7 +324,7 @@ class TransitNetwork():
             return None
         to_be_printed = to_be_printed[['Line'] + netfield_columns]
         to_be_printed = to_be_printed.rename(columns={'Line':'line'})
-        to_be_printed['line'] = to_be_printed['line'].apply(lambda num: f"'{str(num).ljust(6)}'")
+        to_be_printed['line'] = "'" + to_be_printed['line'].astype(str).str.ljust(6) + "'"
 
         definition_string = "t network_fields\n"
         for column_name in to_be_printed.columns:
@@ -254,13 +332,13 @@ class TransitNetwork():
                 continue
             else:
                 definition_string += f"{column_name} TRANSIT_LINE STRING ''\n"
-                to_be_printed[column_name] = to_be_printed[column_name].apply(lambda x: f"'{x}'" if pd.notnull(x) else "''")
         definition_string += "end network_fields\n"
+        formatters = {col: fixed_width.quoted for col in netfield_columns}
 
         output_path = Path(output_folder) / f"netfield_transit_lines_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            to_be_printed.to_string(f, index=None)
+            fixed_width.write_table(f, to_be_printed, formatters, layout='pandas')
                
     def export_netfield_segments(self, output_folder, scen_number=1):
         os.makedirs(output_folder, exist_ok=True)
@@ -274,24 +352,19 @@ class TransitNetwork():
         to_be_printed = to_be_printed.rename(columns={'Line': 'line', 'From': 'inode', 'To': 'jnode'})
         
         # Reformat line numbers to match emme format
-        to_be_printed['line'] = to_be_printed['line'].apply(lambda num: f"'{str(num).ljust(6)}'")
+        to_be_printed['line'] = "'" + to_be_printed['line'].astype(str).str.ljust(6) + "'"
 
-        formatted_df = to_be_printed.map(lambda x: f'{x:g}' if isinstance(x, (int, float)) else x)
         # Prepare export by creating the extra_attribute definitions read by EMME
         definition_string = "t network_fields\n"
-        for column_name in to_be_printed.columns:
-            if column_name in ['line', 'inode', 'jnode', 'loop_idx']:
-                continue
-            else:
-                definition_string += f"{column_name} TRANSIT_SEGMENT STRING ''\n"
-                formatted_df[column_name] = formatted_df[column_name].apply(lambda x: f"'{x}'" if pd.notnull(x) else "''")
+        for column_name in netfield_columns:
+            definition_string += f"{column_name} TRANSIT_SEGMENT STRING ''\n"
         definition_string += "end network_fields\n"
 
-        formatted_df['jnode'] = formatted_df['jnode'].apply(lambda node: "None" if node=="0" else node)
+        formatters = self._netfield_segment_formatters(to_be_printed.columns, netfield_columns)
         output_path = Path(output_folder) / f"netfield_segments_{scen_number}.txt"
         with open(output_path, 'a') as f:
             f.write(definition_string)
-            self._to_fwf(formatted_df, f)
+            self._to_fwf(to_be_printed, f, formatters)
 
     def _get_transit_description(self, column_name):
         description_string = ''
@@ -315,9 +388,6 @@ class TransitNetwork():
         self.export_transit_lines(output_folder)
         self.export_extra_transit_lines(output_folder)
 
-    def _to_fwf(self, df, file):
-        content = tabulate(df.values.tolist(), list(df.columns), tablefmt="plain", disable_numparse=True)
-        # Adjust formatting to match the original file
-        # content = content.replace("  ", " ").replace(" \n", "\n")
-        file.write(content)
+    def _to_fwf(self, df, file, formatters=None):
+        fixed_width.write_table(file, df, formatters)
 
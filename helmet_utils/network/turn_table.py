@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+
+class TurnTable(pd.DataFrame):
+    """
+    The turns of an Emme scenario, indexed by their (At, From, To) nodes. Created in scenario_reader.py
+
+    The index is a hash index, so single turns are looked up in constant time, and the bulk
+    operations select the turns with vectorized lookups instead of looping over them.
+    A turn is banned by setting its turn penalty function (Tpf) to 0.
+    """
+    KEY = ['At', 'From', 'To']
+    PENALTY = 'Pen'
+    PENALTY_FUNCTION = 'Tpf'
+
+    @property
+    def _constructor(self):
+        return TurnTable
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Creates a TurnTable from a table of the turns file. The node ids are converted to numbers,
+        the other columns keep their types, so that text is exported as it was read.
+        """
+        df = df.copy()
+        for column in cls.KEY:
+            if df[column].dtype == object:
+                df[column] = pd.to_numeric(df[column])
+        return cls(df.set_index(cls.KEY))
+
+    def flat(self):
+        """
+        Returns the turns as a DataFrame with the columns in the order of the turns file.
+        """
+        df = pd.DataFrame(self).reset_index()
+        marker = ['c'] if 'c' in df.columns else []
+        return df[marker + self.KEY + [column for column in df.columns if column not in marker + self.KEY]]
+
+    def turn(self, at, from_node, to_node):
+        """
+        Returns the attributes of a single turn.
+        """
+        return self.loc[(at, from_node, to_node)]
+
+    def select(self, at=None, from_node=None, to_node=None):
+        """
+        Returns a boolean mask of the turns at, from and to the given nodes. Each argument can be
+        a single node or a list of nodes, and the turns must match all the given arguments.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for level, nodes in zip(self.KEY, (at, from_node, to_node)):
+            if nodes is not None:
+                mask &= self.index.get_level_values(level).isin(np.atleast_1d(nodes))
+        return mask
+
+    def ban(self, turns):
+        """
+        Prohibits the turns, given as a boolean mask or a list of (At, From, To) tuples.
+        """
+        functions = self[self.PENALTY_FUNCTION].to_numpy()
+        # A text column gets the text '0', the other turns keep their text
+        self[self.PENALTY_FUNCTION] = np.where(self._mask(turns), '0' if functions.dtype == object else 0, functions)
+
+    def scale_penalties(self, factor, turns=None):
+        """
+        Multiplies the penalties of the turns, by default of all turns, by factor.
+        """
+        mask = self._mask(turns) if turns is not None else np.ones(len(self), dtype=bool)
+        penalties = self[self.PENALTY].to_numpy()
+        if penalties.dtype == object:
+            # Text penalties are scaled as numbers, the turns that are not scaled keep their text
+            scaled = penalties.copy()
+            numbers = pd.to_numeric(penalties[mask]) * factor
+            scaled[mask] = [str(int(value)) if value == round(value) else str(value) for value in numbers.tolist()]
+        else:
+            scaled = np.where(mask, penalties * factor, penalties)
+            # Integer penalties stay integers if the scaled values are whole numbers
+            if penalties.dtype.kind in 'iu' and np.array_equal(scaled, np.round(scaled)):
+                scaled = scaled.astype(penalties.dtype)
+        self[self.PENALTY] = scaled
+
+    def left_turns(self, network, at=None, min_angle=45, max_angle=135):
+        """
+        Returns a boolean mask of the left turns, optionally only at the given nodes.
+
+        The turning angle is measured between the last segment of the incoming link and the
+        first segment of the outgoing link, so curved links are handled correctly. Turns
+        whose links are not in the network are not left turns.
+        """
+        selected = self.select(at=at) if at is not None else np.ones(len(self), dtype=bool)
+        incoming, outgoing = self._link_positions(network)
+        valid = selected & (incoming >= 0) & (outgoing >= 0)
+        geometries = network[network['To'] > 0].geometry.to_numpy()
+        coords = shapely.get_coordinates(geometries)
+        counts = shapely.get_num_coordinates(geometries)
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        incoming_direction = coords[ends[incoming[valid]] - 1] - coords[ends[incoming[valid]] - 2]
+        outgoing_direction = coords[starts[outgoing[valid]] + 1] - coords[starts[outgoing[valid]]]
+        cross = incoming_direction[:, 0] * outgoing_direction[:, 1] - incoming_direction[:, 1] * outgoing_direction[:, 0]
+        dot = (incoming_direction * outgoing_direction).sum(axis=1)
+        angle = np.full(len(self), np.nan)
+        # Positive angles turn counterclockwise, i.e. to the left
+        angle[valid] = np.degrees(np.arctan2(cross, dot))
+        return (angle >= min_angle) & (angle <= max_angle)
+
+    def validate(self, network):
+        """
+        Returns the turns whose incoming link (From, At) or outgoing link (At, To) is not in the network.
+        """
+        incoming, outgoing = self._link_positions(network)
+        invalid = self[(incoming < 0) | (outgoing < 0)]
+        if len(invalid):
+            print(f"{len(invalid)} turns reference links that are not in the network.")
+        return invalid
+
+    def _link_positions(self, network):
+        # Hash join of the turns with the links of the network, -1 if the link does not exist
+        links = network[network['To'] > 0]
+        link_index = pd.MultiIndex.from_arrays([links['From'].to_numpy('int64'), links['To'].to_numpy('int64')])
+        at, from_node, to_node = (self.index.get_level_values(level).to_numpy('int64') for level in self.KEY)
+        incoming = link_index.get_indexer(pd.MultiIndex.from_arrays([from_node, at]))
+        outgoing = link_index.get_indexer(pd.MultiIndex.from_arrays([at, to_node]))
+        return incoming, outgoing
+
+    def _mask(self, turns):
+        if isinstance(turns, (np.ndarray, pd.Series)) and turns.dtype == bool:
+            return np.asarray(turns)
+        positions = self.index.get_indexer(pd.MultiIndex.from_tuples(list(turns), names=self.KEY))
+        if (positions < 0).any():
+            raise ValueError(f"{(positions < 0).sum()} of the given turns are not in the turn table")
+        mask = np.zeros(len(self), dtype=bool)
+        mask[positions] = True
+        return mask
+
@@ -19,6 +19,15 @@ setup(
     extras_require={
         'zonedata': [
             'rasterstats'
+        ],
+        'cache': [
+            'pyarrow'
+        ],
+        'archives': [
+            'zstandard'
+        ],
+        'graph': [
+            'scipy'
         ]
     }
 )
\ No newline at end of file
@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tests read small synthetic scenarios written by the generator of the benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'benchmarks'))
+from synthetic_scenario import write_scenario  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def scenario_directory(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('scenario')
+    write_scenario(folder, nodes=300, links=900, centroids=12, transit_lines=6, segments_per_line=10,
+                   extra_link_attributes=3, extra_node_attributes=1, extra_segment_attributes=1)
+    return folder
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+
+def _links(network, count=20):
+    links = network.loc[network['To'] > 0, ['From', 'To']].iloc[:count].reset_index(drop=True)
+    return links.assign(Data1=np.arange(1, count + 1, dtype='float32'))
+
+
+def _assert_attributes_set(network, links):
+    result = links[['From', 'To']].merge(network[['From', 'To', 'Data1']], on=['From', 'To'], how='left')
+    np.testing.assert_array_equal(result['Data1'].to_numpy(), links['Data1'].to_numpy())
+    assert (network['Data1'] > 0).sum() <= len(links)
+
+
+def test_link_attributes_are_set_after_the_rows_are_sorted(scenario_directory):
+    network = get_emme_scenario(scenario_directory).network
+    network['Data1'] = np.zeros(len(network), dtype='float32')
+    links = _links(network)
+    # Builds the cached link index before the rows are reordered
+    network.link_positions(links['From'], links['To'])
+    network.sort_values(['To', 'From'], ascending=False, inplace=True)
+    network.set_link_attributes(links)
+    _assert_attributes_set(network, links)
+
+
+def test_link_attributes_are_set_after_the_nodes_are_changed_with_loc_and_reset(scenario_directory):
+    network = get_emme_scenario(scenario_directory).network
+    network['Data1'] = np.zeros(len(network), dtype='float32')
+    links = _links(network)
+    network.link_positions(links['From'], links['To'])
+    # Swapping the end nodes of the links keeps the number of rows
+    swapped = network['To'] > 0
+    from_nodes = network.loc[swapped, 'From'].to_numpy()
+    network.loc[swapped, 'From'] = network.loc[swapped, 'To'].to_numpy()
+    network.loc[swapped, 'To'] = from_nodes
+    network.reset_links()
+    reversed_links = links.rename(columns={'From': 'To', 'To': 'From'})
+    network.set_link_attributes(reversed_links)
+    _assert_attributes_set(network, pd.DataFrame(reversed_links))
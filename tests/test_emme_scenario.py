@@ -0,0 +1,46 @@
+import pytest
+
+from helmet_utils.network.emme_scenario import EmmeScenario
+from helmet_utils.network.scenario_reader import get_emme_scenario
+from helmet_utils.network.transit_network import TransitNetwork
+
+
+def _failing_loader():
+    raise ValueError("Broken transaction file")
+
+
+def test_failed_component_loader_raises_on_every_access():
+    scenario = EmmeScenario(None, None, 'scenario', 'Project', 'Scenario', loaders={'turns': _failing_loader})
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Broken transaction file"):
+            scenario.turns
+
+
+def test_failed_transit_table_loader_raises_on_every_access():
+    transit = TransitNetwork(None, None, None, loaders={'segments': _failing_loader})
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Broken transaction file"):
+            transit.segments
+
+
+def _exported_files(folder):
+    # The export date is left out, the exports are written at different times
+    return {path.name: [line for line in path.read_text().splitlines() if not line.startswith('c Date:')]
+            for path in sorted(folder.iterdir())}
+
+
+def test_concurrent_export_matches_serial_export(scenario_directory, tmp_path):
+    get_emme_scenario(scenario_directory).export(tmp_path / 'serial')
+    scenario = get_emme_scenario(scenario_directory)
+    # The second export replaces the files of the first one instead of appending to them
+    scenario.export(tmp_path / 'concurrent', workers=4)
+    scenario.export(tmp_path / 'concurrent', workers=4)
+    assert _exported_files(tmp_path / 'concurrent') == _exported_files(tmp_path / 'serial')
+
+
+def test_failed_concurrent_export_leaves_no_files(scenario_directory, tmp_path, monkeypatch):
+    scenario = get_emme_scenario(scenario_directory)
+    monkeypatch.setattr(scenario, 'export_turns', lambda *args, **kwargs: _failing_loader())
+    with pytest.raises(ValueError, match="Broken transaction file"):
+        scenario.export(tmp_path / 'output', workers=4)
+    assert list((tmp_path / 'output').iterdir()) == []
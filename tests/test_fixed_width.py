@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from tabulate import tabulate
+
+from helmet_utils.network import fixed_width
+from helmet_utils.network.emme_network import EmmeNetwork
+
+FLOATS = [0.0, -0.0, 1.0, -1.5, 2.675, 0.0000005, 0.0000015, 123456.1234564, 1e-7, -3.25e5, 25490541.42, 1e17, np.nan]
+
+
+def _table(rows=200, seed=0):
+    random = np.random.default_rng(seed)
+    # Random numbers with zero to seven decimals
+    scale = 10.0 ** random.integers(0, 8, rows - len(FLOATS))
+    floats = np.concatenate([FLOATS, np.round(random.normal(0, 1000, rows - len(FLOATS)) * scale) / scale])
+    return pd.DataFrame({
+        'inode': random.integers(1, 300000, rows).astype('float64'),
+        'jnode': random.integers(1, 300000, rows),
+        'Modes': random.choice(['c', 'cvkyae', 'bgde', 'w'], rows),
+        '@float': floats,
+        '@float32': floats.astype('float32'),
+        '@int': random.integers(-50, 50, rows).astype('int32'),
+    })
+
+
+def _write(df, **kwargs):
+    file = io.StringIO()
+    fixed_width.write_table(file, df, **kwargs)
+    return file.getvalue()
+
+
+@pytest.mark.parametrize('chunk_cells', [fixed_width.CHUNK_CELLS, 50])
+def test_tabulate_layout_matches_tabulate(chunk_cells):
+    df = _table()
+    # The exports formatted every cell with the formatters of EmmeNetwork and wrote the table with tabulate
+    old = df.copy()
+    for column in ('inode', 'jnode'):
+        old[column] = old[column].apply(EmmeNetwork.float_to_string)
+    for column in ('@float', '@float32', '@int'):
+        old[column] = old[column].apply(EmmeNetwork.format_float)
+    expected = tabulate(old.values.tolist(), list(old.columns), tablefmt='plain', disable_numparse=True)
+
+    formatters = {'inode': fixed_width.float_to_string, 'jnode': fixed_width.float_to_string,
+                  '@float': fixed_width.format_float, '@float32': fixed_width.format_float, '@int': fixed_width.format_float}
+    assert _write(df, formatters=formatters, chunk_cells=chunk_cells) == expected
+
+
+@pytest.mark.parametrize('chunk_cells', [fixed_width.CHUNK_CELLS, 50])
+def test_pandas_layout_matches_to_string(chunk_cells):
+    df = _table()
+    df['label'] = np.where(np.arange(len(df)) % 7 == 0, None, 'stop')
+    # The exports formatted the numbers with {:g} and wrote the table with DataFrame.to_string
+    expected = df.map(lambda value: f'{value:g}' if isinstance(value, (int, float)) else value).to_string(index=None)
+    formatters = {column: fixed_width.format_general for column in df.columns}
+    assert _write(df, formatters=formatters, layout='pandas', chunk_cells=chunk_cells) == expected
+
+
+def test_empty_table_is_written_like_to_string():
+    df = _table().iloc[:0]
+    assert _write(df, layout='pandas') == df.to_string(index=None)
+    assert _write(df) == tabulate([], list(df.columns), tablefmt='plain', disable_numparse=True)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+
+def _vertex_lines(path):
+    return [line for line in path.read_text().splitlines() if line.startswith('a ')]
+
+
+def _vertices(path):
+    rows = [line.split()[1:] for line in _vertex_lines(path)]
+    return pd.DataFrame(rows, columns=['I_Node', 'J_Node', 'Vertex_No.', 'X-Coord', 'Y-Coord']).astype(float)
+
+
+def test_curved_links_have_the_vertices_of_the_link_shape_file(scenario_directory):
+    network = get_emme_scenario(scenario_directory).network
+    vertices = _vertices(scenario_directory / 'link_shape_1.txt')
+    nodes = network.nodes.set_index('Node').geometry
+    links = network.set_index(['From', 'To']).geometry
+    for (i, j), link_vertices in vertices.groupby(['I_Node', 'J_Node']):
+        coordinates = shapely.get_coordinates(links.loc[(int(i), int(j))])
+        expected = np.vstack([
+            shapely.get_coordinates(nodes.loc[int(i)]),
+            link_vertices.sort_values('Vertex_No.')[['X-Coord', 'Y-Coord']].to_numpy(),
+            shapely.get_coordinates(nodes.loc[int(j)]),
+        ])
+        np.testing.assert_allclose(coordinates, expected)
+
+
+def test_link_shape_is_exported_unchanged(scenario_directory, tmp_path):
+    scenario = get_emme_scenario(scenario_directory)
+    scenario.export_link_shape(tmp_path)
+    assert _vertex_lines(tmp_path / 'link_shape_1.txt') == _vertex_lines(scenario_directory / 'link_shape_1.txt')
+
+
+def test_straightened_link_is_exported_without_vertices(scenario_directory, tmp_path):
+    scenario = get_emme_scenario(scenario_directory)
+    network = scenario.network
+    vertices = _vertices(scenario_directory / 'link_shape_1.txt')
+    i, j = vertices[['I_Node', 'J_Node']].iloc[0]
+    straightened = (vertices['I_Node'] == i) & (vertices['J_Node'] == j)
+    position = np.flatnonzero((network['From'] == i).to_numpy() & (network['To'] == j).to_numpy())[0]
+    geometries = network.geometry.to_numpy().copy()
+    geometries[position] = shapely.linestrings(shapely.get_coordinates(geometries[position])[[0, -1]])
+    network['geometry'] = geometries
+
+    scenario.export_link_shape(tmp_path)
+    exported = _vertices(tmp_path / 'link_shape_1.txt')
+    pd.testing.assert_frame_equal(exported, vertices[~straightened].reset_index(drop=True))
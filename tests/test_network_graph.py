@@ -0,0 +1,84 @@
+import heapq
+
+import numpy as np
+import pytest
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+pytest.importorskip('scipy')
+
+
+@pytest.fixture(scope='module')
+def network(scenario_directory):
+    return get_emme_scenario(scenario_directory).network
+
+
+def _car_links(network):
+    links = network[(network['To'] > 0).to_numpy() & network['Modes'].str.contains('c').to_numpy()]
+    return links['From'].to_numpy(), links['To'].to_numpy(), links['Length'].to_numpy('float64')
+
+
+def _dijkstra(from_nodes, to_nodes, weights, origin):
+    # Reference distances of a plain Python Dijkstra
+    links = {}
+    for i, j, weight in zip(from_nodes.tolist(), to_nodes.tolist(), weights.tolist()):
+        links.setdefault(i, []).append((j, weight))
+    distances = {origin: 0.0}
+    queue = [(0.0, origin)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        for neighbor, weight in links.get(node, []):
+            if distance + weight < distances.get(neighbor, np.inf):
+                distances[neighbor] = distance + weight
+                heapq.heappush(queue, (distance + weight, neighbor))
+    return distances
+
+
+def test_distances_match_dijkstra(network):
+    graph = network.graph(modes='c')
+    from_nodes, to_nodes, weights = _car_links(network)
+    origins = graph.nodes[::40]
+    matrix = graph.distance_matrix(origins)
+    for origin in origins:
+        expected = _dijkstra(from_nodes, to_nodes, weights, origin)
+        distances = np.array([expected.get(node, np.inf) for node in graph.nodes])
+        np.testing.assert_allclose(matrix.loc[origin].to_numpy(), distances)
+
+
+def test_shortest_paths_follow_the_links(network):
+    graph = network.graph(modes='c')
+    random = np.random.default_rng(0)
+    origins = random.choice(graph.nodes, 50)
+    destinations = random.choice(graph.nodes, 50)
+    paths = graph.shortest_paths(origins, destinations, paths=True)
+    matrix = graph.distance_matrix(np.unique(origins))
+    assert np.isfinite(paths['distance']).any()
+    for row in paths.itertuples():
+        assert row.distance == pytest.approx(matrix.loc[row.origin, row.destination])
+        if row.path is None:
+            assert np.isinf(row.distance)
+            continue
+        links = network.iloc[row.links]
+        assert (links['From'].to_numpy() == row.path[:-1]).all()
+        assert (links['To'].to_numpy() == row.path[1:]).all()
+        assert links['Modes'].str.contains('c').all()
+        assert links['Length'].astype('float64').sum() == pytest.approx(row.distance)
+
+    # With fewer destinations the paths are searched along the reversed links
+    reverse = graph.shortest_paths(origins, np.repeat(destinations[:2], 25), paths=True)
+    forward = [graph.shortest_paths(origins[i:i + 1], destinations[i // 25:i // 25 + 1]) for i in range(50)]
+    np.testing.assert_allclose(reverse['distance'], [result['distance'].iloc[0] for result in forward])
+    for row in reverse.itertuples():
+        if row.path is not None:
+            assert (row.path[0], row.path[-1]) == (row.origin, row.destination)
+
+
+def test_graph_is_cached_until_the_modes_change(scenario_directory):
+    network = get_emme_scenario(scenario_directory).network
+    graph = network.graph(modes='c')
+    assert network.graph(modes='c') is graph
+    network['Modes'] = network['Modes'].str.replace('c', '')
+    assert network.graph(modes='c') is not graph
+    assert network.graph(modes='c').matrix.nnz == 0
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from helmet_utils.network.normalized_network import NormalizedNetwork
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+
+def test_round_trip_keeps_centroids_that_only_have_incoming_links(scenario_directory):
+    network = get_emme_scenario(scenario_directory).network
+    centroid = int(network.loc[network['c_from'].astype(str) == 'a*', 'From'].iloc[0])
+    # Without the links from it, the centroid is only in the To column of its connectors
+    network = network[(network['From'] != centroid).to_numpy()].reset_index(drop=True)
+    assert centroid in set(network['To'])
+
+    round_trip = NormalizedNetwork.from_network(network).to_network()
+
+    nodes = NormalizedNetwork.from_network(network).nodes.set_index('Node')
+    assert nodes.loc[centroid, 'c'] == 'a*'
+    pd.testing.assert_frame_equal(pd.DataFrame(round_trip), pd.DataFrame(network))
@@ -0,0 +1,76 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from helmet_utils.network.scenario_cache import ScenarioCache
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def parsed_groups(monkeypatch):
+    # Records the table groups that are parsed instead of read from the cache
+    groups = []
+    build_group = ScenarioCache._build_group
+
+    def counting_build_group(reader, group, **kwargs):
+        groups.append(group)
+        return build_group(reader, group, **kwargs)
+
+    monkeypatch.setattr(ScenarioCache, '_build_group', staticmethod(counting_build_group))
+    return groups
+
+
+def _copy(scenario_directory, folder):
+    shutil.copytree(scenario_directory, folder)
+    return folder
+
+
+def test_unchanged_scenario_is_read_from_the_cache(scenario_directory, tmp_path, parsed_groups):
+    cache = ScenarioCache(tmp_path / 'cache')
+    cache.load(scenario_directory).turns
+    assert parsed_groups == ['network', 'turns']
+
+    parsed_groups.clear()
+    scenario = cache.load(scenario_directory)
+    expected = get_emme_scenario(scenario_directory)
+    pd.testing.assert_frame_equal(pd.DataFrame(scenario.network), pd.DataFrame(expected.network))
+    pd.testing.assert_frame_equal(pd.DataFrame(scenario.turns), pd.DataFrame(expected.turns))
+    assert parsed_groups == []
+
+
+def test_edited_file_is_parsed_again(scenario_directory, tmp_path, parsed_groups):
+    folder = _copy(scenario_directory, tmp_path / 'scenario')
+    cache = ScenarioCache(tmp_path / 'cache')
+    cache.load(folder).turns
+
+    turns_file = folder / 'turns_1.txt'
+    lines = turns_file.read_text().splitlines(keepends=True)
+    first_turn = next(i for i, line in enumerate(lines) if line.startswith('a '))
+    fields = lines[first_turn].split()
+    fields[4] = '9.5'
+    lines[first_turn] = ' '.join(fields) + '\n'
+    turns_file.write_text(''.join(lines))
+
+    parsed_groups.clear()
+    scenario = cache.load(folder)
+    turns = scenario.turns
+    # Only the group of the edited file is parsed again
+    assert parsed_groups == ['turns']
+    assert (pd.to_numeric(pd.DataFrame(turns)['Pen']) == 9.5).sum() == 1
+    pd.testing.assert_frame_equal(pd.DataFrame(turns), pd.DataFrame(get_emme_scenario(folder).turns))
+
+
+def test_least_recently_used_scenario_is_evicted(scenario_directory, tmp_path):
+    folders = [_copy(scenario_directory, tmp_path / name) for name in ('a', 'b', 'c')]
+    cache = ScenarioCache(tmp_path / 'cache')
+    cache.load(folders[0])
+    # Room for two scenarios
+    cache.max_size = int(cache.size() * 2.5)
+    cache.load(folders[1])
+    cache.load(folders[0])
+    cache.load(folders[2])
+    kept = sorted(path.name for path in cache._entries())
+    assert kept == sorted(cache._entry_dir(folder).name for folder in (folders[0], folders[2]))
@@ -0,0 +1,56 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from helmet_utils.network.scenario_collection import load_scenarios
+
+
+@pytest.fixture
+def scenario_directories(scenario_directory, tmp_path):
+    # Two identical scenarios and one with a changed extra attribute of its first link
+    folders = [tmp_path / name for name in ('base', 'copy', 'edited')]
+    for folder in folders:
+        shutil.copytree(scenario_directory, folder)
+    extra_links = folders[2] / 'extra_links_1.txt'
+    lines = extra_links.read_text().splitlines(keepends=True)
+    first_link = lines.index(next(line for line in lines if line.startswith('inode'))) + 1
+    fields = lines[first_link].split()
+    fields[2] = '999.5'
+    lines[first_link] = ' '.join(fields) + '\n'
+    extra_links.write_text(''.join(lines))
+    return folders
+
+
+def _values(series):
+    return series.array.to_numpy() if hasattr(series.array, 'to_numpy') else np.asarray(series.array)
+
+
+def test_identical_columns_are_stored_once(scenario_directories):
+    scenarios = load_scenarios(scenario_directories)
+    base, copy, edited = (scenarios[name].network for name in ('base', 'copy', 'edited'))
+    for column in ('From', 'To', 'Length', '@hinta_aht'):
+        assert np.shares_memory(_values(base[column]), _values(copy[column]))
+    assert np.shares_memory(_values(base['Length']), _values(edited['Length']))
+    assert not np.shares_memory(_values(base['@hinta_aht']), _values(edited['@hinta_aht']))
+    assert edited['@hinta_aht'].iloc[0] == pytest.approx(999.5)
+    # Unchanged geometries are the same objects in every scenario
+    assert all(a is b for a, b in zip(base.geometry.array, edited.geometry.array))
+
+
+def test_lazily_loaded_tables_are_shared_on_access(scenario_directories):
+    scenarios = load_scenarios(scenario_directories)
+    base, copy = scenarios['base'].transit.segments, scenarios['copy'].transit.segments
+    assert np.shares_memory(_values(base['From']), _values(copy['From']))
+
+
+def test_shared_values_are_read_only_until_detached(scenario_directories):
+    scenarios = load_scenarios(scenario_directories)
+    network = scenarios['copy'].network
+    with pytest.raises(ValueError, match='read-only'):
+        network['Length'].to_numpy()[0] = 1.0
+
+    detached = scenarios.detach('copy').network
+    detached.loc[detached.index[0], 'Length'] = 1.0
+    assert detached['Length'].iloc[0] == 1.0
+    assert scenarios['base'].network['Length'].iloc[0] != 1.0
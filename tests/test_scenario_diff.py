@@ -0,0 +1,49 @@
+import numpy as np
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+
+def _keys(df, columns):
+    return sorted(map(tuple, df[columns].to_numpy().tolist()))
+
+
+def test_unchanged_scenario_has_no_differences(scenario_directory):
+    diff = get_emme_scenario(scenario_directory).diff(get_emme_scenario(scenario_directory))
+    for name in ('nodes', 'links', 'turns', 'transit_lines', 'segments'):
+        assert not diff[name], name
+
+
+def test_added_removed_and_modified_links(scenario_directory):
+    scenario = get_emme_scenario(scenario_directory)
+    other = get_emme_scenario(scenario_directory)
+    network = other.network
+    links = network[network['To'] > 0]
+    removed = links.iloc[:2]
+    network.drop(removed.index, inplace=True)
+    modified = links.iloc[5]
+    network.loc[modified.name, 'Data1'] = modified['Data1'] + 10
+
+    diff = scenario.diff(other, tables=['links'])
+    assert _keys(diff.links.removed, ['From', 'To']) == _keys(removed, ['From', 'To'])
+    assert diff.links.added.empty
+    assert _keys(diff.links.modified, ['From', 'To']) == [(modified['From'], modified['To'])]
+    change = diff.links.changes.iloc[0]
+    assert (change['From'], change['To'], change['column']) == (modified['From'], modified['To'], 'Data1')
+    assert np.isclose(change['old'], modified['Data1']) and np.isclose(change['new'], modified['Data1'] + 10)
+
+    # The links removed from this scenario are added to the other one
+    reverse = other.diff(scenario, tables=['links'])
+    assert _keys(reverse.links.added, ['From', 'To']) == _keys(removed, ['From', 'To'])
+    assert reverse.links.removed.empty
+
+
+def test_modified_turns(scenario_directory):
+    scenario = get_emme_scenario(scenario_directory)
+    other = get_emme_scenario(scenario_directory)
+    allowed = other.turns[other.turns['Tpf'].astype(float) != 0]
+    turn = tuple(allowed.index[0])
+    other.turns.ban([turn])
+    diff = scenario.diff(other, tables=['turns'])
+    assert _keys(diff.turns.modified, ['At', 'From', 'To']) == [turn]
+    # A banned turn has the turn penalty function 0
+    assert list(diff.turns.changes['column']) == ['Tpf']
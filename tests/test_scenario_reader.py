@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from helmet_utils.network.scenario_reader import ScenarioReader, get_emme_scenario
+
+
+def test_loaded_network_accepts_new_modes_and_netfield_values(scenario_directory):
+    network = get_emme_scenario(scenario_directory).network
+    first = network.index[0]
+
+    network.loc[first, 'Modes'] = 'cbhxyz'
+    network.loc[first, '#street'] = 'A street that is not in the file'
+    network[['#street']] = network[['#street']].fillna('')
+
+    assert network.loc[first, 'Modes'] == 'cbhxyz'
+    assert network.loc[first, '#street'] == 'A street that is not in the file'
+
+
+def test_categorical_tables_are_opt_in(scenario_directory):
+    network = ScenarioReader(scenario_directory, categorical=True).network()
+    assert isinstance(network['Modes'].dtype, pd.CategoricalDtype)
+    with pytest.raises(TypeError):
+        network.loc[network.index[0], 'Modes'] = 'cbhxyz'
+
+
+def _tables(scenario):
+    return {
+        'network': scenario.network,
+        'segments': scenario.transit.segments,
+        'transit_lines': scenario.transit.transit_lines,
+        'stops': scenario.transit.stops,
+    }
+
+
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+def test_concurrent_parsing_matches_serial_parsing(scenario_directory, pool):
+    expected = _tables(get_emme_scenario(scenario_directory))
+    for name, table in _tables(get_emme_scenario(scenario_directory, workers=2, pool=pool)).items():
+        pd.testing.assert_frame_equal(pd.DataFrame(table), pd.DataFrame(expected[name]), obj=name)
@@ -0,0 +1,53 @@
+import tarfile
+import zipfile
+
+import pandas as pd
+import pytest
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+from helmet_utils.network.scenario_source import ArchiveSource
+
+
+def _archive(scenario_directory, path):
+    # The files are in a directory inside the archive, as in an archived scenario folder
+    files = sorted(scenario_directory.iterdir())
+    if path.suffix == '.zip':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for file in files:
+                archive.write(file, f'scenario/{file.name}')
+    else:
+        with tarfile.open(path, 'w:gz' if path.name.endswith('.gz') else 'w') as archive:
+            for file in files:
+                archive.add(file, f'scenario/{file.name}')
+    return path
+
+
+def _tables(scenario):
+    return {
+        'network': scenario.network,
+        'nodes': scenario.network.nodes,
+        'segments': scenario.transit.segments,
+        'transit_lines': scenario.transit.transit_lines,
+        'link_shape': scenario.link_shape,
+        'modes': scenario.modes,
+        'turns': scenario.turns,
+        'vehicles': scenario.vehicles,
+    }
+
+
+@pytest.mark.parametrize('archive_name', ['scenario.zip', 'scenario.tar', 'scenario.tar.gz'])
+def test_archived_scenario_matches_the_directory(scenario_directory, tmp_path, archive_name):
+    archive = _archive(scenario_directory, tmp_path / archive_name)
+    expected = _tables(get_emme_scenario(scenario_directory))
+    for name, table in _tables(get_emme_scenario(archive)).items():
+        pd.testing.assert_frame_equal(pd.DataFrame(table), pd.DataFrame(expected[name]), obj=name)
+
+
+def test_tar_archive_is_decompressed_once(scenario_directory, tmp_path, monkeypatch):
+    archive = _archive(scenario_directory, tmp_path / 'scenario.tar.gz')
+    opened = []
+    open_tar = ArchiveSource.open_tar
+    monkeypatch.setattr(ArchiveSource, 'open_tar', lambda self: opened.append(self) or open_tar(self))
+    scenario = get_emme_scenario(archive)
+    _tables(scenario)
+    assert len(opened) == 1
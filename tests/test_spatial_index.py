@@ -0,0 +1,59 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+
+@pytest.fixture(scope='module')
+def network(scenario_directory):
+    return get_emme_scenario(scenario_directory).network
+
+
+def _points(network, count=300, seed=0):
+    # Random points around the network, some of them outside it
+    xmin, ymin, xmax, ymax = network.total_bounds
+    random = np.random.default_rng(seed)
+    coordinates = np.column_stack([random.uniform(xmin - 500, xmax + 500, count), random.uniform(ymin - 500, ymax + 500, count)])
+    return gpd.GeoSeries(shapely.points(coordinates), index=np.arange(count) * 10, crs=network.crs)
+
+
+def test_nearest_nodes_match_a_brute_force_search(network):
+    pytest.importorskip('scipy')
+    points = _points(network)
+    nodes = network.nodes
+    distances = shapely.distance(points.to_numpy()[:, None], nodes.geometry.to_numpy()[None, :])
+    nearest = network.nearest_nodes(points, k=3)
+    assert len(nearest) == 3 * len(points)
+    expected = np.sort(distances, axis=1)[:, :3].ravel()
+    np.testing.assert_allclose(nearest['distance'].to_numpy(), expected)
+    assert (nearest['point'].to_numpy() == np.repeat(points.index, 3)).all()
+    found = nodes.set_index('Node').geometry.loc[nearest['Node']].to_numpy()
+    np.testing.assert_allclose(shapely.distance(np.repeat(points.to_numpy(), 3), found), nearest['distance'])
+
+
+def test_nearest_nodes_within_max_distance(network):
+    pytest.importorskip('scipy')
+    points = _points(network)
+    nearest = network.nearest_nodes(points, k=2, max_distance=50.0)
+    assert (nearest['distance'] <= 50.0).all()
+    within = shapely.distance(points.to_numpy()[:, None], network.nodes.geometry.to_numpy()[None, :]) <= 50.0
+    assert len(nearest) == np.minimum(within.sum(axis=1), 2).sum()
+
+
+@pytest.mark.parametrize('modes', [None, 'b'])
+def test_nearest_links_match_a_brute_force_search(network, modes):
+    points = _points(network)
+    links = network[(network['To'] > 0).to_numpy() & (network.allows_modes(modes) if modes else True)]
+    distances = shapely.distance(points.to_numpy()[:, None], links.geometry.to_numpy()[None, :])
+    nearest = network.nearest_links(points, modes=modes)
+    assert (nearest['point'].to_numpy() == points.index).all()
+    np.testing.assert_allclose(nearest['distance'].to_numpy(), distances.min(axis=1))
+    # The returned link is at the returned distance and the geometry is the projected point on it
+    geometries = network.set_index(['From', 'To']).geometry.loc[list(zip(nearest['From'], nearest['To']))].to_numpy()
+    np.testing.assert_allclose(shapely.distance(points.to_numpy(), geometries), nearest['distance'], atol=1e-6)
+    np.testing.assert_allclose(shapely.distance(nearest.geometry.to_numpy(), points.to_numpy()), nearest['distance'], atol=1e-6)
+    np.testing.assert_allclose(nearest['fraction'], nearest['position'] / shapely.length(geometries))
+    if modes is not None:
+        assert network.set_index(['From', 'To']).loc[list(zip(nearest['From'], nearest['To'])), 'Modes'].str.contains(modes).all()
@@ -0,0 +1,51 @@
+import re
+import shutil
+
+import pytest
+
+from helmet_utils.network.transit_line_index import TransitLineIndex
+
+
+@pytest.fixture
+def transit_lines_file(scenario_directory, tmp_path):
+    path = tmp_path / 'transit_lines_1.txt'
+    shutil.copy(scenario_directory / 'transit_lines_1.txt', path)
+    return path
+
+
+# Edits that make the block longer, keep its length or make it shorter
+EDITS = {
+    'longer': lambda block: re.sub(r'us1=\S+', 'us1=12.3456789', block),
+    'same': lambda block: re.sub(r'us1=\S', 'us1=7', block),
+    'shorter': lambda block: block.replace('   us2=', ' us2='),
+}
+
+
+@pytest.mark.parametrize('edit', list(EDITS))
+def test_rewritten_line_moves_the_following_lines(transit_lines_file, edit):
+    index = TransitLineIndex.load(transit_lines_file)
+    code = index.codes[len(index) // 2]
+    following = {other: index.read(other) for other in index.codes}
+    old_block = index.read(code)
+    new_block = EDITS[edit](old_block)
+    assert (len(new_block) > len(old_block), len(new_block) == len(old_block)) == (edit == 'longer', edit == 'same')
+    original = transit_lines_file.read_text()
+
+    index.rewrite(code, new_block)
+    assert transit_lines_file.read_text() == original.replace(old_block, new_block)
+    assert index.read(code) == new_block
+    for other, block in following.items():
+        if other != code:
+            assert index.read(other) == block
+    # The updated offsets are the ones of a new index of the file, and they are stored
+    assert index.blocks == TransitLineIndex.build(transit_lines_file).blocks
+    assert TransitLineIndex.load(transit_lines_file).blocks == index.blocks
+
+
+def test_block_of_another_line_is_not_written(transit_lines_file):
+    index = TransitLineIndex.load(transit_lines_file)
+    first, second = index.codes[:2]
+    original = transit_lines_file.read_text()
+    with pytest.raises(ValueError):
+        index.rewrite(first, index.read(second))
+    assert transit_lines_file.read_text() == original
@@ -0,0 +1,23 @@
+import re
+import shutil
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+
+def _route_lines(path):
+    return [line for line in path.read_text().splitlines() if line.lstrip()[:1].isdigit()]
+
+
+def test_exported_transit_lines_keep_the_text_of_the_segment_data(scenario_directory, tmp_path):
+    folder = tmp_path / 'scenario'
+    shutil.copytree(scenario_directory, folder)
+    transit_lines = (folder / 'transit_lines_1.txt').read_text()
+    transit_lines = re.sub(r'us1=\S+', 'us1=12.3456789', transit_lines)
+    transit_lines = re.sub(r'us2=\S+', 'us2=0.50', transit_lines)
+    transit_lines = re.sub(r'us3=\S+', 'us3=1e-05', transit_lines)
+    transit_lines = re.sub(r'lay=\S+', 'lay=2.50', transit_lines)
+    (folder / 'transit_lines_1.txt').write_text(transit_lines)
+
+    scenario = get_emme_scenario(folder)
+    scenario.transit.export_transit_lines(tmp_path / 'output')
+    assert _route_lines(tmp_path / 'output' / 'transit_lines_1.txt') == _route_lines(folder / 'transit_lines_1.txt')
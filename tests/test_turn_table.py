@@ -0,0 +1,44 @@
+import shutil
+
+from helmet_utils.network.scenario_reader import get_emme_scenario
+
+TURNS = """c Modeller - Turn Transaction
+c Date: 2024-01-01 00:00:00
+c Project: Helmet test
+c Scenario 1: Synthetic scenario
+t turns
+c At From To Pen Tpf Data1 Data2 Data3
+a 100001 100000 100002 0.0 1 0 0.0 0
+a 100002 100001 100003 2.50 2 1.5 0.0 0
+a 100003 100002 100004 1 3 0 0.0 0
+"""
+
+
+def _scenario_with_turns(scenario_directory, tmp_path):
+    folder = tmp_path / 'scenario'
+    shutil.copytree(scenario_directory, folder)
+    (folder / 'turns_1.txt').write_text(TURNS)
+    return get_emme_scenario(folder)
+
+
+def _table_lines(path):
+    return path.read_text().splitlines()[5:]
+
+
+def test_exported_turns_keep_the_text_of_the_turns_file(scenario_directory, tmp_path):
+    scenario = _scenario_with_turns(scenario_directory, tmp_path)
+    scenario.export_turns(tmp_path / 'output')
+    assert _table_lines(tmp_path / 'output' / 'turns_1.txt') == TURNS.splitlines()[5:]
+
+
+def test_edited_turns_keep_the_text_of_the_other_turns(scenario_directory, tmp_path):
+    scenario = _scenario_with_turns(scenario_directory, tmp_path)
+    scenario.turns.ban([(100001, 100000, 100002)])
+    scenario.turns.scale_penalties(2, [(100002, 100001, 100003)])
+    scenario.export_turns(tmp_path / 'output')
+    assert _table_lines(tmp_path / 'output' / 'turns_1.txt') == [
+        'c At From To Pen Tpf Data1 Data2 Data3',
+        'a 100001 100000 100002 0.0 0 0 0.0 0',
+        'a 100002 100001 100003 5 2 1.5 0.0 0',
+        'a 100003 100002 100004 1 3 0 0.0 0',
+    ]